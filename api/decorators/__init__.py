@@ -1,10 +1,15 @@
 # type: ignore
 from .regression import regression_input
-from .alator import alator_input
-from .antevorta import antevorta_input
+from .alator import alator_input, alator_batch_input
+from .antevorta import antevorta_input, antevorta_grid_input
+from .cache import result_cache, result_cache_stats
 
 __all__ = [
     "regression_input",
     "alator_input",
+    "alator_batch_input",
     "antevorta_input",
+    "antevorta_grid_input",
+    "result_cache",
+    "result_cache_stats",
 ]
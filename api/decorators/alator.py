@@ -1,16 +1,23 @@
 # type: ignore
 from functools import wraps
 import json
+import math
 
+from django.conf import settings
 from django.http.request import HttpRequest
 
-from helpers.alator import AlatorClientInput
+from helpers.alator import (
+    AlatorBatchClientInput,
+    AlatorClientInput,
+    AlatorRollingStartClientInput,
+)
 from helpers.response import ErrorResponse
 
 
-def alator_input():
+def alator_input(has_horizon: bool = False):
     """
-    Throws error if inputs are malformed.
+    Throws error if inputs are malformed. fast defaults to false, horizon
+    is read when has_horizon and defaults to running to the last date.
     """
 
     def decorator(func):
@@ -42,9 +49,99 @@ def alator_input():
             if not assets or not weights:
                 return ErrorResponse.create(400, "Input data is invalid")
 
-            alator = AlatorClientInput(assets=assets, weights=weights)
+            fast = body_data.get("fast", False)
+            if not isinstance(fast, bool):
+                return ErrorResponse.create(400, "Input data is invalid")
+
+            if has_horizon:
+                horizon = body_data.get("horizon", None)
+                if horizon is not None and (
+                    isinstance(horizon, bool)
+                    or not isinstance(horizon, int)
+                    or horizon < 2
+                ):
+                    return ErrorResponse.create(
+                        400, "Horizon must be a number of at least 2"
+                    )
+
+                rolling = AlatorRollingStartClientInput(
+                    assets=assets, weights=weights, fast=fast, horizon=horizon
+                )
+                return func(request, alator=rolling, *args, **kwargs)
+
+            alator = AlatorClientInput(assets=assets, weights=weights, fast=fast)
             return func(request, alator=alator, *args, **kwargs)
 
         return inner
 
     return decorator
+
+
+def alator_batch_input():
+    """
+    Throws error if inputs are malformed. weights is a list with one list
+    of weights for each portfolio, at most ALATOR_MAX_PORTFOLIOS of them.
+    include_series defaults to true and fast to false.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def inner(request: HttpRequest, *args, **kwargs):
+
+            req_body = json.loads(request.body.decode("utf-8"))
+            if "data" not in req_body:
+                return ErrorResponse.create(
+                    400, "Client passed no data to run backtest on"
+                )
+
+            body_data = req_body.get("data")
+            if "assets" not in body_data:
+                return ErrorResponse.create(
+                    400, "Client passed no data to run backtest on"
+                )
+            if "weights" not in body_data:
+                return ErrorResponse.create(
+                    400, "Client passed no data to run backtest on"
+                )
+
+            assets = body_data.get("assets")
+            weights = body_data.get("weights")
+            include_series = body_data.get("include_series", True)
+            fast = body_data.get("fast", False)
+
+            if not assets or not weights:
+                return ErrorResponse.create(400, "Input data is invalid")
+
+            if len(weights) > settings.ALATOR_MAX_PORTFOLIOS:
+                return ErrorResponse.create(
+                    400,
+                    "Batch must have at most "
+                    + str(settings.ALATOR_MAX_PORTFOLIOS)
+                    + " portfolios",
+                )
+
+            for portfolio in weights:
+                if not isinstance(portfolio, list) or len(portfolio) != len(assets):
+                    return ErrorResponse.create(400, "Input data is invalid")
+                for weight in portfolio:
+                    if (
+                        not isinstance(weight, (int, float))
+                        or isinstance(weight, bool)
+                        or not math.isfinite(weight)
+                    ):
+                        return ErrorResponse.create(400, "Input data is invalid")
+
+            if not isinstance(include_series, bool) or not isinstance(fast, bool):
+                return ErrorResponse.create(400, "Input data is invalid")
+
+            alator_batch = AlatorBatchClientInput(
+                assets=assets,
+                weights=weights,
+                include_series=include_series,
+                fast=fast,
+            )
+            return func(request, alator_batch=alator_batch, *args, **kwargs)
+
+        return inner
+
+    return decorator
@@ -1,16 +1,23 @@
 # type: ignore
 from functools import wraps
 import json
+from typing import List, Optional, Union
 
+from django.conf import settings
 from django.http.request import HttpRequest
 
-from helpers.antevorta import AntevortaClientInput
+from helpers.antevorta import (
+    AntevortaClientInput,
+    AntevortaEnsembleClientInput,
+    AntevortaGridClientInput,
+)
 from helpers.response import ErrorResponse
 
 
-def antevorta_input():
+def antevorta_input(has_runs: bool = False):
     """
-    Throws error if inputs are malformed.
+    Throws error if inputs are malformed. When has_runs the number of
+    simulations is read from runs, which is required.
     """
 
     def decorator(func):
@@ -83,6 +90,33 @@ def antevorta_input():
             ):
                 return ErrorResponse.create(400, "Input data is invalid")
 
+            if has_runs:
+                runs = body_data.get("runs")
+                if (
+                    isinstance(runs, bool)
+                    or not isinstance(runs, int)
+                    or runs < 1
+                    or runs > settings.ANTEVORTA_MAX_RUNS
+                ):
+                    return ErrorResponse.create(
+                        400,
+                        "Runs must be a number between 1 and "
+                        + str(settings.ANTEVORTA_MAX_RUNS),
+                    )
+
+                ensemble = AntevortaEnsembleClientInput(
+                    assets=assets,
+                    weights=weights,
+                    initial_cash=initial_cash,
+                    wage=wage,
+                    wage_growth=wage_growth,
+                    contribution_pct=contribution_pct,
+                    emergency_cash_min=emergency_cash_min,
+                    sim_length=sim_length,
+                    runs=runs,
+                )
+                return func(request, antevorta=ensemble, *args, **kwargs)
+
             antevorta = AntevortaClientInput(
                 assets=assets,
                 weights=weights,
@@ -98,3 +132,123 @@ def antevorta_input():
         return inner
 
     return decorator
+
+
+GRID_PARAMS = [
+    "wage",
+    "wage_growth",
+    "contribution_pct",
+    "emergency_cash_min",
+    "sim_length",
+]
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _grid_values(value: Union[float, list, dict], limit: int) -> Optional[List[float]]:
+    """Values from a number, list of numbers or an inclusive range with
+    start, stop and step. Returns None when invalid or longer than limit.
+    """
+    if _is_number(value):
+        return [value]
+    if isinstance(value, list):
+        if not value or len(value) > limit:
+            return None
+        if not all(_is_number(i) for i in value):
+            return None
+        return value
+    if isinstance(value, dict):
+        start, stop, step = value.get("start"), value.get("stop"), value.get("step")
+        if not all(_is_number(i) for i in [start, stop, step]):
+            return None
+        if step <= 0 or stop < start:
+            return None
+        ##Allows for steps that don't divide the range exactly in floating point
+        count = int((stop - start) / step + 1e-9) + 1
+        if count > limit:
+            return None
+        return [round(start + i * step, 10) for i in range(count)]
+    return None
+
+
+def antevorta_grid_input():
+    """
+    Throws error if inputs are malformed. Each of GRID_PARAMS can be a
+    number, a list of numbers or a range of start, stop and step. runs is
+    optional and defaults to one simulation for each combination.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def inner(request: HttpRequest, *args, **kwargs):
+
+            req_body = json.loads(request.body.decode("utf-8"))
+            if "data" not in req_body:
+                return ErrorResponse.create(
+                    400, "Client passed no data to run simulation on"
+                )
+
+            body_data = req_body.get("data")
+            for key in ["assets", "weights", "initial_cash", *GRID_PARAMS]:
+                if key not in body_data:
+                    return ErrorResponse.create(
+                        400, "Client passed no data to run simulation on"
+                    )
+
+            assets = body_data.get("assets")
+            weights = body_data.get("weights")
+            initial_cash = body_data.get("initial_cash")
+            runs = body_data.get("runs", 1)
+
+            if not assets or not weights or len(assets) != len(weights):
+                return ErrorResponse.create(400, "Input data is invalid")
+
+            if not _is_number(initial_cash) or initial_cash < 0:
+                return ErrorResponse.create(400, "Input data is invalid")
+
+            if not isinstance(runs, int) or isinstance(runs, bool) or runs < 1:
+                return ErrorResponse.create(400, "Input data is invalid")
+
+            limit = settings.ANTEVORTA_MAX_RUNS // runs
+            grid = {}
+            size = 1
+            for key in GRID_PARAMS:
+                values = _grid_values(body_data.get(key), limit)
+                if values is None or min(values) < 0:
+                    return ErrorResponse.create(400, "Input data is invalid")
+                if key == "sim_length" and not all(
+                    isinstance(i, int) or float(i).is_integer() for i in values
+                ):
+                    return ErrorResponse.create(400, "Input data is invalid")
+                if key == "sim_length":
+                    values = [int(i) for i in values]
+                size *= len(values)
+                grid[key] = values
+
+            if size * runs > settings.ANTEVORTA_MAX_RUNS:
+                return ErrorResponse.create(
+                    400,
+                    "Grid must have at most "
+                    + str(settings.ANTEVORTA_MAX_RUNS)
+                    + " simulations",
+                )
+
+            antevorta = AntevortaGridClientInput(
+                assets=assets,
+                weights=weights,
+                initial_cash=initial_cash,
+                wage=grid["wage"][0],
+                wage_growth=grid["wage_growth"][0],
+                contribution_pct=grid["contribution_pct"][0],
+                emergency_cash_min=grid["emergency_cash_min"][0],
+                sim_length=grid["sim_length"][0],
+                grid={key: values for key, values in grid.items() if len(values) > 1},
+                runs=runs,
+            )
+            return func(request, antevorta=antevorta, *args, **kwargs)
+
+        return inner
+
+    return decorator
@@ -0,0 +1,135 @@
+# type: ignore
+from functools import wraps
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.http.request import HttpRequest
+
+from api.models import Coverage
+from helpers.prices.api import PriceDataVersion
+
+HITS_KEY = "result_cache:hits"
+MISSES_KEY = "result_cache:misses"
+
+
+def _canonical_input(kwargs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if "regression" in kwargs:
+        regression = kwargs["regression"]
+        return {
+            "dep": int(regression["dep"]),
+            "ind": sorted([int(i) for i in regression["ind"]]),
+            "window": regression.get("window"),
+        }
+    if "alator" in kwargs:
+        alator = kwargs["alator"]
+        try:
+            portfolio = [
+                [int(asset), float(weight)]
+                for asset, weight in zip(alator["assets"], alator["weights"])
+            ]
+        except (TypeError, ValueError):
+            ##Invalid input is left to the view to reject
+            return None
+        return {
+            "portfolio": sorted(portfolio),
+            "fast": bool(alator.get("fast", False)),
+            "horizon": alator.get("horizon"),
+        }
+    if "alator_batch" in kwargs:
+        batch = kwargs["alator_batch"]
+        try:
+            assets = [int(asset) for asset in batch["assets"]]
+            weights = [[float(weight) for weight in row] for row in batch["weights"]]
+        except (TypeError, ValueError):
+            return None
+        ##Portfolios keep their order as results are returned in it
+        order = sorted(range(len(assets)), key=lambda i: assets[i])
+        return {
+            "assets": [assets[i] for i in order],
+            "weights": [[row[i] for i in order] for row in weights],
+            "include_series": batch["include_series"],
+            "fast": bool(batch.get("fast", False)),
+        }
+    return None
+
+
+def _coverage(kwargs: Dict[str, Any]) -> List[Coverage]:
+    if "coverage" in kwargs:
+        return list(kwargs["coverage"])
+    alator = kwargs["alator"] if "alator" in kwargs else kwargs["alator_batch"]
+    return list(Coverage.objects.filter(id__in=alator["assets"]))
+
+
+def _count(key: str) -> None:
+    cache = caches["results"]
+    try:
+        cache.incr(key)
+    except ValueError:
+        ##incr fails when the key doesn't exist
+        cache.add(key, 1, timeout=None)
+    return
+
+
+def result_cache_stats() -> Dict[str, int]:
+    cache = caches["results"]
+    return {
+        "hits": cache.get(HITS_KEY, 0),
+        "misses": cache.get(MISSES_KEY, 0),
+    }
+
+
+def result_cache(endpoint: str, params: Optional[List[str]] = None):
+    """
+    Caches successful responses by endpoint, a canonical form of the
+    parsed input and the version of the price data used. Must be the
+    innermost decorator so that inputs have been parsed. Query variables
+    in params that the view reads itself are added to the key as given.
+
+    The version is read before the view runs to look up a result, and again
+    afterwards to store it, as the view may have refreshed prices. When
+    there is no version the view always runs. Responses carry an
+    X-Result-Cache header of hit or miss.
+    """
+
+    def key(canonical: Dict[str, Any], version: str) -> str:
+        payload: str = json.dumps(
+            {"endpoint": endpoint, "input": canonical, "version": version},
+            sort_keys=True,
+        )
+        return "result:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def decorator(func):
+        @wraps(func)
+        def inner(request: HttpRequest, *args, **kwargs):
+            canonical = _canonical_input(kwargs)
+            if canonical is None:
+                return func(request, *args, **kwargs)
+            for param in params or []:
+                canonical[param] = request.GET.getlist(param)
+
+            cache = caches["results"]
+            coverage: List[Coverage] = _coverage(kwargs)
+            version: Optional[str] = PriceDataVersion.token(coverage)
+            if version is not None:
+                cached: Optional[bytes] = cache.get(key(canonical, version))
+                if cached is not None:
+                    _count(HITS_KEY)
+                    response = HttpResponse(cached, content_type="application/json")
+                    response["X-Result-Cache"] = "hit"
+                    return response
+
+            _count(MISSES_KEY)
+            response = func(request, *args, **kwargs)
+            if response.status_code == 200:
+                version = PriceDataVersion.token(coverage)
+                if version is not None:
+                    cache.set(key(canonical, version), response.content)
+            response["X-Result-Cache"] = "miss"
+            return response
+
+        return inner
+
+    return decorator
@@ -0,0 +1,282 @@
+import datetime
+import hashlib
+import io
+import json
+import socket
+import threading
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db.models import F
+from django.urls import resolve
+from django.utils import timezone
+
+from api.models import AnalysisJob
+
+
+class JobQueueFullException(Exception):
+    """Throws when a new job is submitted while JOB_MAX_QUEUED jobs are
+    waiting to run
+    """
+
+    def __init__(self) -> None:
+        self.message = "Job queue is full"
+
+
+class JobClientLimitException(Exception):
+    """Throws when a client submits a new job while it has
+    JOB_MAX_CLIENT_JOBS jobs queued or running
+    """
+
+    def __init__(self) -> None:
+        self.message = "Too many jobs queued for this client"
+
+
+class JobQueue:
+    """
+    Persistent queue of analysis requests backed by the AnalysisJob table.
+    A job is the endpoint, query string and body of a request to one of the
+    endpoints below, it is run by calling the view as uwsgi would so the
+    result is the same response the endpoint returns.
+
+    Identical requests are deduplicated on a hash of the endpoint, sorted
+    query and canonical body. Jobs are claimed with a conditional update so
+    any number of workers can share the queue, a job left running by a
+    worker that died is put back on the queue by requeue.
+
+    Submissions that would add work are refused once the queue or the
+    submitting client has too many jobs waiting. Checks and inserts aren't
+    atomic so concurrent submissions can pass a limit by a few jobs.
+
+    Attributes
+    ---------
+    endpoints: `Dict[str, str]`
+        Endpoints that can be run as a job with the method they accept
+    waiters: `threading.BoundedSemaphore`
+        Polls that may wait for a job at once in this process, others are
+        answered immediately so request threads stay free
+    """
+
+    endpoints: Dict[str, str] = {
+        "riskattribution": "GET",
+        "hypotheticaldrawdown": "GET",
+        "backtest": "POST",
+        "backtestbatch": "POST",
+        "backtestrollingstart": "POST",
+        "incomesim": "POST",
+        "incomesimensemble": "POST",
+        "incomesimgrid": "POST",
+    }
+
+    ##Shared by every request in the process
+    waiters: threading.BoundedSemaphore = threading.BoundedSemaphore(
+        settings.JOB_MAX_WAITERS
+    )
+
+    @staticmethod
+    def worker_name(pid: int) -> str:
+        return socket.gethostname() + ":" + str(pid)
+
+    @staticmethod
+    def key(endpoint: str, query: str, body: str) -> str:
+        return hashlib.sha256(
+            "\n".join([endpoint, query, body]).encode("utf-8")
+        ).hexdigest()
+
+    @staticmethod
+    def check_capacity(client: str) -> None:
+        if (
+            AnalysisJob.objects.filter(status=AnalysisJob.QUEUED).count()
+            >= settings.JOB_MAX_QUEUED
+        ):
+            raise JobQueueFullException
+        if (
+            AnalysisJob.objects.filter(
+                client=client, status__in=[AnalysisJob.QUEUED, AnalysisJob.RUNNING]
+            ).count()
+            >= settings.JOB_MAX_CLIENT_JOBS
+        ):
+            raise JobClientLimitException
+
+    @staticmethod
+    def submit(endpoint: str, query: str, body: str, client: str = "") -> AnalysisJob:
+        """Returns the job for the request, creating it if there is no job
+        for an identical request. Failed jobs and results older than
+        JOB_RESULT_TTL are queued again. Throws ValueError if the body of a
+        POST endpoint isn't valid JSON, JobQueueFullException or
+        JobClientLimitException if the job would be queued over a limit.
+        """
+        query = urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+        if JobQueue.endpoints[endpoint] == "POST":
+            body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":"))
+        else:
+            body = ""
+
+        now: datetime.datetime = timezone.now()
+        expired: datetime.datetime = now - datetime.timedelta(
+            seconds=settings.JOB_RESULT_TTL
+        )
+        key: str = JobQueue.key(endpoint, query, body)
+        existing: Optional[AnalysisJob] = AnalysisJob.objects.filter(key=key).first()
+        ##Returning a job that is queued, running or has a result adds no work
+        if existing is None or JobQueue.is_rerun(existing, expired):
+            JobQueue.check_capacity(client)
+
+        job, created = AnalysisJob.objects.get_or_create(
+            key=key,
+            defaults={
+                "endpoint": endpoint,
+                "query": query,
+                "body": body,
+                "client": client,
+                "created": now,
+            },
+        )
+        if created:
+            return job
+
+        if JobQueue.is_rerun(job, expired):
+            ##Conditional so that concurrent resubmissions reset the job once
+            AnalysisJob.objects.filter(id=job.id, status=job.status).update(
+                status=AnalysisJob.QUEUED,
+                client=client,
+                status_code=None,
+                result=None,
+                worker=None,
+                attempts=0,
+                created=now,
+                started=None,
+                finished=None,
+            )
+            job.refresh_from_db()
+        return job
+
+    @staticmethod
+    def is_rerun(job: AnalysisJob, expired: datetime.datetime) -> bool:
+        """A failed job or a result finished before expired is run again"""
+        return job.status == AnalysisJob.FAILED or (
+            job.status == AnalysisJob.DONE and job.finished < expired
+        )
+
+    @staticmethod
+    def claim(worker: str) -> Optional[AnalysisJob]:
+        """Marks the oldest queued job as running on worker and returns it,
+        None when the queue is empty.
+        """
+        while True:
+            job: Optional[AnalysisJob] = (
+                AnalysisJob.objects.filter(status=AnalysisJob.QUEUED)
+                .order_by("created")
+                .first()
+            )
+            if job is None:
+                return None
+
+            ##Another worker may claim the job between the select and update
+            claimed: int = AnalysisJob.objects.filter(
+                id=job.id, status=AnalysisJob.QUEUED
+            ).update(
+                status=AnalysisJob.RUNNING,
+                worker=worker,
+                started=timezone.now(),
+                attempts=F("attempts") + 1,
+            )
+            if claimed:
+                job.refresh_from_db()
+                return job
+
+    @staticmethod
+    def execute(job: AnalysisJob) -> Tuple[int, str]:
+        """Calls the view for the job, returns the status code and content
+        of the response.
+        """
+        path: str = "/api/" + job.endpoint
+        body: bytes = job.body.encode("utf-8")
+        request: WSGIRequest = WSGIRequest(
+            {
+                "REQUEST_METHOD": JobQueue.endpoints[job.endpoint],
+                "PATH_INFO": path,
+                "QUERY_STRING": job.query,
+                "CONTENT_TYPE": "application/json",
+                "CONTENT_LENGTH": str(len(body)),
+                "SERVER_NAME": "localhost",
+                "SERVER_PORT": "80",
+                "wsgi.url_scheme": "http",
+                "wsgi.input": io.BytesIO(body),
+            }
+        )
+        response = resolve(path).func(request)
+        return response.status_code, response.content.decode("utf-8")
+
+    @staticmethod
+    def run_next(worker: str) -> bool:
+        """Runs the oldest queued job on worker, returns False when the queue
+        is empty. An exception from the view fails the job.
+        """
+        job: Optional[AnalysisJob] = JobQueue.claim(worker)
+        if job is None:
+            return False
+
+        try:
+            status_code, result = JobQueue.execute(job)
+            status: str = AnalysisJob.DONE
+        except Exception:
+            status_code = 500
+            result = json.dumps({"message": "Job failed to complete"})
+            status = AnalysisJob.FAILED
+
+        ##The job may have been requeued if this worker was thought dead
+        AnalysisJob.objects.filter(
+            id=job.id, status=AnalysisJob.RUNNING, worker=worker
+        ).update(
+            status=status,
+            status_code=status_code,
+            result=result,
+            finished=timezone.now(),
+        )
+        return True
+
+    @staticmethod
+    def requeue(workers: List[str]) -> int:
+        """Puts jobs left running by workers back on the queue, a job that
+        has been attempted JOB_MAX_ATTEMPTS times is failed instead. Returns
+        the number of jobs requeued.
+        """
+        running = AnalysisJob.objects.filter(
+            status=AnalysisJob.RUNNING, worker__in=workers
+        )
+        running.filter(attempts__gte=settings.JOB_MAX_ATTEMPTS).update(
+            status=AnalysisJob.FAILED,
+            status_code=500,
+            result=json.dumps({"message": "Job stopped its worker"}),
+            finished=timezone.now(),
+        )
+        return running.update(status=AnalysisJob.QUEUED, worker=None, started=None)
+
+    @staticmethod
+    def requeue_host() -> int:
+        """Requeues every job running on this host, only safe before this
+        host starts any workers.
+        """
+        workers: List[str] = list(
+            AnalysisJob.objects.filter(
+                status=AnalysisJob.RUNNING,
+                worker__startswith=socket.gethostname() + ":",
+            )
+            .values_list("worker", flat=True)
+            .distinct()
+        )
+        return JobQueue.requeue(workers)
+
+    @staticmethod
+    def purge() -> int:
+        """Deletes jobs that finished more than JOB_RESULT_TTL ago"""
+        expired: datetime.datetime = timezone.now() - datetime.timedelta(
+            seconds=settings.JOB_RESULT_TTL
+        )
+        deleted, _ = AnalysisJob.objects.filter(
+            status__in=[AnalysisJob.DONE, AnalysisJob.FAILED], finished__lt=expired
+        ).delete()
+        return deleted
@@ -0,0 +1,30 @@
+import time
+from typing import List
+
+from django.core.management.base import BaseCommand
+
+from helpers.prices.data import FakeData
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the construction of an InvestPySource from generated daily "
+        "data, fifty years of daily data is ~13k rows"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lengths", type=int, nargs="+", default=[10_000, 50_000])
+        parser.add_argument("--repeat", type=int, default=10)
+
+    def handle(self, *args, **options):
+        for length in options["lengths"]:
+            timings: List[float] = []
+            for _ in range(options["repeat"]):
+                start: float = time.perf_counter()
+                FakeData.get_investpy(100, 1, length, 1)
+                timings.append(time.perf_counter() - start)
+            self.stdout.write(
+                f"{length} rows: best {min(timings) * 1000:.2f}ms, "
+                f"mean {sum(timings) / len(timings) * 1000:.2f}ms"
+            )
+        return
@@ -0,0 +1,72 @@
+import time
+from typing import Callable, Dict, List
+
+from django.core.management.base import BaseCommand
+
+from helpers import analysis
+from helpers.analysis.riskattribution import (
+    RegressionInput,
+    RiskAttributionDefinition,
+    RollingRegressionInput,
+)
+from helpers.prices.data import DataSource, FakeData
+
+
+def run_separate(regression: RollingRegressionInput, data: Dict[int, DataSource]):
+    analysis.RollingRiskAttribution(roll_input=regression, data=data).run()
+    analysis.RiskAttribution(reg_input=regression, data=data).run()
+    analysis.BootstrapRiskAttributionAlt(reg_input=regression, data=data).run()
+    return
+
+
+def run_shared(regression: RollingRegressionInput, data: Dict[int, DataSource]):
+    definition = RiskAttributionDefinition(
+        reg_input=RegressionInput(ind=regression["ind"], dep=regression["dep"]),
+        data=data,
+    )
+    analysis.RollingRiskAttribution(
+        roll_input=regression, data=data, definition=definition
+    ).run()
+    analysis.RiskAttribution(
+        reg_input=regression, data=data, definition=definition
+    ).run()
+    analysis.BootstrapRiskAttributionAlt(
+        reg_input=regression, data=data, definition=definition
+    ).run()
+    return
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the models run by the risk_attribution view with a definition "
+        "per model against one shared definition, on generated data"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--length", type=int, default=5000)
+        parser.add_argument("--assets", type=int, default=3)
+        parser.add_argument("--window", type=int, default=6)
+        parser.add_argument("--repeat", type=int, default=10)
+
+    def handle(self, *args, **options):
+        data: Dict[int, DataSource] = {
+            i: FakeData.get_investpy(1, 0.1, options["length"], i + 1)
+            for i in range(options["assets"] + 1)
+        }
+        regression = RollingRegressionInput(
+            dep=0, ind=list(range(1, options["assets"] + 1)), window=options["window"]
+        )
+
+        runs: List[Callable] = [run_separate, run_shared]
+        for run in runs:
+            run(regression, data)
+            timings: List[float] = []
+            for _ in range(options["repeat"]):
+                start: float = time.perf_counter()
+                run(regression, data)
+                timings.append(time.perf_counter() - start)
+            self.stdout.write(
+                f"{run.__name__}: best {min(timings) * 1000:.2f}ms, "
+                f"mean {sum(timings) / len(timings) * 1000:.2f}ms"
+            )
+        return
@@ -0,0 +1,66 @@
+import multiprocessing
+import os
+import signal
+import time
+from typing import Dict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api.jobs import JobQueue
+
+
+def work(poll_interval: float) -> None:
+    worker: str = JobQueue.worker_name(os.getpid())
+    while True:
+        if not JobQueue.run_next(worker):
+            time.sleep(poll_interval)
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs queued analysis jobs on a pool of worker processes, a worker "
+        "that dies is replaced and its job requeued. Run one per host"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=settings.JOB_WORKERS)
+
+    def handle(self, *args, **options):
+        ##Jobs running on this host were left by a previous run that stopped
+        requeued: int = JobQueue.requeue_host()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} jobs from a previous run")
+
+        def stop(signum, frame):
+            raise SystemExit
+
+        signal.signal(signal.SIGTERM, stop)
+
+        ctx = multiprocessing.get_context("fork")
+        processes: Dict[int, multiprocessing.process.BaseProcess] = {}
+        purged: float = 0.0
+        try:
+            while True:
+                for slot in range(options["workers"]):
+                    process = processes.get(slot)
+                    if process is not None and process.is_alive():
+                        continue
+                    if process is not None:
+                        JobQueue.requeue([JobQueue.worker_name(process.pid)])
+                    ##Children can't share the parent's database connection
+                    connections.close_all()
+                    processes[slot] = ctx.Process(
+                        target=work, args=(settings.JOB_POLL_INTERVAL,)
+                    )
+                    processes[slot].start()
+                if time.monotonic() - purged > 60:
+                    JobQueue.purge()
+                    purged = time.monotonic()
+                time.sleep(settings.JOB_POLL_INTERVAL)
+        finally:
+            for process in processes.values():
+                process.terminate()
+            for process in processes.values():
+                process.join()
@@ -0,0 +1,46 @@
+# Generated by Django 4.0.4 on 2026-10-18 03:51
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0028_delete_realreturns"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnalysisJob",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("key", models.CharField(max_length=64, unique=True)),
+                ("endpoint", models.CharField(max_length=50)),
+                ("query", models.TextField(blank=True)),
+                ("body", models.TextField(blank=True)),
+                ("status", models.CharField(default="queued", max_length=10)),
+                ("status_code", models.SmallIntegerField(null=True)),
+                ("result", models.TextField(null=True)),
+                ("worker", models.CharField(max_length=100, null=True)),
+                ("attempts", models.SmallIntegerField(default=0)),
+                ("created", models.DateTimeField()),
+                ("started", models.DateTimeField(null=True)),
+                ("finished", models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="analysisjob",
+            index=models.Index(
+                fields=["status", "created"], name="api_analysi_status_98ac41_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0029_analysisjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="analysisjob",
+            name="client",
+            field=models.CharField(blank=True, default="", max_length=45),
+        ),
+    ]
@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 
 
@@ -90,3 +92,35 @@ class SecThirteenFPosition(models.Model):  # type: ignore
             ("thirteenf_id"),
             ("cusip"),
         )
+
+
+class AnalysisJob(models.Model):  # type: ignore
+    """
+    Request to an analysis endpoint that is run by the run_jobs command,
+    see api.jobs.JobQueue. Identical requests share one job through key.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    id: models.UUIDField = models.UUIDField(
+        primary_key=True, default=uuid.uuid4, editable=False
+    )
+    key: models.CharField = models.CharField(max_length=64, unique=True)
+    endpoint: models.CharField = models.CharField(max_length=50)
+    query: models.TextField = models.TextField(blank=True)
+    body: models.TextField = models.TextField(blank=True)
+    status: models.CharField = models.CharField(max_length=10, default=QUEUED)
+    status_code: models.SmallIntegerField = models.SmallIntegerField(null=True)
+    result: models.TextField = models.TextField(null=True)
+    worker: models.CharField = models.CharField(max_length=100, null=True)
+    client: models.CharField = models.CharField(max_length=45, blank=True, default="")
+    attempts: models.SmallIntegerField = models.SmallIntegerField(default=0)
+    created: models.DateTimeField = models.DateTimeField()
+    started: models.DateTimeField = models.DateTimeField(null=True)
+    finished: models.DateTimeField = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "created"])]
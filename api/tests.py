@@ -1,10 +1,15 @@
+from django.core.cache import caches
 from django.test import TestCase, Client
 import json
+from threading import BoundedSemaphore
 from unittest.mock import patch
 
+from api.decorators import result_cache_stats
+from api.jobs import JobQueue
+
 from helpers.prices.data import FakeData
 
-from .models import Coverage
+from .models import AnalysisJob, Coverage
 
 
 def risk_attribution_route_builder(query_string):
@@ -118,6 +123,108 @@ class TestRiskAttributionRoutes(TestCase):
         )
         self.assertTrue(response.status_code == 400)
 
+    @patch("api.views.prices.PriceAPIRequestsMonthly")
+    def test_that_risk_attribution_returns_503_on_price_timeout(self, mock_obj):
+        caches["results"].clear()
+        instance = mock_obj.return_value
+        instance.get.side_effect = ConnectionError
+
+        routes = risk_attribution_route_builder(query_string="ind=667&dep=666")
+        for r in routes:
+            resp = self.c.get(r, content_type="application/json")
+            self.assertEqual(resp.status_code, 503)
+
+
+class TestResultCache(TestCase):
+    def setUp(self):
+        self.c = Client()
+        Coverage.objects.create(
+            id=666,
+            country_name="united_states",
+            name="S&P 500",
+            security_type="index",
+        )
+        Coverage.objects.create(
+            id=667,
+            country_name="united_kingdom",
+            name="FTSE 100",
+            security_type="index",
+        )
+        Coverage.objects.create(
+            id=668,
+            country_name="germany",
+            name="DAX",
+            security_type="index",
+        )
+        caches["results"].clear()
+
+        self.fake_data = {}
+        self.fake_data[666] = FakeData.get_investpy(1, 0.01, 100)
+        self.fake_data[667] = FakeData.get_investpy(2, 0.02, 100)
+        self.fake_data[668] = FakeData.get_investpy(3, 0.03, 100)
+
+    @patch("api.decorators.cache.PriceDataVersion.token")
+    @patch("api.views.prices.PriceAPIRequestsMonthly")
+    def test_that_repeated_request_is_served_from_cache(self, mock_obj, mock_token):
+        mock_token.return_value = "v1"
+        instance = mock_obj.return_value
+        instance.get.return_value = self.fake_data
+
+        first = self.c.get("/api/riskattribution?ind=666&ind=668&dep=667&window=5")
+        second = self.c.get("/api/riskattribution?ind=668&ind=666&dep=667&window=5")
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first["X-Result-Cache"], "miss")
+        self.assertEqual(second["X-Result-Cache"], "hit")
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(instance.get.call_count, 1)
+        self.assertEqual(result_cache_stats(), {"hits": 1, "misses": 1})
+
+        other_window = self.c.get(
+            "/api/riskattribution?ind=666&ind=668&dep=667&window=6"
+        )
+        self.assertEqual(other_window["X-Result-Cache"], "miss")
+        return
+
+    @patch("api.decorators.cache.PriceDataVersion.token")
+    @patch("api.views.prices.PriceAPIRequestsMonthly")
+    def test_that_new_data_version_misses(self, mock_obj, mock_token):
+        instance = mock_obj.return_value
+        instance.get.return_value = self.fake_data
+
+        mock_token.return_value = "v1"
+        self.c.get("/api/riskattribution?ind=666&dep=667&window=5")
+        mock_token.return_value = "v2"
+        res = self.c.get("/api/riskattribution?ind=666&dep=667&window=5")
+        self.assertEqual(res["X-Result-Cache"], "miss")
+        self.assertEqual(instance.get.call_count, 2)
+        return
+
+    @patch("api.decorators.cache.PriceDataVersion.token")
+    @patch("api.views.prices.PriceAPIRequestsMonthly")
+    def test_that_nothing_is_cached_without_a_version(self, mock_obj, mock_token):
+        mock_token.return_value = None
+        instance = mock_obj.return_value
+        instance.get.return_value = self.fake_data
+
+        for _ in range(2):
+            res = self.c.get("/api/riskattribution?ind=666&dep=667&window=5")
+            self.assertEqual(res["X-Result-Cache"], "miss")
+        self.assertEqual(instance.get.call_count, 2)
+        return
+
+    @patch("api.decorators.cache.PriceDataVersion.token")
+    @patch("api.views.prices.PriceAPIRequestsMonthly")
+    def test_that_errors_are_not_cached(self, mock_obj, mock_token):
+        mock_token.return_value = "v1"
+        instance = mock_obj.return_value
+        instance.get.return_value = self.fake_data
+
+        for _ in range(2):
+            res = self.c.get("/api/riskattribution?ind=666&dep=667&window=1000")
+            self.assertEqual(res.status_code, 400)
+        self.assertEqual(instance.get.call_count, 2)
+        return
+
 
 class TestHistoricalDrawdownEstimator(TestCase):
     def setUp(self):
@@ -150,6 +257,17 @@ class TestHistoricalDrawdownEstimator(TestCase):
         )
         self.assertTrue(response.status_code == 200)
 
+    @patch("api.views.prices.PriceAPIRequestsMonthly")
+    def test_that_drawdown_estimator_returns_503_on_price_timeout(self, mock_obj):
+        caches["results"].clear()
+        instance = mock_obj.return_value
+        instance.get.side_effect = ConnectionError
+
+        response = self.c.get(
+            "/api/hypotheticaldrawdown?ind=1&dep=666", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 503)
+
     @patch("api.views.prices.PriceAPIRequestsMonthly")
     def test_that_drawdown_estimator_throws_error_with_no_input(self, mock_obj):
         instance = mock_obj.return_value
@@ -206,6 +324,33 @@ class TestHistoricalDrawdownEstimator(TestCase):
         )
         self.assertTrue(response.status_code == 400)
 
+    @patch("api.views.prices.PriceAPIRequestsMonthly")
+    def test_that_drawdown_estimator_returns_each_threshold(self, mock_obj):
+        instance = mock_obj.return_value
+        instance.get.return_value = self.fake_data
+
+        response = self.c.get(
+            "/api/hypotheticaldrawdown?ind=1&dep=666&threshold=-0.2&threshold=-0.05",
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        thresholds = response.json()["thresholds"]
+        self.assertEqual([i["threshold"] for i in thresholds], [-0.2, -0.05])
+        self.assertEqual(response.json()["drawdowns"], thresholds[0]["drawdowns"])
+
+    @patch("api.views.prices.PriceAPIRequestsMonthly")
+    def test_that_drawdown_estimator_throws_error_with_bad_threshold(self, mock_obj):
+        instance = mock_obj.return_value
+        instance.get.return_value = self.fake_data
+
+        for threshold in ["Test", "0.1", "-1.5"]:
+            response = self.c.get(
+                "/api/hypotheticaldrawdown?ind=1&dep=666&threshold=" + threshold,
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 400)
+        instance.get.assert_not_called()
+
 
 class TestIncomeSimulation(TestCase):
     def setUp(self):
@@ -451,6 +596,158 @@ class TestIncomeSimulation(TestCase):
         self.assertTrue(response.status_code == 404)
 
 
+class TestIncomeSimulationEnsemble(TestCase):
+    def setUp(self):
+        self.c = Client()
+        Coverage.objects.create(
+            id=666,
+            country_name="united_states",
+            name="S&P 500",
+            security_type="index",
+        ).save()
+
+        self.fake_data = {}
+        self.fake_data[666] = FakeData.get_investpy(1, 0.1, 400)
+        self.req = {
+            "data": {
+                "assets": ["666"],
+                "weights": [1.0],
+                "initial_cash": 100000,
+                "wage": 10000,
+                "wage_growth": 0.05,
+                "contribution_pct": 0.05,
+                "emergency_cash_min": 5000,
+                "sim_length": 10,
+                "runs": 25,
+            }
+        }
+
+    @patch("helpers.antevorta.default.antevorta_basic")
+    @patch("helpers.antevorta.default.AntevortaBasicInput")
+    @patch("api.views.prices.PriceAPIRequests")
+    def test_that_ensemble_returns_bands(self, mock_obj, mock_input, mock_sim):
+        instance = mock_obj.return_value
+        instance.get_overlapping.return_value = self.fake_data
+        sims = iter(range(25))
+        mock_sim.side_effect = lambda inc_in: (next(sims), 1.0, 2.0, 3.0)
+
+        response = self.c.post(
+            "/api/incomesimensemble", self.req, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        data_resp = response.json()["data"]
+        self.assertEqual(data_resp["runs"], 25)
+        self.assertEqual(mock_sim.call_count, 25)
+        self.assertEqual(instance.get_overlapping.call_count, 1)
+        self.assertEqual(data_resp["cash"]["p50"], 12.0)
+        self.assertAlmostEqual(data_resp["cash"]["p5"], 1.2)
+        self.assertEqual(data_resp["sipp"]["p95"], 3.0)
+
+    def test_that_ensemble_throws_error_with_bad_runs(self):
+        for runs in [None, 0, "10", 2.5, 10**9]:
+            self.req["data"]["runs"] = runs
+            response = self.c.post(
+                "/api/incomesimensemble", self.req, content_type="application/json"
+            )
+            self.assertEqual(response.status_code, 400)
+
+    @patch("api.views.prices.PriceAPIRequests")
+    def test_that_ensemble_returns_503_on_price_timeout(self, mock_obj):
+        caches["results"].clear()
+        instance = mock_obj.return_value
+        instance.get_overlapping.side_effect = ConnectionError
+
+        response = self.c.post(
+            "/api/incomesimensemble", self.req, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 503)
+
+
+class TestIncomeSimulationGrid(TestCase):
+    def setUp(self):
+        self.c = Client()
+        Coverage.objects.create(
+            id=666,
+            country_name="united_states",
+            name="S&P 500",
+            security_type="index",
+        ).save()
+
+        self.fake_data = {}
+        self.fake_data[666] = FakeData.get_investpy(1, 0.1, 400)
+        self.req = {
+            "data": {
+                "assets": ["666"],
+                "weights": [1.0],
+                "initial_cash": 100000,
+                "wage": [10000, 20000, 30000],
+                "wage_growth": {"start": 0.01, "stop": 0.05, "step": 0.02},
+                "contribution_pct": 0.05,
+                "emergency_cash_min": 5000,
+                "sim_length": [10, 20],
+                "runs": 2,
+            }
+        }
+
+    @patch("helpers.antevorta.default.antevorta_basic")
+    @patch("helpers.antevorta.default.AntevortaBasicInput")
+    @patch("api.views.prices.PriceAPIRequests")
+    def test_that_grid_returns_row_per_combination(
+        self, mock_obj, mock_input, mock_sim
+    ):
+        instance = mock_obj.return_value
+        instance.get_overlapping.return_value = self.fake_data
+        mock_sim.return_value = (1.0, 2.0, 3.0, 4.0)
+
+        response = self.c.post(
+            "/api/incomesimgrid", self.req, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        data_resp = response.json()["data"]
+        self.assertEqual(data_resp["runs"], 2)
+        self.assertEqual(
+            data_resp["columns"],
+            ["wage", "wage_growth", "sim_length", "cash", "isa", "gia", "sipp"],
+        )
+        self.assertEqual(len(data_resp["rows"]), 18)
+        self.assertEqual(data_resp["rows"][1], [10000, 0.01, 20, 1.0, 2.0, 3.0, 4.0])
+        self.assertEqual(data_resp["rows"][-1][:3], [30000, 0.05, 20])
+        self.assertEqual(mock_sim.call_count, 36)
+        self.assertEqual(instance.get_overlapping.call_count, 1)
+
+    def test_that_grid_throws_error_with_bad_grid(self):
+        bad = [
+            {"start": 0.05, "stop": 0.01, "step": 0.01},
+            {"start": 0.01, "stop": 0.05, "step": 0},
+            {"start": 0.0, "stop": 10**6, "step": 0.01},
+            [],
+            [0.01, "0.02"],
+            [-0.01, 0.01],
+            "0.01",
+        ]
+        for wage_growth in bad:
+            self.req["data"]["wage_growth"] = wage_growth
+            response = self.c.post(
+                "/api/incomesimgrid", self.req, content_type="application/json"
+            )
+            self.assertEqual(response.status_code, 400)
+
+    def test_that_grid_throws_error_when_too_large(self):
+        self.req["data"]["wage"] = list(range(100, 10100, 100))
+        self.req["data"]["runs"] = 10
+        response = self.c.post(
+            "/api/incomesimgrid", self.req, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+        self.req["data"]["sim_length"] = [10, 10.5]
+        self.req["data"]["runs"] = 1
+        response = self.c.post(
+            "/api/incomesimgrid", self.req, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
 class TestBacktestPortfolio(TestCase):
     def setUp(self):
         self.c = Client()
@@ -524,3 +821,338 @@ class TestBacktestPortfolio(TestCase):
 
         response = self.c.post("/api/backtest", req, content_type="application/json")
         self.assertTrue(response.status_code == 404)
+
+
+class TestFastBacktestPortfolio(TestCase):
+    def setUp(self):
+        self.c = Client()
+        for i in [666, 667]:
+            Coverage.objects.create(
+                id=i,
+                country_name="united_states",
+                name="S&P 500",
+                security_type="index",
+            ).save()
+
+        self.fake_data = {}
+        self.fake_data[666] = FakeData.get_investpy(1, 0.1, 100)
+        self.fake_data[667] = FakeData.get_investpy(2, 0.1, 100)
+
+    @patch("api.views.prices.PriceAPIRequests")
+    def test_that_fast_backtest_runs(self, mock_obj):
+        instance = mock_obj.return_value
+        instance.get_overlapping.return_value = self.fake_data
+
+        req = {"data": {"assets": [666, 667], "weights": [0.6, 0.4], "fast": True}}
+        response = self.c.post("/api/backtest", req, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        data_resp = response.json()["data"]
+        for key in ["ret", "cagr", "vol", "mdd", "sharpe", "values", "returns"]:
+            self.assertTrue(key in data_resp)
+        self.assertEqual(len(data_resp["values"]), 100 - 1)
+
+        req = {
+            "data": {
+                "assets": [666, 667],
+                "weights": [[0.6, 0.4], [0.8, 0.2]],
+                "include_series": False,
+                "fast": True,
+            }
+        }
+        response = self.c.post(
+            "/api/backtestbatch", req, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["data"]), 2)
+
+    def test_that_backtest_throws_error_with_bad_fast(self):
+        req = {"data": {"assets": [666], "weights": [1], "fast": "yes"}}
+        response = self.c.post("/api/backtest", req, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+    @patch("api.views.prices.PriceAPIRequests")
+    def test_that_backtest_returns_503_on_price_timeout(self, mock_obj):
+        caches["results"].clear()
+        instance = mock_obj.return_value
+        instance.get_overlapping.side_effect = ConnectionError
+
+        req = {"data": {"assets": [666, 667], "weights": [0.6, 0.4], "fast": True}}
+        for route in ["/api/backtest", "/api/backtestrollingstart"]:
+            response = self.c.post(route, req, content_type="application/json")
+            self.assertEqual(response.status_code, 503)
+
+    @patch("api.views.prices.PriceAPIRequests")
+    def test_that_rolling_start_backtest_runs(self, mock_obj):
+        instance = mock_obj.return_value
+        instance.get_overlapping.return_value = self.fake_data
+
+        req = {"data": {"assets": [666, 667], "weights": [0.6, 0.4], "horizon": 20}}
+        response = self.c.post(
+            "/api/backtestrollingstart", req, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        data_resp = response.json()["data"]
+        self.assertEqual(len(data_resp["starts"]), len(data_resp["cagr"]))
+        self.assertTrue("median" in data_resp["summary"]["cagr"])
+
+        req["data"]["horizon"] = 1000
+        response = self.c.post(
+            "/api/backtestrollingstart", req, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_that_rolling_start_throws_error_with_bad_horizon(self):
+        for horizon in ["20", 1, 2.5, True]:
+            req = {"data": {"assets": [666], "weights": [1], "horizon": horizon}}
+            response = self.c.post(
+                "/api/backtestrollingstart", req, content_type="application/json"
+            )
+            self.assertEqual(response.status_code, 400)
+
+
+class TestBatchBacktestPortfolio(TestCase):
+    def setUp(self):
+        self.c = Client()
+        for i in [666, 667]:
+            Coverage.objects.create(
+                id=i,
+                country_name="united_states",
+                name="S&P 500",
+                security_type="index",
+            ).save()
+
+        self.fake_data = {}
+        self.fake_data[666] = FakeData.get_investpy(1, 0.1, 100)
+        self.fake_data[667] = FakeData.get_investpy(2, 0.1, 100)
+        self.bt_res = (0.1, 0.02, 0.15, -0.2, 0.5, [1.0, 1.1], [0.0, 0.1], [1, 2])
+
+    def test_that_get_fails(self):
+        resp = self.c.get("/api/backtestbatch")
+        self.assertTrue(resp.status_code == 405)
+
+    @patch("helpers.alator.fixedweight.alator_backtest")
+    @patch("helpers.alator.fixedweight.AlatorInput")
+    @patch("api.views.prices.PriceAPIRequests")
+    def test_that_batch_backtest_runs(self, mock_obj, mock_input, mock_backtest):
+        instance = mock_obj.return_value
+        instance.get_overlapping.return_value = self.fake_data
+        mock_backtest.return_value = self.bt_res
+
+        req = {"data": {"assets": [666, 667], "weights": [[0.6, 0.4], [0.8, 0.2]]}}
+        response = self.c.post(
+            "/api/backtestbatch", req, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        data_resp = response.json()["data"]
+        self.assertEqual(len(data_resp), 2)
+        self.assertTrue("values" in data_resp[0])
+        self.assertEqual(instance.get_overlapping.call_count, 1)
+
+        req["data"]["include_series"] = False
+        response = self.c.post(
+            "/api/backtestbatch", req, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse("values" in response.json()["data"][0])
+
+    @patch("api.views.prices.PriceAPIRequests")
+    def test_that_batch_backtest_throws_error_with_bad_input(self, mock_obj):
+        instance = mock_obj.return_value
+        instance.get_overlapping.return_value = self.fake_data
+
+        reqs = [
+            {},
+            {"data": {"assets": [666, 667]}},
+            {"data": {"assets": [666, 667], "weights": []}},
+            {"data": {"assets": [666, 667], "weights": [[0.5, 0.5], [1]]}},
+            {"data": {"assets": [666, 667], "weights": [0.5, 0.5]}},
+            {
+                "data": {
+                    "assets": [666, 667],
+                    "weights": [[0.5, 0.5]],
+                    "include_series": "no",
+                }
+            },
+        ]
+        for weight in ["abc", None, True, float("nan"), float("inf")]:
+            reqs.append({"data": {"assets": [666, 667], "weights": [[0.5, weight]]}})
+        reqs.append({"data": {"assets": [666, 667], "weights": [[0.5, 0.5]] * 101}})
+        for req in reqs:
+            response = self.c.post(
+                "/api/backtestbatch", req, content_type="application/json"
+            )
+            self.assertEqual(response.status_code, 400)
+
+        req = {"data": {"assets": [666, 668], "weights": [[0.5, 0.5]]}}
+        response = self.c.post(
+            "/api/backtestbatch", req, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class TestJobQueue(TestCase):
+    def setUp(self):
+        self.c = Client()
+        Coverage.objects.create(
+            id=666,
+            country_name="united_states",
+            name="S&P 500",
+            security_type="index",
+        ).save()
+
+        self.fake_data = {}
+        self.fake_data[666] = FakeData.get_investpy(1, 0.1, 400)
+        self.req = {
+            "data": {
+                "assets": ["666"],
+                "weights": [1.0],
+                "initial_cash": 100000,
+                "wage": [10000, 20000],
+                "wage_growth": 0.05,
+                "contribution_pct": 0.05,
+                "emergency_cash_min": 5000,
+                "sim_length": 10,
+            }
+        }
+
+    def submit(self, req):
+        return self.c.post(
+            "/api/jobs/incomesimgrid", req, content_type="application/json"
+        )
+
+    def test_that_identical_requests_share_a_job(self):
+        first = self.submit(self.req)
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(first.json()["data"]["status"], AnalysisJob.QUEUED)
+
+        ##Key order of the body doesn't change the job
+        reordered = {"data": dict(reversed(list(self.req["data"].items())))}
+        second = self.submit(reordered)
+        self.assertEqual(first.json()["data"]["id"], second.json()["data"]["id"])
+
+        self.req["data"]["sim_length"] = 20
+        third = self.submit(self.req)
+        self.assertNotEqual(first.json()["data"]["id"], third.json()["data"]["id"])
+        self.assertEqual(AnalysisJob.objects.count(), 2)
+
+    @patch("helpers.antevorta.default.antevorta_basic")
+    @patch("helpers.antevorta.default.AntevortaBasicInput")
+    @patch("api.views.prices.PriceAPIRequests")
+    def test_that_job_runs_and_can_be_polled(self, mock_obj, mock_input, mock_sim):
+        instance = mock_obj.return_value
+        instance.get_overlapping.return_value = self.fake_data
+        mock_sim.return_value = (1.0, 2.0, 3.0, 4.0)
+
+        job_id = self.submit(self.req).json()["data"]["id"]
+        self.assertTrue(JobQueue.run_next("test:1"))
+        self.assertFalse(JobQueue.run_next("test:1"))
+
+        response = self.c.get("/api/jobs/" + job_id + "?wait=5")
+        self.assertEqual(response.status_code, 200)
+        data_resp = response.json()["data"]
+        self.assertEqual(data_resp["status"], AnalysisJob.DONE)
+        self.assertEqual(data_resp["status_code"], 200)
+        self.assertEqual(len(data_resp["result"]["data"]["rows"]), 2)
+
+        ##A finished job is returned without running again
+        self.assertEqual(self.submit(self.req).json()["data"]["status"], "done")
+        self.assertFalse(JobQueue.run_next("test:1"))
+
+    @patch("api.jobs.JobQueue.execute")
+    def test_that_failed_job_is_queued_on_resubmit(self, mock_execute):
+        mock_execute.side_effect = RuntimeError
+        job_id = self.submit(self.req).json()["data"]["id"]
+        JobQueue.run_next("test:1")
+
+        data_resp = self.c.get("/api/jobs/" + job_id).json()["data"]
+        self.assertEqual(data_resp["status"], AnalysisJob.FAILED)
+        self.assertEqual(data_resp["status_code"], 500)
+        self.assertEqual(self.submit(self.req).json()["data"]["status"], "queued")
+
+    def test_that_jobs_of_dead_workers_are_requeued(self):
+        job_id = self.submit(self.req).json()["data"]["id"]
+        self.assertEqual(JobQueue.claim("test:1").attempts, 1)
+        self.assertIsNone(JobQueue.claim("test:2"))
+
+        self.assertEqual(JobQueue.requeue(["test:2"]), 0)
+        self.assertEqual(JobQueue.requeue(["test:1"]), 1)
+        for _ in range(2):
+            JobQueue.claim("test:1")
+            JobQueue.requeue(["test:1"])
+
+        ##Stopped its worker on every attempt
+        job = AnalysisJob.objects.get(id=job_id)
+        self.assertEqual(job.status, AnalysisJob.FAILED)
+        self.assertEqual(job.attempts, 3)
+
+    def test_that_bad_requests_throw_errors(self):
+        response = self.c.post(
+            "/api/jobs/pricecoveragesuggest", {}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 404)
+
+        response = self.c.post(
+            "/api/jobs/incomesimgrid", "{", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+        response = self.c.get("/api/jobs/00000000-0000-0000-0000-000000000000")
+        self.assertEqual(response.status_code, 404)
+
+        job_id = self.submit(self.req).json()["data"]["id"]
+        response = self.c.get("/api/jobs/" + job_id + "?wait=a")
+        self.assertEqual(response.status_code, 400)
+        for wait in ["nan", "inf", "-inf"]:
+            response = self.c.get("/api/jobs/" + job_id + "?wait=" + wait)
+            self.assertEqual(response.status_code, 400)
+
+    @patch("api.views.time.sleep")
+    def test_that_negative_wait_returns_immediately(self, mock_sleep):
+        job_id = self.submit(self.req).json()["data"]["id"]
+        response = self.c.get("/api/jobs/" + job_id + "?wait=-1")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"]["status"], AnalysisJob.QUEUED)
+        mock_sleep.assert_not_called()
+
+    @patch("api.views.time.sleep")
+    def test_that_polls_over_the_waiter_limit_return_immediately(self, mock_sleep):
+        job_id = self.submit(self.req).json()["data"]["id"]
+        with patch.object(JobQueue, "waiters", BoundedSemaphore(1)) as waiters:
+            ##Another poll is already waiting
+            waiters.acquire()
+            response = self.c.get("/api/jobs/" + job_id + "?wait=5")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["data"]["status"], AnalysisJob.QUEUED)
+            mock_sleep.assert_not_called()
+            waiters.release()
+
+            response = self.c.get("/api/jobs/" + job_id + "?wait=0.01")
+            self.assertEqual(response.status_code, 200)
+            mock_sleep.assert_called()
+            ##The waiting poll gave its place back
+            self.assertTrue(waiters.acquire(blocking=False))
+
+    def test_that_submissions_over_limits_are_refused(self):
+        with self.settings(JOB_MAX_CLIENT_JOBS=2, JOB_MAX_QUEUED=3):
+            for sim_length in [10, 20]:
+                self.req["data"]["sim_length"] = sim_length
+                self.assertEqual(self.submit(self.req).status_code, 202)
+
+            self.req["data"]["sim_length"] = 30
+            response = self.submit(self.req)
+            self.assertEqual(response.status_code, 429)
+            self.assertTrue(response.has_header("Retry-After"))
+            ##An existing job adds no work so is still returned
+            self.req["data"]["sim_length"] = 10
+            self.assertEqual(self.submit(self.req).status_code, 202)
+
+            for sim_length, status_code in [(30, 202), (40, 503)]:
+                self.req["data"]["sim_length"] = sim_length
+                response = self.c.post(
+                    "/api/jobs/incomesimgrid",
+                    self.req,
+                    content_type="application/json",
+                    REMOTE_ADDR="10.0.0.2",
+                )
+                self.assertEqual(response.status_code, status_code)
+        self.assertEqual(AnalysisJob.objects.count(), 3)
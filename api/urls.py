@@ -5,7 +5,13 @@ from api import views
 urlpatterns = [
     path("riskattribution", views.risk_attribution),
     path("backtest", views.alator_backtest),
+    path("backtestbatch", views.alator_batch_backtest),
+    path("backtestrollingstart", views.alator_rolling_start_backtest),
     path("incomesim", views.antevorta_simulation),
+    path("incomesimensemble", views.antevorta_ensemble_simulation),
+    path("incomesimgrid", views.antevorta_grid_simulation),
     path("pricecoveragesuggest", views.price_coverage_suggest),
     path("hypotheticaldrawdown", views.hypothetical_drawdown_simulation),
+    path("jobs/<uuid:job_id>", views.job_status),
+    path("jobs/<str:endpoint>", views.job_submit),
 ]
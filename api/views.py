@@ -1,26 +1,45 @@
+import json
+import math
+import time
 from typing import Any, Dict, List
 
+from django.conf import settings
 from django.http import HttpRequest, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_GET, require_POST
 
-from api.decorators import alator_input, antevorta_input, regression_input
-from api.models import Coverage
+from api.decorators import (
+    alator_batch_input,
+    alator_input,
+    antevorta_input,
+    antevorta_grid_input,
+    regression_input,
+    result_cache,
+)
+from api.jobs import JobClientLimitException, JobQueue, JobQueueFullException
+from api.models import AnalysisJob, Coverage
 from helpers import analysis, prices
 from helpers.alator import (
+    AlatorBatchClientInput,
     AlatorClientInput,
+    AlatorRollingStartClientInput,
     AlatorUnusableInputException,
     FixedSignalBackTestWithPriceAPI,
+    FixedSignalBatchBackTestWithPriceAPI,
 )
 from helpers.analysis.drawdown import HistoricalDrawdownEstimatorResult
 from helpers.analysis.riskattribution import (
     BootstrapRiskAttributionResult,
+    RegressionInput,
+    RiskAttributionDefinition,
     RiskAttributionResult,
     RollingRegressionInput,
     RollingRiskAttributionResult,
 )
 from helpers.antevorta import (
     AntevortaClientInput,
+    AntevortaEnsembleClientInput,
+    AntevortaGridClientInput,
     AntevortaUnusableInputException,
     AntevortaInsufficientDataException,
     DefaultSimulationWithPriceAPI,
@@ -66,15 +85,98 @@ def antevorta_simulation(
         return ErrorResponse.create(503, "Couldn't complete simulation")
 
 
+@csrf_exempt  # type: ignore
+@require_POST  # type: ignore
+@antevorta_input(has_runs=True)
+def antevorta_ensemble_simulation(
+    request: HttpRequest, antevorta: AntevortaEnsembleClientInput
+) -> JsonResponse:
+    """
+    Parameters
+    --------
+    data : `Dict[assets : List[int], weights : List[float]], initial_cash: float, wage: float, income_growth: float, runs: int`
+      Assets and weights to run static benchmark against, the simulation is
+      run runs times
+
+    Returns
+    --------
+    200
+      Income simulations run successfully and return percentiles of each
+      account across runs
+    400
+      Client passes an input that is does not have any required parameters
+    404
+      Client passes a valid input but these can't be used to run a backtest
+    405
+      Client attempts a method other than POST
+    503
+      Couldn't connect to downstream API
+    """
+    try:
+        inc = DefaultSimulationWithPriceAPI(antevorta)
+        inc.run_ensemble(antevorta["runs"])
+        return JsonResponse({"data": dict(inc.ensemble_results)}, status=200)
+    except AntevortaUnusableInputException:
+        return ErrorResponse.create(404, "Backtest could not run with inputs")
+    except AntevortaInsufficientDataException as e:
+        return ErrorResponse.create(404, e.message)
+    except ConnectionError:
+        return ErrorResponse.create(503, "Couldn't complete simulation")
+
+
+@csrf_exempt  # type: ignore
+@require_POST  # type: ignore
+@antevorta_grid_input()
+def antevorta_grid_simulation(
+    request: HttpRequest, antevorta: AntevortaGridClientInput
+) -> JsonResponse:
+    """
+    Parameters
+    --------
+    data : `Dict[assets : List[int], weights : List[float]], initial_cash: float, wage: Grid, wage_growth: Grid, contribution_pct: Grid, emergency_cash_min: Grid, sim_length: Grid, runs: int`
+      Assets and weights to run static benchmark against, a Grid is a
+      number, a list of numbers or a range of start, stop and step. The
+      simulation is run runs times for every combination
+
+    Returns
+    --------
+    200
+      Income simulations run successfully and return one row for each
+      combination with the median of each account
+    400
+      Client passes an input that is does not have any required parameters
+    404
+      Client passes a valid input but these can't be used to run a backtest
+    405
+      Client attempts a method other than POST
+    503
+      Couldn't connect to downstream API
+    """
+    try:
+        inc = DefaultSimulationWithPriceAPI(antevorta)
+        inc.run_grid(antevorta["grid"], antevorta["runs"])
+        return JsonResponse({"data": dict(inc.grid_results)}, status=200)
+    except AntevortaUnusableInputException:
+        return ErrorResponse.create(404, "Backtest could not run with inputs")
+    except AntevortaInsufficientDataException as e:
+        return ErrorResponse.create(404, e.message)
+    except ConnectionError:
+        return ErrorResponse.create(503, "Couldn't complete simulation")
+
+
 @csrf_exempt  # type: ignore
 @require_POST  # type: ignore
 @alator_input()
+@result_cache("backtest")
 def alator_backtest(request: HttpRequest, alator: AlatorClientInput) -> JsonResponse:
     """
     Parameters
     --------
-    data : `Dict[assets : List[int], weights : List[float]]`
-      Assets and weights to run static benchmark against
+    data : `Dict[assets : List[int], weights : List[float], fast: bool]`
+      Assets and weights to run static benchmark against, fast is optional
+      and true uses the array backtest. It rebalances at every close and is
+      a separate model so results differ from panacea's, engine in the
+      response says which ran
 
     Returns
     --------
@@ -99,8 +201,90 @@ def alator_backtest(request: HttpRequest, alator: AlatorClientInput) -> JsonResp
         return ErrorResponse.create(503, "Couldn't complete backtest")
 
 
+@csrf_exempt  # type: ignore
+@require_POST  # type: ignore
+@alator_input(has_horizon=True)
+@result_cache("backtestrollingstart")
+def alator_rolling_start_backtest(
+    request: HttpRequest, alator: AlatorRollingStartClientInput
+) -> JsonResponse:
+    """
+    Parameters
+    --------
+    data : `Dict[assets : List[int], weights : List[float], horizon: int]`
+      Assets and weights to run static benchmark against from every start
+      date, horizon is optional and is the number of periods from each
+      start. Without horizon each start runs to the last date. Uses the array
+      backtest without trade costs
+
+    Returns
+    --------
+    200
+      Backtests run successfully and return cagr, vol and mdd for each start
+      date with a summary of their distribution
+    400
+      Client passes an input that is does not have any required parameters
+    404
+      Client passes a valid input but these can't be used to run a backtest
+    405
+      Client attempts a method other than POST
+    503
+      Couldn't connect to downstream API
+    """
+    try:
+        bt: FixedSignalBackTestWithPriceAPI = FixedSignalBackTestWithPriceAPI(alator)
+        bt.run_rolling_start(alator["horizon"])
+        return JsonResponse({"data": dict(bt.rolling_results)}, status=200)
+    except AlatorUnusableInputException:
+        return ErrorResponse.create(404, "Backtest could not run with inputs")
+    except ConnectionError:
+        return ErrorResponse.create(503, "Couldn't complete backtest")
+
+
+@csrf_exempt  # type: ignore
+@require_POST  # type: ignore
+@alator_batch_input()
+@result_cache("backtestbatch")
+def alator_batch_backtest(
+    request: HttpRequest, alator_batch: AlatorBatchClientInput
+) -> JsonResponse:
+    """
+    Parameters
+    --------
+    data : `Dict[assets : List[int], weights : List[List[float]], include_series: bool, fast: bool]`
+      Assets and each set of weights to run static benchmark against,
+      include_series is optional and false omits values, returns and dates.
+      fast is optional and true uses the array backtest, see alator_backtest
+
+    Returns
+    --------
+    200
+      Backtests run successfully and return performance numbers for each set
+      of weights, in the order given
+    400
+      Client passes an input that is does not have any required parameters
+    404
+      Client passes a valid input but these can't be used to run a backtest
+    405
+      Client attempts a method other than POST
+    503
+      Couldn't connect to downstream API
+    """
+    try:
+        bt: FixedSignalBatchBackTestWithPriceAPI = FixedSignalBatchBackTestWithPriceAPI(
+            alator_batch
+        )
+        bt.run()
+        return JsonResponse({"data": [dict(i) for i in bt.results]}, status=200)
+    except AlatorUnusableInputException:
+        return ErrorResponse.create(404, "Backtest could not run with inputs")
+    except ConnectionError:
+        return ErrorResponse.create(503, "Couldn't complete backtest")
+
+
 @regression_input(has_window=True)  # type: ignore
 @require_GET  # type: ignore
+@result_cache("riskattribution")  # type: ignore
 def risk_attribution(
     request: HttpRequest, regression: RollingRegressionInput, coverage: List[Coverage]
 ) -> JsonResponse:
@@ -125,17 +309,23 @@ def risk_attribution(
       Couldn't connect to downstream API
     """
     req: prices.PriceAPIRequestsMonthly = prices.PriceAPIRequestsMonthly(coverage)
-    model_prices: Dict[int, DataSource] = req.get()
 
     try:
+        model_prices: Dict[int, DataSource] = req.get()
+        ##Aligned data and the full sample fit are shared by every model
+        definition: RiskAttributionDefinition = RiskAttributionDefinition(
+            reg_input=RegressionInput(ind=regression["ind"], dep=regression["dep"]),
+            data=model_prices,
+        )
         rra: analysis.RollingRiskAttribution = analysis.RollingRiskAttribution(
             roll_input=regression,
             data=model_prices,
+            definition=definition,
         )
         rra_res: RollingRiskAttributionResult = rra.run()
 
         ra: analysis.RiskAttribution = analysis.RiskAttribution(
-            reg_input=regression, data=model_prices
+            reg_input=regression, data=model_prices, definition=definition
         )
         ra_res: RiskAttributionResult = ra.run()
 
@@ -143,6 +333,7 @@ def risk_attribution(
             analysis.BootstrapRiskAttributionAlt(
                 reg_input=regression,
                 data=model_prices,
+                definition=definition,
             )
         )
         bra_res: BootstrapRiskAttributionResult = bra.run()
@@ -171,6 +362,7 @@ def risk_attribution(
 
 @regression_input(has_window=False)  # type: ignore
 @require_GET  # type: ignore
+@result_cache("hypotheticaldrawdown", params=["threshold"])  # type: ignore
 def hypothetical_drawdown_simulation(
     request: HttpRequest, regression: RollingRegressionInput, coverage: List[Coverage]
 ) -> JsonResponse:
@@ -178,6 +370,8 @@ def hypothetical_drawdown_simulation(
     Parameters
     --------
     request: `HttpRequest`
+      Optional threshold query variables, drawdowns are returned for each.
+      Defaults to -0.1
     regression: `RollingRegressionInput`
     coverage: `List[Coverage]`
 
@@ -194,13 +388,29 @@ def hypothetical_drawdown_simulation(
     503
       Couldn't connect to downstream API
     """
+    thresholds: List[float] = []
+    for threshold in request.GET.getlist("threshold") or ["-0.1"]:
+        try:
+            value: float = float(threshold)
+        except ValueError:
+            value = float("nan")
+        if not -1 < value < 0:
+            return JsonResponse(
+                {
+                    "status": "false",
+                    "message": "Threshold must be a number between -1 and 0",
+                },
+                status=400,
+            )
+        thresholds.append(value)
+
     req: prices.PriceAPIRequestsMonthly = prices.PriceAPIRequestsMonthly(coverage)
-    model_prices: Dict[int, DataSource] = req.get()
 
     try:
+        model_prices: Dict[int, DataSource] = req.get()
         hde: analysis.HistoricalDrawdownEstimatorFromDataSources = (
             analysis.HistoricalDrawdownEstimatorFromDataSources(
-                reg_input=regression, model_prices=model_prices, threshold=-0.1
+                reg_input=regression, model_prices=model_prices, threshold=thresholds
             )
         )
         res: HistoricalDrawdownEstimatorResult = hde.get_results()
@@ -253,3 +463,110 @@ def price_coverage_suggest(request: HttpRequest) -> JsonResponse:
         },
         status=200,
     )
+
+
+def job_response(job: AnalysisJob, status: int) -> JsonResponse:
+    res: Dict[str, Any] = {"id": str(job.id), "status": job.status}
+    if job.status in [AnalysisJob.DONE, AnalysisJob.FAILED]:
+        res["status_code"] = job.status_code
+        res["result"] = json.loads(job.result)
+    return JsonResponse({"data": res}, status=status)
+
+
+@csrf_exempt  # type: ignore
+@require_POST  # type: ignore
+def job_submit(request: HttpRequest, endpoint: str) -> JsonResponse:
+    """
+    Parameters
+    --------
+    request: `HttpRequest`
+      Query string and body of a request to endpoint, identical requests
+      return the same job
+    endpoint: `str`
+      Analysis endpoint to run, one of JobQueue.endpoints
+
+    Returns
+    --------
+    202
+      Job is queued, or has already run, and can be polled at /api/jobs/id
+    400
+      Client passes a body that isn't JSON to a POST endpoint
+    404
+      Endpoint can't be run as a job
+    405
+      Client attempts a method other than POST
+    429
+      Client has JOB_MAX_CLIENT_JOBS jobs queued or running
+    503
+      JOB_MAX_QUEUED jobs are already queued
+    """
+    if endpoint not in JobQueue.endpoints:
+        return ErrorResponse.create(404, "Endpoint can't be run as a job")
+
+    try:
+        job: AnalysisJob = JobQueue.submit(
+            endpoint,
+            request.META.get("QUERY_STRING", ""),
+            request.body.decode("utf-8"),
+            request.META.get("REMOTE_ADDR", ""),
+        )
+    except ValueError:
+        return ErrorResponse.create(400, "Client passed invalid JSON")
+    except (JobQueueFullException, JobClientLimitException) as e:
+        status: int = 503 if isinstance(e, JobQueueFullException) else 429
+        response: JsonResponse = ErrorResponse.create(status, e.message)
+        response["Retry-After"] = str(int(settings.JOB_MAX_WAIT))
+        return response
+    return job_response(job, 202)
+
+
+@require_GET  # type: ignore
+def job_status(request: HttpRequest, job_id: str) -> JsonResponse:
+    """
+    Parameters
+    --------
+    request: `HttpRequest`
+      Optional wait query variable, seconds to wait for the job to finish
+      before responding. Clamped to between zero and JOB_MAX_WAIT, the
+      response is immediate when JOB_MAX_WAITERS polls are already waiting
+      in this process so the client should poll again
+    job_id: `str`
+
+    Returns
+    --------
+    200
+      Status of the job, with the status code and content of the endpoint
+      response once it has finished
+    400
+      Client passes a wait that isn't a finite number
+    404
+      Job doesn't exist or has been purged
+    405
+      Client attempts a method other than GET
+    """
+    try:
+        wait: float = float(request.GET.get("wait", 0))
+    except ValueError:
+        return ErrorResponse.create(400, "Wait must be a number")
+    if not math.isfinite(wait):
+        return ErrorResponse.create(400, "Wait must be a number")
+    wait = max(0.0, min(wait, settings.JOB_MAX_WAIT))
+
+    try:
+        job: AnalysisJob = AnalysisJob.objects.get(id=job_id)
+    except AnalysisJob.DoesNotExist:
+        return ErrorResponse.create(404, "Job not found")
+
+    ##Waiting holds this request thread, so only a few polls wait at once
+    waiting: bool = wait > 0 and JobQueue.waiters.acquire(blocking=False)
+    try:
+        deadline: float = time.monotonic() + (wait if waiting else 0.0)
+        while job.status in [AnalysisJob.QUEUED, AnalysisJob.RUNNING]:
+            if time.monotonic() >= deadline:
+                break
+            time.sleep(settings.JOB_POLL_INTERVAL)
+            job.refresh_from_db()
+    finally:
+        if waiting:
+            JobQueue.waiters.release()
+    return job_response(job, 200)
@@ -1,11 +1,23 @@
-from .fixedweight import FixedSignalBackTestWithPriceAPI
+from .fixedweight import (
+    FixedSignalBackTestWithPriceAPI,
+    FixedSignalBatchBackTestWithPriceAPI,
+)
+from .fastpath import FixedWeightArrayBackTest
+from .rollingstart import RollingStartBackTest
 from .base import (
     AlatorUnusableInputException,
     AlatorClientInput,
+    AlatorBatchClientInput,
+    AlatorRollingStartClientInput,
 )
 
 __all__ = [
     "FixedSignalBackTestWithPriceAPI",
+    "FixedSignalBatchBackTestWithPriceAPI",
+    "FixedWeightArrayBackTest",
+    "RollingStartBackTest",
     "AlatorUnusableInputException",
     "AlatorClientInput",
+    "AlatorBatchClientInput",
+    "AlatorRollingStartClientInput",
 ]
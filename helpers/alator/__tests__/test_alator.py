@@ -1,14 +1,18 @@
 from typing import Dict
 from django.test import SimpleTestCase
 from unittest.mock import patch, Mock
+import numpy as np
 
+from helpers.analysis.executor import AnalysisExecutor
 from helpers.prices.data import FakeData, InvestPySource
 
 from ..fixedweight import (
     FixedSignalBackTestWithPriceAPI,
+    FixedSignalBatchBackTestWithPriceAPI,
 )
 from ..base import (
     AlatorUnusableInputException,
+    AlatorBatchClientInput,
     AlatorClientInput,
 )
 from api.models import Coverage
@@ -49,7 +53,7 @@ class TestFixedSignalBackTestWithPriceAPI(SimpleTestCase):
 
         mock1.get_overlapping.side_effect = ConnectionError("foo")
         self.assertRaises(
-            AlatorUnusableInputException,
+            ConnectionError,
             bt.run,
         )
 
@@ -137,3 +141,108 @@ class TestFixedSignalBackTestWithPriceAPI(SimpleTestCase):
         self.assertTrue(bt.results["cagr"])
         self.assertTrue(bt.results["sharpe"])
         return
+
+
+class TestFixedSignalBatchBackTestWithPriceAPI(SimpleTestCase):
+    def setUp(self):
+        self.data: Dict[int, InvestPySource] = {}
+        self.data[0] = FakeData.get_investpy(1, 0.01, 100)
+        self.data[1] = FakeData.get_investpy(2, 0.02, 100)
+        self.bt_res = (0.1, 0.02, 0.15, -0.2, 0.5, [1.0, 1.1], [0.0, 0.1], [1, 2])
+        return
+
+    @patch("helpers.alator.fixedweight.alator_backtest")
+    @patch("helpers.alator.fixedweight.AlatorInput")
+    @patch("helpers.alator.fixedweight.Coverage")
+    @patch("helpers.alator.fixedweight.prices.PriceAPIRequests")
+    def test_that_prices_are_loaded_once_for_every_portfolio(
+        self, mock_price, mock_coverage, mock_input, mock_backtest
+    ):
+        mock = Mock()
+        mock.filter.return_value = [Coverage(id=0), Coverage(id=1)]
+        mock_coverage.objects = mock
+
+        mock1 = Mock()
+        mock1.get_overlapping.return_value = self.data
+        mock_price.return_value = mock1
+        mock_backtest.return_value = self.bt_res
+
+        batch_input = AlatorBatchClientInput(
+            assets=[0, 1],
+            weights=[[0.6, 0.4], [0.7, 0.3], [0.8, 0.2]],
+            include_series=True,
+        )
+        bt = FixedSignalBatchBackTestWithPriceAPI(batch_input, AnalysisExecutor())
+        bt.run()
+
+        self.assertEqual(mock1.get_overlapping.call_count, 1)
+        self.assertEqual(mock_backtest.call_count, 3)
+        self.assertEqual(
+            [call.kwargs["weights"] for call in mock_input.call_args_list],
+            [{"0": 0.6, "1": 0.4}, {"0": 0.7, "1": 0.3}, {"0": 0.8, "1": 0.2}],
+        )
+        self.assertEqual(len(bt.results), 3)
+        self.assertEqual(bt.results[0]["cagr"], 2.0)
+        self.assertEqual(bt.results[0]["values"], [1.0, 1.1])
+
+        ##Prices reach panacea as arrays that it reads as buffers
+        kwargs = mock_input.call_args.kwargs
+        self.assertEqual(kwargs["dates"].dtype, np.int64)
+        for close in kwargs["close"].values():
+            self.assertEqual(close.dtype, np.float64)
+            self.assertTrue(close.flags["C_CONTIGUOUS"])
+        return
+
+    @patch("helpers.alator.fixedweight.alator_backtest")
+    @patch("helpers.alator.fixedweight.AlatorInput")
+    @patch("helpers.alator.fixedweight.Coverage")
+    @patch("helpers.alator.fixedweight.prices.PriceAPIRequests")
+    def test_that_series_can_be_omitted(
+        self, mock_price, mock_coverage, mock_input, mock_backtest
+    ):
+        mock = Mock()
+        mock.filter.return_value = [Coverage(id=0), Coverage(id=1)]
+        mock_coverage.objects = mock
+
+        mock1 = Mock()
+        mock1.get_overlapping.return_value = self.data
+        mock_price.return_value = mock1
+        mock_backtest.return_value = self.bt_res
+
+        batch_input = AlatorBatchClientInput(
+            assets=[0, 1],
+            weights=[[0.6, 0.4], [0.7, 0.3]],
+            include_series=False,
+        )
+        bt = FixedSignalBatchBackTestWithPriceAPI(batch_input, AnalysisExecutor())
+        bt.run()
+
+        self.assertEqual(len(bt.results), 2)
+        for res in bt.results:
+            self.assertEqual(
+                set(res), {"engine", "ret", "cagr", "vol", "mdd", "sharpe"}
+            )
+        return
+
+    @patch("helpers.alator.fixedweight.Coverage")
+    @patch("helpers.alator.fixedweight.prices.PriceAPIRequests")
+    def test_that_errors_from_investpy_are_handled(self, mock_price, mock_coverage):
+        mock = Mock()
+        mock.filter.return_value = [Coverage(id=0), Coverage(id=1)]
+        mock_coverage.objects = mock
+
+        mock1 = Mock()
+        mock1.get_overlapping.side_effect = ConnectionError("foo")
+        mock_price.return_value = mock1
+
+        batch_input = AlatorBatchClientInput(
+            assets=[0, 1],
+            weights=[[0.5, 0.5]],
+            include_series=True,
+        )
+        bt = FixedSignalBatchBackTestWithPriceAPI(batch_input, AnalysisExecutor())
+        self.assertRaises(ConnectionError, bt.run)
+
+        mock1.get_overlapping.side_effect = ValueError("foo")
+        self.assertRaises(AlatorUnusableInputException, bt.run)
+        return
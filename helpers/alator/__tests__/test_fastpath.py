@@ -0,0 +1,144 @@
+from django.test import SimpleTestCase
+import math
+from unittest.mock import patch
+import numpy as np
+
+from helpers.prices.data import FakeData
+
+from ..fastpath import FixedWeightArrayBackTest
+
+
+class TestFixedWeightArrayBackTest(SimpleTestCase):
+    def setUp(self):
+        self.assets = ["0", "1"]
+        self.dates = [i * 86400 for i in range(5)]
+        self.close = {
+            "0": [100.0, 110.0, 99.0, 99.0, 120.0],
+            "1": [50.0, 50.0, 55.0, 44.0, 44.0],
+        }
+        self.signal = {"0": 0.6, "1": 0.4}
+        return
+
+    def test_that_portfolio_is_rebalanced_every_period(self):
+        res = FixedWeightArrayBackTest.run(
+            self.assets, self.dates, self.close, self.signal
+        )
+
+        ##Two trades at the first close and at every close after
+        cost = FixedWeightArrayBackTest.trade_cost * 2
+        value = 100_000.0 - cost
+        values = [100_000.0]
+        for i in range(1, 5):
+            value *= 1 + sum(
+                weight * (self.close[asset][i] / self.close[asset][i - 1] - 1)
+                for asset, weight in self.signal.items()
+            )
+            value -= cost
+            values.append(value)
+
+        self.assertTrue(np.allclose(res[5], values))
+        self.assertAlmostEqual(res[0], values[-1] / values[0] - 1)
+        self.assertEqual(len(res[6]), 4)
+        self.assertEqual(res[7], [float(i) for i in self.dates])
+        return
+
+    def test_that_each_trade_is_charged(self):
+        with patch.object(FixedWeightArrayBackTest, "trade_cost", 0.0):
+            free = FixedWeightArrayBackTest.run(
+                self.assets, self.dates, self.close, self.signal
+            )
+        with patch.object(FixedWeightArrayBackTest, "trade_cost", 100.0):
+            charged = FixedWeightArrayBackTest.run(
+                self.assets, self.dates, self.close, self.signal
+            )
+            ##One asset without cash never drifts so is only bought once
+            single = FixedWeightArrayBackTest.run(
+                self.assets, self.dates, self.close, {"0": 1.0}
+            )
+
+        growth = free[5][1] / free[5][0]
+        self.assertAlmostEqual(charged[5][1], (100_000.0 - 200.0) * growth - 200.0)
+        self.assertLess(charged[5][-1], free[5][-1] - 200.0 * 5)
+        self.assertAlmostEqual(single[5][-1], (100_000.0 - 100.0) * 1.2)
+        return
+
+    def test_that_unallocated_weight_is_cash(self):
+        res = FixedWeightArrayBackTest.run(
+            self.assets, self.dates, self.close, {"0": 0.5}
+        )
+        self.assertAlmostEqual(res[6][0], 0.05)
+        self.assertAlmostEqual(res[6][1], -0.05)
+        return
+
+    def test_that_max_drawdown_is_from_peak(self):
+        res = FixedWeightArrayBackTest.run(
+            self.assets, self.dates, self.close, {"0": 1.0}
+        )
+        self.assertAlmostEqual(res[3], 99.0 / 110.0 - 1)
+        self.assertGreater(res[2], 0.0)
+        return
+
+
+class TestFixedWeightArrayBackTestAgainstLoop(SimpleTestCase):
+    def setUp(self):
+        data = [
+            FakeData.get_investpy(1, 0.01, 500, 10),
+            FakeData.get_investpy(2, 0.02, 500, 11),
+        ]
+        self.assets = ["0", "1"]
+        self.dates = [int(i) for i in data[0].get_dates()]
+        self.close = {
+            str(i): source.get_close()["Close"].to_list()
+            for i, source in enumerate(data)
+        }
+        return
+
+    def loop(self, signal):
+        """Values the portfolio one period at a time, trading every held
+        asset back to its weight at each close
+        """
+        held = [asset for asset, weight in signal.items() if weight != 0]
+        cost = FixedWeightArrayBackTest.trade_cost * len(held)
+        drifts = len(held) + (sum(signal.values()) < 1) > 1
+        value = FixedWeightArrayBackTest.initial_cash - cost
+        values = [FixedWeightArrayBackTest.initial_cash]
+        for i in range(1, len(self.dates)):
+            value *= 1 + sum(
+                signal[asset] * (self.close[asset][i] / self.close[asset][i - 1] - 1)
+                for asset in held
+            )
+            if drifts:
+                value -= cost
+            values.append(value)
+
+        returns = [values[i] / values[i - 1] - 1 for i in range(1, len(values))]
+        ret = values[-1] / values[0] - 1
+        years = (self.dates[-1] - self.dates[0]) / (365 * 86400)
+        mean = sum(returns) / len(returns)
+        vol = math.sqrt(
+            sum((r - mean) ** 2 for r in returns)
+            / (len(returns) - 1)
+            * FixedWeightArrayBackTest.periods_per_year
+        )
+        peak, mdd = values[0], 0.0
+        for value in values:
+            peak = max(peak, value)
+            mdd = min(mdd, value / peak - 1)
+        sharpe = (
+            sum(math.log1p(r) for r in returns)
+            / len(returns)
+            * FixedWeightArrayBackTest.periods_per_year
+            / vol
+        )
+        return ret, (1 + ret) ** (1 / years) - 1, vol, mdd, sharpe, values
+
+    def test_that_metrics_match_a_loop(self):
+        for signal in [{"0": 0.6, "1": 0.4}, {"0": 0.5, "1": 0.3}, {"0": 1.0}]:
+            fast = FixedWeightArrayBackTest.run(
+                self.assets, self.dates, self.close, signal
+            )
+            expected = self.loop(signal)
+            for i in range(5):
+                self.assertAlmostEqual(fast[i], expected[i], places=9)
+            self.assertTrue(np.allclose(fast[5], expected[5], rtol=1e-12, atol=0))
+        return
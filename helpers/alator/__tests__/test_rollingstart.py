@@ -0,0 +1,108 @@
+from django.test import SimpleTestCase
+from unittest.mock import patch
+import numpy as np
+
+from helpers.prices.data import FakeData
+
+from ..base import AlatorUnusableInputException
+from ..fastpath import FixedWeightArrayBackTest
+from ..rollingstart import RollingStartBackTest
+
+
+class TestRollingStartBackTest(SimpleTestCase):
+    def setUp(self):
+        data = [
+            FakeData.get_investpy(1, 0.01, 120, 10),
+            FakeData.get_investpy(2, 0.02, 120, 11),
+        ]
+        self.assets = ["0", "1"]
+        self.dates = [int(i) for i in data[0].get_dates()]
+        self.close = {
+            str(i): source.get_close()["Close"].to_list()
+            for i, source in enumerate(data)
+        }
+        self.signal = {"0": 0.7, "1": 0.3}
+        return
+
+    @patch.object(FixedWeightArrayBackTest, "trade_cost", 0.0)
+    def backtest_from(self, start, end):
+        return FixedWeightArrayBackTest.run(
+            self.assets,
+            self.dates[start : end + 1],
+            {k: v[start : end + 1] for k, v in self.close.items()},
+            self.signal,
+        )
+
+    def test_that_every_start_matches_a_separate_backtest(self):
+        res = RollingStartBackTest.run(self.assets, self.dates, self.close, self.signal)
+        last = len(self.dates) - 1
+        self.assertEqual(len(res["starts"]), last - 1)
+        self.assertEqual(res["starts"][0], self.dates[0])
+        for start in [0, 10, 50, last - 2]:
+            expected = self.backtest_from(start, last)
+            self.assertAlmostEqual(res["cagr"][start], expected[1] * 100)
+            self.assertAlmostEqual(res["vol"][start], expected[2] * 100)
+            self.assertAlmostEqual(res["mdd"][start], expected[3] * 100)
+        return
+
+    def test_that_fixed_horizon_matches_a_separate_backtest(self):
+        res = RollingStartBackTest.run(
+            self.assets, self.dates, self.close, self.signal, horizon=30
+        )
+        self.assertEqual(len(res["starts"]), len(self.dates) - 30)
+        for start in [0, 7, len(self.dates) - 31]:
+            expected = self.backtest_from(start, start + 30)
+            self.assertAlmostEqual(res["cagr"][start], expected[1] * 100)
+            self.assertAlmostEqual(res["vol"][start], expected[2] * 100)
+            self.assertAlmostEqual(res["mdd"][start], expected[3] * 100)
+
+        summary = res["summary"]["mdd"]
+        self.assertAlmostEqual(summary["min"], min(res["mdd"]))
+        self.assertAlmostEqual(summary["median"], float(np.median(res["mdd"])))
+        return
+
+    def test_that_mdd_is_the_same_in_chunks(self):
+        res = RollingStartBackTest.run(
+            self.assets, self.dates, self.close, self.signal, horizon=50
+        )
+        chunk_elements = RollingStartBackTest.chunk_elements
+        try:
+            RollingStartBackTest.chunk_elements = 500
+            chunked = RollingStartBackTest.run(
+                self.assets, self.dates, self.close, self.signal, horizon=50
+            )
+        finally:
+            RollingStartBackTest.chunk_elements = chunk_elements
+        self.assertEqual(res["mdd"], chunked["mdd"])
+        return
+
+    def test_that_mdd_to_end_matches_running_max(self):
+        values = np.array([5.0, 3.0, 4.0, 6.0, 2.0, 6.0, 7.0, 1.0, 7.0, 7.0])
+        expected = [
+            (values[i:] / np.maximum.accumulate(values[i:]) - 1).min()
+            for i in range(len(values))
+        ]
+        res = RollingStartBackTest._to_end_mdd(values)
+        self.assertTrue(np.allclose(res, expected))
+        return
+
+    def test_that_horizon_longer_than_data_throws_error(self):
+        self.assertRaises(
+            AlatorUnusableInputException,
+            RollingStartBackTest.run,
+            self.assets,
+            self.dates,
+            self.close,
+            self.signal,
+            len(self.dates),
+        )
+        self.assertRaises(
+            AlatorUnusableInputException,
+            RollingStartBackTest.run,
+            self.assets,
+            self.dates,
+            self.close,
+            self.signal,
+            1,
+        )
+        return
@@ -1,4 +1,4 @@
-from typing import List, TypedDict
+from typing import List, Optional, TypedDict
 
 
 class AlatorUnusableInputException(Exception):
@@ -11,16 +11,46 @@ class AlatorUnusableInputException(Exception):
 
 
 class AlatorClientInput(TypedDict):
+    """fast selects the array backtest over panacea's simulator"""
+
     assets: List[str]
     weights: List[float]
+    fast: bool
+
+
+class AlatorRollingStartClientInput(AlatorClientInput):
+    """horizon is the number of periods from each start, or None to run to
+    the last date
+    """
+
+    horizon: Optional[int]
+
+
+class AlatorBatchClientInput(TypedDict):
+    """One set of assets backtested with each of weights, include_series
+    is False when only the summary statistics are wanted
+    """
+
+    assets: List[str]
+    weights: List[List[float]]
+    include_series: bool
+    fast: bool
 
 
-class AlatorPerformanceOutput(TypedDict):
+class AlatorPerformanceSummary(TypedDict):
+    """engine is panacea, or array when FixedWeightArrayBackTest ran. The
+    array backtest is a separate model so its results differ from panacea's
+    """
+
+    engine: str
     ret: float
     cagr: float
     vol: float
     mdd: float
     sharpe: float
+
+
+class AlatorPerformanceOutput(AlatorPerformanceSummary):
     values: List[float]
     returns: List[float]
     dates: List[int]
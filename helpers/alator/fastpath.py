@@ -0,0 +1,123 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import numpy.typing as npt
+
+PerfResults = Tuple[
+    float, float, float, float, float, List[float], List[float], List[float]
+]
+
+
+class FixedWeightArrayBackTest:
+    """
+    Fixed weight backtest computed with array operations over the aligned
+    close prices rather than by panacea's event-driven simulator. The
+    portfolio is bought at the first close and rebalanced to the weights at
+    every close after, weight that isn't allocated is held as cash. Each
+    trade is charged trade_cost.
+
+    This is a separate model rather than a copy of panacea, which trades on
+    alator's own schedule, so results aren't expected to match panacea's.
+    Responses say which engine ran.
+
+    Returns a tuple laid out as panacea's alator_backtest: ret and cagr from
+    the first and last value, vol is the annualised sample stdev of returns,
+    mdd is the largest fall from a peak and sharpe is the annualised mean
+    log return over vol.
+
+    Attributes
+    ---------
+    initial_cash: `float`
+    trade_cost: `float`
+        Cash charged for each trade
+    periods_per_year: `int`
+        Used to annualise vol and sharpe
+    """
+
+    initial_cash: float = 100_000.0
+    trade_cost: float = 0.001
+    periods_per_year: int = 252
+
+    @staticmethod
+    def portfolio(
+        assets: List[str],
+        close: Dict[str, List[float]],
+        signal: Dict[str, float],
+        trade_cost: Optional[float] = None,
+    ) -> Tuple[npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+        """Returns the value of the portfolio at each date and the return
+        of each period, which has one less element. trade_cost defaults to
+        the class attribute.
+        """
+        if trade_cost is None:
+            trade_cost = FixedWeightArrayBackTest.trade_cost
+        prices: npt.NDArray[np.float64] = np.column_stack(
+            [np.asarray(close[asset], dtype=np.float64) for asset in assets]
+        )
+        weights: npt.NDArray[np.float64] = np.array(
+            [signal.get(asset, 0.0) for asset in assets], dtype=np.float64
+        )
+
+        asset_returns: npt.NDArray[np.float64] = (
+            prices[1:] / prices[:-1] - 1
+        ) @ weights
+
+        ##Every held asset is bought at the first close. Holdings drift
+        ##apart each period unless there is only one, including cash, so
+        ##every held asset is traded again at every close
+        held: int = np.count_nonzero(weights)
+        buy_cost: float = trade_cost * held
+        rebalance_cost: float = 0.0
+        if held + (weights.sum() < 1) > 1:
+            rebalance_cost = buy_cost
+
+        ##v[t] = v[t - 1] * (1 + r[t]) - cost is solved with cumulative
+        ##growth g as v[t] = g[t] * (v[0] - cost * sum(1 / g[1 : t + 1]))
+        growth: npt.NDArray[np.float64] = np.concatenate(
+            ([1.0], np.cumprod(1 + asset_returns))
+        )
+        bought: float = FixedWeightArrayBackTest.initial_cash - buy_cost
+        values: npt.NDArray[np.float64] = growth * (
+            bought - rebalance_cost * np.concatenate(([0.0], np.cumsum(1 / growth[1:])))
+        )
+        ##Value at the first close is the cash before the first trades
+        values[0] = FixedWeightArrayBackTest.initial_cash
+        returns: npt.NDArray[np.float64] = values[1:] / values[:-1] - 1
+        return values, returns
+
+    @staticmethod
+    def run(
+        assets: List[str],
+        dates: List[int],
+        close: Dict[str, List[float]],
+        signal: Dict[str, float],
+    ) -> PerfResults:
+        values, returns = FixedWeightArrayBackTest.portfolio(assets, close, signal)
+
+        ret: float = values[-1] / values[0] - 1
+        years: float = (dates[-1] - dates[0]) / (365 * 86400)
+        cagr: float = (1 + ret) ** (1 / years) - 1 if years > 0 else 0.0
+
+        annualise: float = np.sqrt(FixedWeightArrayBackTest.periods_per_year)
+        vol: float = returns.std(ddof=1) * annualise if len(returns) > 1 else 0.0
+
+        peak: npt.NDArray[np.float64] = np.maximum.accumulate(values)
+        mdd: float = min(float((values / peak - 1).min()), 0.0)
+
+        sharpe: float = 0.0
+        if vol > 0:
+            sharpe = (
+                np.log1p(returns).mean()
+                * FixedWeightArrayBackTest.periods_per_year
+                / vol
+            )
+        return (
+            float(ret),
+            float(cagr),
+            float(vol),
+            mdd,
+            float(sharpe),
+            values.tolist(),
+            returns.tolist(),
+            [float(date) for date in dates],
+        )
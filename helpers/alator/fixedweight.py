@@ -1,13 +1,22 @@
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import numpy.typing as npt
 from panacea import AlatorInput, alator_backtest
 
 from api.models import Coverage
 from helpers import prices
+from helpers.analysis.executor import AnalysisExecutor
 
 from .base import (
+    AlatorBatchClientInput,
     AlatorClientInput,
     AlatorPerformanceOutput,
+    AlatorPerformanceSummary,
     AlatorUnusableInputException,
 )
+from .fastpath import FixedWeightArrayBackTest
+from .rollingstart import RollingStartBackTest, RollingStartOutput
 
 
 class FixedSignalBackTestWithPriceAPI:
@@ -21,7 +30,11 @@ class FixedSignalBackTestWithPriceAPI:
     weights: `List[float]`
     coverage: `QuerySet[Coverage]`
     signal: `Dict[str, float]`
+    fast: `bool`
+        Use FixedWeightArrayBackTest rather than panacea
     results: `AlatorPerformanceOutput`
+    rolling_results: `RollingStartOutput`
+        Set by run_rolling_start
 
     Raises
     ---------
@@ -31,10 +44,20 @@ class FixedSignalBackTestWithPriceAPI:
         Failed to connect to InvestPySource
     """
 
-    def run(self):
-        price_request = prices.PriceAPIRequests(self.coverage)
+    @staticmethod
+    def load(
+        coverage: List[Coverage],
+    ) -> Tuple[npt.NDArray[np.int64], Dict[str, npt.NDArray[np.float64]]]:
+        """Returns the dates shared by every asset and the close prices of
+        each asset on those dates. Arrays are passed to panacea through the
+        buffer protocol rather than converted element by element.
+        """
+        price_request = prices.PriceAPIRequests(coverage)
         try:
             bt_sources = price_request.get_overlapping()
+        except ConnectionError:
+            ##Timeouts are left to the views, which return a 503
+            raise
         except Exception as exc:
             raise AlatorUnusableInputException from exc
 
@@ -42,35 +65,74 @@ class FixedSignalBackTestWithPriceAPI:
         close = {}
         for source in bt_sources:
             if dates is None:
-                dates = list(bt_sources[source].get_dates())
-            close[str(source)] = bt_sources[source].get_close()["Close"].to_list()
+                dates = np.asarray(bt_sources[source].get_dates(), dtype=np.int64)
+            close[str(source)] = (
+                bt_sources[source].get_close()["Close"].to_numpy(dtype=np.float64)
+            )
 
         if not close:
             raise AlatorUnusableInputException
 
-        coverage_ids = [str(c.id) for c in self.coverage]
-
-        if dates:
+        if dates is None or len(dates) == 0:
+            raise AlatorUnusableInputException
+        return dates, close
+
+    @staticmethod
+    def backtest(
+        assets: List[str],
+        dates: npt.NDArray[np.int64],
+        close: Dict[str, npt.NDArray[np.float64]],
+        signal: Dict[str, float],
+        include_series: bool = True,
+        fast: bool = False,
+    ) -> Union[AlatorPerformanceOutput, AlatorPerformanceSummary]:
+        """Runs one backtest on loaded prices, can be run by an
+        AnalysisExecutor
+        """
+        if fast:
+            bt_res = FixedWeightArrayBackTest.run(assets, dates, close, signal)
+        else:
             bt_in = AlatorInput(
-                assets=coverage_ids,
+                assets=assets,
                 dates=dates,
-                weights=self.signal,
+                weights=signal,
                 close=close,
             )
-        else:
-            raise AlatorUnusableInputException
-
-        bt_res = alator_backtest(bt_in)
-        self.results = AlatorPerformanceOutput(
+            bt_res = alator_backtest(bt_in)
+        summary = AlatorPerformanceSummary(
+            engine="array" if fast else "panacea",
             ret=bt_res[0] * 100,
             cagr=bt_res[1] * 100,
             vol=bt_res[2] * 100,
             mdd=bt_res[3] * 100,
             sharpe=bt_res[4],
+        )
+        if not include_series:
+            return summary
+        return AlatorPerformanceOutput(
+            **summary,
             values=bt_res[5],
             returns=bt_res[6],
             dates=bt_res[7],
         )
+
+    def run(self):
+        dates, close = FixedSignalBackTestWithPriceAPI.load(self.coverage)
+        coverage_ids = [str(c.id) for c in self.coverage]
+        self.results = FixedSignalBackTestWithPriceAPI.backtest(
+            coverage_ids, dates, close, self.signal, fast=self.fast
+        )
+        return
+
+    def run_rolling_start(self, horizon: Optional[int] = None) -> None:
+        """Backtests from every start date, to the last date or over horizon
+        periods, with RollingStartBackTest
+        """
+        dates, close = FixedSignalBackTestWithPriceAPI.load(self.coverage)
+        coverage_ids = [str(c.id) for c in self.coverage]
+        self.rolling_results: RollingStartOutput = RollingStartBackTest.run(
+            coverage_ids, dates, close, self.signal, horizon
+        )
         return
 
     def __init__(self, alator: AlatorClientInput):
@@ -87,5 +149,71 @@ class FixedSignalBackTestWithPriceAPI:
             raise AlatorUnusableInputException
 
         self.signal = {str(i): j for (i, j) in zip(alator["assets"], self.weights)}
+        self.fast = alator.get("fast", False)
+        self.results = None
+        return
+
+
+class FixedSignalBatchBackTestWithPriceAPI:
+    """Backtests one set of assets with many sets of weights. Prices are
+    loaded and aligned once, then each backtest is run by the executor.
+
+    Attributes
+    ---------
+    weights: `List[List[float]]`
+    coverage: `QuerySet[Coverage]`
+    signals: `List[Dict[str, float]]`
+    include_series: `bool`
+    fast: `bool`
+        Use FixedWeightArrayBackTest rather than panacea
+    executor: `AnalysisExecutor`
+        Runs the backtests, defaults to the executor in settings
+    results: `List[Union[AlatorPerformanceOutput, AlatorPerformanceSummary]]`
+        One result for each set of weights, in the same order
+
+    Raises
+    ---------
+    AlatorUnusableInputException
+        Valid input but some data is missing
+    ConnectionError
+        Failed to connect to InvestPySource
+    """
+
+    def run(self):
+        dates, close = FixedSignalBackTestWithPriceAPI.load(self.coverage)
+        coverage_ids = [str(c.id) for c in self.coverage]
+        self.results = self.executor.map(
+            FixedSignalBackTestWithPriceAPI.backtest,
+            [
+                (coverage_ids, dates, close, signal, self.include_series, self.fast)
+                for signal in self.signals
+            ],
+        )
+        return
+
+    def __init__(
+        self,
+        batch: AlatorBatchClientInput,
+        executor: Optional[AnalysisExecutor] = None,
+    ):
+        self.weights = batch["weights"]
+        try:
+            self.coverage = Coverage.objects.filter(id__in=batch["assets"])
+        except ValueError:
+            raise AlatorUnusableInputException
+
+        if not self.coverage:
+            raise AlatorUnusableInputException
+
+        if len(self.coverage) != len(batch["assets"]):
+            raise AlatorUnusableInputException
+
+        self.signals = [
+            {str(i): j for (i, j) in zip(batch["assets"], weights)}
+            for weights in self.weights
+        ]
+        self.include_series = batch["include_series"]
+        self.fast = batch.get("fast", False)
+        self.executor = executor or AnalysisExecutor.default()
         self.results = None
         return
@@ -0,0 +1,177 @@
+from typing import Dict, List, Optional, TypedDict
+
+import numpy as np
+import numpy.typing as npt
+
+from .base import AlatorUnusableInputException
+from .fastpath import FixedWeightArrayBackTest
+
+
+class RollingStartDistribution(TypedDict):
+    mean: float
+    min: float
+    p5: float
+    median: float
+    p95: float
+    max: float
+
+
+class RollingStartOutput(TypedDict):
+    horizon: Optional[int]
+    starts: List[int]
+    cagr: List[float]
+    vol: List[float]
+    mdd: List[float]
+    summary: Dict[str, RollingStartDistribution]
+
+
+class RollingStartBackTest:
+    """
+    Backtests a fixed weight portfolio from every start date, either to the
+    last date or over a fixed number of periods. The portfolio is valued
+    once as in FixedWeightArrayBackTest, every start is then a ratio of
+    values. Trade costs are left out as each start would pay for its own
+    first trades. Vol comes from cumulative sums of returns. Max drawdown to
+    the last date follows each start's next higher value, over a fixed
+    horizon it is a running max over a block of starts at a time.
+
+    Attributes
+    ---------
+    chunk_elements: `int`
+        Upper bound on the number of values held for the running max
+    """
+
+    chunk_elements: int = 2**22
+
+    @staticmethod
+    def _window_mdd(
+        values: npt.NDArray[np.float64],
+        starts: npt.NDArray[np.intp],
+        ends: npt.NDArray[np.intp],
+    ) -> npt.NDArray[np.float64]:
+        length: int = int((ends - starts).max()) + 1
+        chunk: int = max(1, RollingStartBackTest.chunk_elements // length)
+        offsets: npt.NDArray[np.intp] = np.arange(length)
+        res: npt.NDArray[np.float64] = np.empty(len(starts), dtype=np.float64)
+        for pos in range(0, len(starts), chunk):
+            block = slice(pos, pos + chunk)
+            ##Repeating the last value of shorter windows leaves both the
+            ##running max and the drawdown unchanged
+            idx: npt.NDArray[np.intp] = np.minimum(
+                starts[block, None] + offsets, ends[block, None]
+            )
+            window: npt.NDArray[np.float64] = values[idx]
+            peak: npt.NDArray[np.float64] = np.maximum.accumulate(window, axis=1)
+            res[block] = (window / peak - 1).min(axis=1)
+        return res
+
+    @staticmethod
+    def _to_end_mdd(values: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        """Max drawdown from each start to the last value. From start s the
+        peak is values[s] until the first later value at least as high, from
+        there the drawdown is the one already found for that value.
+        """
+        res: npt.NDArray[np.float64] = np.zeros(len(values), dtype=np.float64)
+        ##Indices of later values each higher than the one above it, with the
+        ##lowest value between each and the next
+        stack: List[int] = []
+        lows: List[float] = []
+        for start in range(len(values) - 1, -1, -1):
+            peak: float = values[start]
+            low: float = np.inf
+            while stack and values[stack[-1]] < peak:
+                low = min(low, values[stack.pop()], lows.pop())
+            mdd: float = min(low / peak - 1, 0.0)
+            if stack:
+                mdd = min(mdd, res[stack[-1]])
+            res[start] = mdd
+            stack.append(start)
+            lows.append(low)
+        return res
+
+    @staticmethod
+    def _summary(data: npt.NDArray[np.float64]) -> RollingStartDistribution:
+        p5, median, p95 = np.percentile(data, [5, 50, 95])
+        return RollingStartDistribution(
+            mean=float(data.mean()),
+            min=float(data.min()),
+            p5=float(p5),
+            median=float(median),
+            p95=float(p95),
+            max=float(data.max()),
+        )
+
+    @staticmethod
+    def run(
+        assets: List[str],
+        dates: List[int],
+        close: Dict[str, List[float]],
+        signal: Dict[str, float],
+        horizon: Optional[int] = None,
+    ) -> RollingStartOutput:
+        """Every start needs at least two returns, with a horizon each
+        window covers horizon returns. Metrics are percentages, as in
+        AlatorPerformanceOutput.
+        """
+        if horizon is not None and horizon < 2:
+            raise AlatorUnusableInputException
+
+        values, returns = FixedWeightArrayBackTest.portfolio(
+            assets, close, signal, trade_cost=0.0
+        )
+        last: int = len(values) - 1
+
+        if horizon is None:
+            starts: npt.NDArray[np.intp] = np.arange(max(last - 1, 0))
+            ends: npt.NDArray[np.intp] = np.full(len(starts), last)
+        else:
+            starts = np.arange(max(last - horizon + 1, 0))
+            ends = starts + horizon
+        if len(starts) == 0:
+            raise AlatorUnusableInputException
+
+        times: npt.NDArray[np.float64] = np.asarray(dates, dtype=np.float64)
+        years: npt.NDArray[np.float64] = (times[ends] - times[starts]) / (365 * 86400)
+        growth: npt.NDArray[np.float64] = values[ends] / values[starts]
+        cagr: npt.NDArray[np.float64] = np.where(
+            years > 0, growth ** (1 / np.where(years > 0, years, 1.0)) - 1, 0.0
+        )
+
+        ##Returns in a window are returns[start:end], demeaned so the
+        ##differences of cumulative sums stay accurate
+        demeaned: npt.NDArray[np.float64] = returns - returns.mean()
+        sums: npt.NDArray[np.float64] = np.concatenate(([0.0], np.cumsum(demeaned)))
+        squares: npt.NDArray[np.float64] = np.concatenate(
+            ([0.0], np.cumsum(demeaned**2))
+        )
+        count: npt.NDArray[np.intp] = ends - starts
+        window_sum: npt.NDArray[np.float64] = sums[ends] - sums[starts]
+        variance: npt.NDArray[np.float64] = (
+            squares[ends] - squares[starts] - window_sum**2 / count
+        ) / (count - 1)
+        vol: npt.NDArray[np.float64] = np.sqrt(
+            np.maximum(variance, 0.0) * FixedWeightArrayBackTest.periods_per_year
+        )
+
+        mdd: npt.NDArray[np.float64]
+        if horizon is None:
+            mdd = RollingStartBackTest._to_end_mdd(values)[starts]
+        else:
+            mdd = RollingStartBackTest._window_mdd(values, starts, ends)
+
+        metrics: Dict[str, npt.NDArray[np.float64]] = {
+            "cagr": cagr * 100,
+            "vol": vol * 100,
+            "mdd": mdd * 100,
+        }
+        return RollingStartOutput(
+            horizon=horizon,
+            starts=[int(dates[i]) for i in starts],
+            cagr=metrics["cagr"].tolist(),
+            vol=metrics["vol"].tolist(),
+            mdd=metrics["mdd"].tolist(),
+            summary={
+                name: RollingStartBackTest._summary(data)
+                for name, data in metrics.items()
+            },
+        )
@@ -0,0 +1,53 @@
+from django.test import SimpleTestCase
+import numpy as np
+import statsmodels.api as sm
+
+from ..bootstrap import SemiParametricBootstrap
+
+
+class TestSemiParametricBootstrap(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.x = rng.normal(0, 1, (200, 2))
+        self.y = self.x @ np.array([1.0, -0.5]) + 0.2 + rng.normal(0, 1, 200)
+        return
+
+    def test_that_each_resample_matches_ols_on_resampled_residuals(self):
+        seed = np.random.SeedSequence(2)
+        params = SemiParametricBootstrap.sample_chunk(
+            3, seed, *SemiParametricBootstrap.fit(self.y, self.x)
+        )
+
+        x = sm.add_constant(self.x)
+        init = sm.OLS(self.y, x).fit()
+        rng = np.random.default_rng(seed)
+        for row in params:
+            draw = init.resid[rng.integers(0, len(self.y), size=len(self.y))]
+            expected = sm.OLS(init.fittedvalues + draw, x).fit().params
+            self.assertTrue(np.allclose(row, expected))
+        return
+
+    def test_that_chunked_draws_match_a_single_chunk(self):
+        full = SemiParametricBootstrap.sample_params(
+            self.y, self.x, 50, np.random.default_rng(3)
+        )
+        default_chunk = SemiParametricBootstrap.chunk_elements
+        try:
+            SemiParametricBootstrap.chunk_elements = len(self.y) * 7
+            chunked = SemiParametricBootstrap.sample_params(
+                self.y, self.x, 50, np.random.default_rng(3)
+            )
+        finally:
+            SemiParametricBootstrap.chunk_elements = default_chunk
+        self.assertEqual(chunked.shape, (50, 3))
+        self.assertTrue(np.allclose(full.mean(axis=0), chunked.mean(axis=0), atol=0.05))
+        return
+
+    def test_that_run_returns_interval_for_each_param(self):
+        res = SemiParametricBootstrap.run(
+            self.y, self.x, 1000, np.random.default_rng(4)
+        )
+        self.assertEqual(len(res.confidence_interval.low), 3)
+        interval = res.confidence_interval
+        self.assertTrue(np.all(interval.low < interval.high))
+        return
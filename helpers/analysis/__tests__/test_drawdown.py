@@ -1,7 +1,10 @@
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
+import numpy as np
+from panacea import max_dd_threshold_position, max_dd_threshold_position_batch
 
 from helpers.prices.data import FakeData
 from ..drawdown import (
+    HistoricalDrawdownEstimator,
     HistoricalDrawdownEstimatorFromDataSources,
     HistoricalDrawdownEstimatorNoFactorSourceException,
 )
@@ -71,3 +74,289 @@ class TestHistoricalDrawdownEstimator(TestCase):
         self.assertTrue(hde.drawdowns)
         self.assertTrue(hde.get_results())
         return
+
+    def test_that_number_of_sims_can_be_set(self):
+        reg_input = RegressionInput(
+            ind=[2],
+            dep=1,
+        )
+
+        hde = HistoricalDrawdownEstimatorFromDataSources(
+            reg_input=reg_input,
+            model_prices=self.fake_data,
+            threshold=-0.01,
+            seed=10,
+            sims=50,
+        )
+        self.assertEqual(hde.n, 50)
+        self.assertTrue(hde.get_results())
+        return
+
+    def test_that_each_threshold_matches_a_separate_run(self):
+        reg_input = RegressionInput(
+            ind=[2],
+            dep=1,
+        )
+
+        hde = HistoricalDrawdownEstimatorFromDataSources(
+            reg_input=reg_input,
+            model_prices=self.fake_data,
+            threshold=[-0.01, -0.05, -0.001],
+            seed=10,
+        )
+        self.assertEqual(
+            [i["threshold"] for i in hde.get_results()["thresholds"]],
+            [-0.01, -0.05, -0.001],
+        )
+        self.assertEqual(hde.drawdowns, hde.drawdowns_by_threshold[0]["drawdowns"])
+        for res in hde.get_results()["thresholds"]:
+            single = HistoricalDrawdownEstimatorFromDataSources(
+                reg_input=reg_input,
+                model_prices=self.fake_data,
+                threshold=res["threshold"],
+                seed=10,
+            )
+            self.assertEqual(res["drawdowns"], single.drawdowns)
+        return
+
+    def test_that_adaptive_sims_stop_within_limit(self):
+        reg_input = RegressionInput(
+            ind=[2],
+            dep=1,
+        )
+
+        hde = HistoricalDrawdownEstimatorFromDataSources(
+            reg_input=reg_input,
+            model_prices=self.fake_data,
+            threshold=-0.01,
+            seed=10,
+            sims=100,
+            tolerance=1e-12,
+            max_sims=300,
+        )
+        self.assertEqual(hde.get_results()["sims"], 300)
+        self.assertLess(hde.hypothetical_dd["path"].max(), 300)
+
+        hde = HistoricalDrawdownEstimatorFromDataSources(
+            reg_input=reg_input,
+            model_prices=self.fake_data,
+            threshold=-0.01,
+            seed=10,
+            sims=100,
+            tolerance=1.0,
+            max_sims=1000,
+        )
+        self.assertEqual(hde.get_results()["sims"], 200)
+        return
+
+    def test_that_sim_settings_are_validated(self):
+        reg_input = RegressionInput(
+            ind=[2],
+            dep=1,
+        )
+
+        for kwargs in [
+            {"sims": 0},
+            {"sims": -1, "tolerance": 0.01},
+            {"max_sims": 0, "tolerance": 0.01},
+            {"tolerance": 0.0},
+            {"tolerance": -0.01},
+            {"tolerance": float("nan")},
+        ]:
+            with self.assertRaises(ValueError):
+                HistoricalDrawdownEstimatorFromDataSources(
+                    reg_input=reg_input,
+                    model_prices=self.fake_data,
+                    threshold=-0.01,
+                    **kwargs,
+                )
+        return
+
+    def test_that_rare_groups_are_not_established(self):
+        reg_input = RegressionInput(
+            ind=[2],
+            dep=1,
+        )
+
+        hde = HistoricalDrawdownEstimatorFromDataSources(
+            reg_input=reg_input,
+            model_prices=self.fake_data,
+            threshold=-0.01,
+            seed=10,
+            sims=100,
+        )
+        established = hde.group_statistics()
+        counts = {
+            (threshold, start_idx, end_idx): len(dd_data)
+            for threshold, groups in hde.threshold_groups()
+            for start_idx, end_idx, dd_data in groups
+        }
+        for key, count in counts.items():
+            self.assertEqual(
+                key in established,
+                count >= HistoricalDrawdownEstimator.min_group_share * 100,
+            )
+        self.assertLess(len(established), len(counts))
+        return
+
+    def test_that_adaptive_sims_are_repeatable(self):
+        reg_input = RegressionInput(
+            ind=[2],
+            dep=1,
+        )
+
+        runs = [
+            HistoricalDrawdownEstimatorFromDataSources(
+                reg_input=reg_input,
+                model_prices=self.fake_data,
+                threshold=-0.01,
+                seed=4,
+                sims=100,
+                tolerance=0.01,
+            ).get_results()
+            for _ in range(2)
+        ]
+        self.assertEqual(runs[0], runs[1])
+        return
+
+
+class TestHistoricalDrawdownEstimatorAlgo(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        self.params = np.array([0.1, 0.8, -0.3, 0.5])
+        self.bse = np.array([0.05, 0.1, 0.2, 0.01])
+        self.ind_data = rng.normal(0, 1, (120, 3))
+        return
+
+    def test_that_sample_coefs_match_draws_per_param(self):
+        sample_coefs = HistoricalDrawdownEstimator.build_sample_coefs(
+            200, np.random.default_rng(5), self.params, self.bse
+        )
+
+        rng = np.random.default_rng(5)
+        expected = np.array(
+            [rng.normal(i, j, 200) for i, j in zip(self.params, self.bse)]
+        )
+        self.assertEqual(sample_coefs.shape, (4, 200))
+        self.assertTrue(np.array_equal(sample_coefs, expected))
+        return
+
+    def test_that_hypothetical_returns_match_sum_per_sim(self):
+        sample_coefs = HistoricalDrawdownEstimator.build_sample_coefs(
+            200, np.random.default_rng(5), self.params, self.bse
+        )
+        hypothetical_rets = HistoricalDrawdownEstimator.estimator_algo(
+            sample_coefs, self.ind_data
+        )
+
+        expected = np.array(
+            [np.sum(coefs[1:] * self.ind_data, axis=1) for coefs in sample_coefs.T]
+        )
+        self.assertEqual(hypothetical_rets.shape, (200, 120))
+        self.assertTrue(np.allclose(hypothetical_rets, expected))
+        return
+
+    def test_that_chunk_matches_drawdowns_of_each_path(self):
+        seed = np.random.SeedSequence(3)
+        res = HistoricalDrawdownEstimator.simulate_chunk(
+            50, seed, self.params, self.bse, self.ind_data, -0.01
+        )
+
+        sample_coefs = HistoricalDrawdownEstimator.build_sample_coefs(
+            50, np.random.default_rng(seed), self.params, self.bse
+        )
+        hypothetical_rets = HistoricalDrawdownEstimator.estimator_algo(
+            sample_coefs, self.ind_data
+        )
+        expected = [
+            (path, int(dd[0]), int(dd[1]), dd[2])
+            for path, rets in enumerate(hypothetical_rets)
+            for dd in max_dd_threshold_position(list(rets), -0.01)
+        ]
+        self.assertTrue(expected)
+        self.assertEqual(
+            list(
+                zip(
+                    res["path"].tolist(),
+                    res["start_idx"].tolist(),
+                    res["end_idx"].tolist(),
+                    res["dd_size"].tolist(),
+                )
+            ),
+            expected,
+        )
+        return
+
+    def test_that_batch_matches_each_path(self):
+        rets = np.random.default_rng(3).normal(0, 3, (50, 120))
+        res = max_dd_threshold_position_batch(rets, -0.05)
+        expected = [
+            (path, int(dd[0]), int(dd[1]), dd[2])
+            for path, row in enumerate(rets)
+            for dd in max_dd_threshold_position(row.tolist(), -0.05)
+        ]
+        self.assertTrue(expected)
+        self.assertEqual(list(zip(*res)), expected)
+        return
+
+    def test_that_batch_rejects_arrays_it_cant_read_in_place(self):
+        rets = np.random.default_rng(3).normal(0, 3, (10, 40))
+        for bad in [rets[:, ::2], rets.T, rets[0], rets.astype(np.float32)]:
+            with self.assertRaises((ValueError, BufferError)):
+                max_dd_threshold_position_batch(bad, -0.05)
+        return
+
+    def test_that_clusters_match_grouping_against_every_cluster(self):
+        rng = np.random.default_rng(8)
+        start_idx = rng.integers(0, 100, 2000)
+        end_idx = start_idx + rng.integers(1, 20, 2000)
+        dd_size = rng.uniform(-0.5, -0.01, 2000)
+
+        expected = {}
+        for dd in zip(start_idx.tolist(), end_idx.tolist(), dd_size.tolist()):
+            has_match = False
+            for k in expected:
+                if dd[0] > k[0] - 5 and dd[0] < k[0] + 5:
+                    has_match = True
+                    expected[k].append(dd[2])
+            if not has_match:
+                expected[(dd[0], dd[1])] = [dd[2]]
+
+        res = HistoricalDrawdownEstimator.cluster_drawdowns(start_idx, end_idx, dd_size)
+        self.assertEqual([(i[0], i[1]) for i in res], list(expected))
+        for (_, _, sizes), expected_sizes in zip(res, expected.values()):
+            self.assertEqual(len(sizes), len(expected_sizes))
+            self.assertAlmostEqual(sizes.mean(), np.mean(expected_sizes))
+            self.assertAlmostEqual(sizes.std(), np.std(expected_sizes))
+        return
+
+    def test_that_clusters_are_empty_without_drawdowns(self):
+        empty = np.array([], dtype=np.int64)
+        res = HistoricalDrawdownEstimator.cluster_drawdowns(
+            empty, empty, np.array([], dtype=np.float64)
+        )
+        self.assertEqual(res, [])
+        return
+
+    def test_that_only_established_groups_decide_convergence(self):
+        previous = {(-0.1, 3, 9): (-0.2, 0.05)}
+        ##A rare group isn't established so isn't compared
+        self.assertTrue(
+            HistoricalDrawdownEstimator.has_converged(
+                previous, {(-0.1, 3, 9): (-0.201, 0.05)}, 0.01
+            )
+        )
+        ##A group that becomes established has no previous statistics
+        self.assertFalse(
+            HistoricalDrawdownEstimator.has_converged(
+                previous,
+                {(-0.1, 3, 9): (-0.2, 0.05), (-0.1, 40, 50): (-0.3, 0.1)},
+                0.01,
+            )
+        )
+        self.assertFalse(
+            HistoricalDrawdownEstimator.has_converged(
+                previous, {(-0.1, 3, 9): (-0.25, 0.05)}, 0.01
+            )
+        )
+        return
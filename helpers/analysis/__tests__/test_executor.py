@@ -0,0 +1,80 @@
+from django.test import SimpleTestCase, override_settings
+import numpy as np
+
+from helpers.prices.data import FakeData
+from ..bootstrap import SemiParametricBootstrap
+from ..drawdown import HistoricalDrawdownEstimatorFromDataSources
+from ..executor import AnalysisExecutor, ProcessPoolAnalysisExecutor
+from ..riskattribution import RegressionInput
+
+
+class TestAnalysisExecutor(SimpleTestCase):
+    def test_that_runs_are_split_into_seeded_chunks(self):
+        executor = AnalysisExecutor()
+        chunks = executor.split(250, np.random.default_rng(1))
+        self.assertEqual([size for size, _ in chunks], [16] * 15 + [10])
+        seeds = [seed.generate_state(1)[0] for _, seed in chunks]
+        self.assertEqual(len(set(seeds)), 16)
+
+        again = executor.split(250, np.random.default_rng(1))
+        self.assertEqual(seeds, [seed.generate_state(1)[0] for _, seed in again])
+        return
+
+    def test_that_default_runs_are_split_across_workers(self):
+        executor = AnalysisExecutor()
+        ##Default of the bootstrap model and the smallest run counts
+        for runs, chunks in [(100, 10), (25, 3), (10, 1), (1, 1)]:
+            sizes = [size for size, _ in executor.split(runs, np.random.default_rng())]
+            self.assertEqual(len(sizes), chunks)
+            self.assertEqual(sum(sizes), runs)
+        return
+
+    @override_settings(ANALYSIS_EXECUTOR_WORKERS=0)
+    def test_that_default_is_serial_without_workers(self):
+        self.assertEqual(type(AnalysisExecutor.default()), AnalysisExecutor)
+        return
+
+
+class TestProcessPoolAnalysisExecutor(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.pool = ProcessPoolAnalysisExecutor(2)
+        return
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.pool.shutdown()
+        super().tearDownClass()
+        return
+
+    def test_that_pool_matches_serial_for_same_seed(self):
+        rng = np.random.default_rng(2)
+        x = rng.normal(0, 1, (120, 2))
+        y = x @ np.array([1.0, 2.0]) + rng.normal(0, 1, 120)
+
+        serial = SemiParametricBootstrap.sample_params(
+            y, x, 450, np.random.default_rng(3), AnalysisExecutor()
+        )
+        pooled = SemiParametricBootstrap.sample_params(
+            y, x, 450, np.random.default_rng(3), self.pool
+        )
+        self.assertEqual(serial.shape, (450, 3))
+        self.assertTrue(np.array_equal(serial, pooled))
+        return
+
+    def test_that_drawdown_estimator_runs_on_pool(self):
+        investpy = FakeData.get_investpy(100, 20, 1000, 4004)
+        investpy.convert_to_monthly()
+        data = {1: investpy, 2: FakeData.get_factor(0, 0.2, 200, 5)}
+        reg_input = RegressionInput(ind=[2], dep=1)
+
+        res = [
+            HistoricalDrawdownEstimatorFromDataSources(
+                reg_input, data, -0.01, seed=6, executor=executor
+            ).get_results()
+            for executor in [AnalysisExecutor(), self.pool]
+        ]
+        self.assertTrue(res[0]["drawdowns"])
+        self.assertEqual(res[0], res[1])
+        return
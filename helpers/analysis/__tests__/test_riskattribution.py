@@ -1,10 +1,14 @@
 from typing import Dict
+from unittest.mock import patch
 from django.test import SimpleTestCase
+import numpy as np
 import pandas as pd
+import statsmodels.api as sm
 
 from helpers.prices import InvestPySource
 from helpers.prices.data import FakeData
 
+from ..bootstrap import SemiParametricBootstrap
 from ..riskattribution import (
     BootstrapRiskAttributionAlt,
     RiskAttribution,
@@ -14,6 +18,7 @@ from ..riskattribution import (
     RiskAttributionUnusableInputException,
     RollingRegressionInput,
     RegressionInput,
+    RiskAttributionDefinition,
 )
 
 
@@ -24,6 +29,117 @@ def get_data() -> Dict[int, InvestPySource]:
     return res
 
 
+class TestRiskAttributionDefinition(SimpleTestCase):
+    def setUp(self):
+        self.data: Dict[int, InvestPySource] = get_data()
+        self.data[2] = FakeData.get_investpy(3, 0.3, 900)
+        return
+
+    def test_that_panel_columns_match_sources(self):
+        definition = RiskAttributionDefinition(
+            RegressionInput(dep=0, ind=[1, 2]), data=self.data
+        )
+        dates = definition.get_dates_union()
+        self.assertEqual(definition.panel.shape, (len(dates), 3))
+        for col, asset in enumerate([0, 1, 2]):
+            expected = self.data[asset].get_returns().loc[dates]["ret"].to_numpy()
+            self.assertTrue(np.array_equal(definition.panel[:, col], expected))
+        self.assertTrue(
+            np.array_equal(definition.get_ind_data()[:, 1], definition.panel[:, 2])
+        )
+        return
+
+    def test_that_data_and_windows_are_views_of_panel(self):
+        definition = RiskAttributionDefinition(
+            RegressionInput(dep=0, ind=[1, 2]), data=self.data
+        )
+        self.assertTrue(np.shares_memory(definition.get_dep_data(), definition.panel))
+        self.assertTrue(np.shares_memory(definition.get_ind_data(), definition.panel))
+
+        ra = RiskAttribution(RegressionInput(dep=0, ind=[1, 2]), data=self.data)
+        for dep, ind in ra.get_windows(5):
+            self.assertTrue(np.shares_memory(dep, ra.definition.panel))
+            self.assertTrue(np.shares_memory(ind, ra.definition.panel))
+            self.assertEqual(ind.shape, (5, 2))
+        return
+
+    def test_that_dates_subset_returns_matching_rows(self):
+        definition = RiskAttributionDefinition(
+            RegressionInput(dep=0, ind=[1]), data=self.data
+        )
+        dates = definition.get_dates_union()[10:20]
+        self.assertTrue(
+            np.array_equal(
+                definition.get_dep_data(dates), definition.get_dep_data()[10:20]
+            )
+        )
+        return
+
+    def test_that_dates_not_in_union_throw_error(self):
+        definition = RiskAttributionDefinition(
+            RegressionInput(dep=0, ind=[1]), data=self.data
+        )
+        dates = definition.get_dates_union()
+        for missing in [dates[10] + 1, dates[-1] + 1, dates[0] - 1]:
+            with self.assertRaises(KeyError):
+                definition.get_dep_data([dates[5], missing])
+            with self.assertRaises(KeyError):
+                definition.get_ind_data([missing])
+        return
+
+
+class TestSharedRiskAttributionDefinition(SimpleTestCase):
+    def setUp(self):
+        self.data: Dict[int, InvestPySource] = get_data()
+        self.regression = RollingRegressionInput(dep=0, ind=[1], window=5)
+        return
+
+    def test_that_models_share_one_definition_and_fit(self):
+        definition = RiskAttributionDefinition(
+            RegressionInput(dep=0, ind=[1]), data=self.data
+        )
+        with patch.object(
+            SemiParametricBootstrap, "fit", wraps=SemiParametricBootstrap.fit
+        ) as fit:
+            models = [
+                RollingRiskAttribution(self.regression, self.data, definition),
+                RiskAttribution(self.regression, self.data, definition),
+                BootstrapRiskAttributionAlt(
+                    self.regression, self.data, definition=definition
+                ),
+            ]
+            for model in models:
+                self.assertIs(model.definition, definition)
+                model.run()
+        self.assertEqual(fit.call_count, 1)
+        return
+
+    def test_that_shared_results_match_separate_results(self):
+        definition = RiskAttributionDefinition(
+            RegressionInput(dep=0, ind=[1]), data=self.data
+        )
+        shared = RiskAttribution(self.regression, self.data, definition).run()
+        separate = RiskAttribution(self.regression, self.data).run()
+        self.assertEqual(shared, separate)
+
+        dep = definition.get_dep_data()
+        ind = definition.get_ind_data()
+        expected = sm.OLS(dep, sm.add_constant(ind)).fit()
+        coef = shared["regression"]["coefficients"][0]
+        self.assertAlmostEqual(shared["regression"]["intercept"], expected.params[0])
+        self.assertAlmostEqual(coef["coef"], expected.params[1])
+        self.assertAlmostEqual(coef["error"], expected.bse[1])
+        return
+
+    def test_that_definition_for_other_input_is_rejected(self):
+        definition = RiskAttributionDefinition(
+            RegressionInput(dep=1, ind=[0]), data=self.data
+        )
+        with self.assertRaises(ValueError):
+            RiskAttribution(self.regression, self.data, definition)
+        return
+
+
 class TestBootstrapRiskAttributionAlt(SimpleTestCase):
     def setUp(self):
         self.data: Dict[int, InvestPySource] = get_data()
@@ -36,6 +152,17 @@ class TestBootstrapRiskAttributionAlt(SimpleTestCase):
         res = ra.run()
         return
 
+    def test_that_seeded_bootstrap_is_repeatable(self):
+        res = [
+            BootstrapRiskAttributionAlt(
+                RegressionInput(dep=0, ind=[1]), data=self.data, runs=500, seed=5
+            ).run()
+            for _ in range(2)
+        ]
+        self.assertEqual(res[0], res[1])
+        self.assertTrue(res[0]["intercept"]["lower"] < res[0]["intercept"]["upper"])
+        return
+
 
 class TestBootstrapRiskAttribution(SimpleTestCase):
     def setUp(self):
@@ -100,6 +227,24 @@ class TestRollingRiskAttribution(SimpleTestCase):
         self.assertTrue(last in res["dates"])
         return
 
+    def test_that_error_is_standard_error_of_coefficient(self):
+        ra = RollingRiskAttribution(
+            RollingRegressionInput(
+                dep=0,
+                ind=[1],
+                window=5,
+            ),
+            data=self.data,
+        )
+        res = ra.run()
+        dep = ra.definition.get_dep_data()[:5]
+        ind = ra.definition.get_ind_data()[:5]
+        expected = sm.OLS(dep, sm.add_constant(ind)).fit()
+        first = res["regressions"][0]["coefficients"][0]
+        self.assertAlmostEqual(first["coef"], expected.params[1])
+        self.assertAlmostEqual(first["error"], expected.bse[1])
+        return
+
     def test_that_rolling_riskattribution_works_with_factor_source(self):
         self.data[3] = FakeData.get_factor(1, 0.1, 100)
         ra = RollingRiskAttribution(
@@ -0,0 +1,35 @@
+from django.test import SimpleTestCase
+import numpy as np
+import statsmodels.api as sm
+
+from ..rolling import RollingOLS
+
+
+class TestRollingOLS(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(10)
+        self.ind = rng.normal(100, 5, (300, 2))
+        self.dep = self.ind @ np.array([0.5, 1.5]) + rng.normal(0, 1, 300)
+        return
+
+    def test_that_results_match_statsmodels_for_every_window(self):
+        window = 20
+        rolling = RollingOLS(self.dep, self.ind, window)
+        self.assertEqual(len(rolling.params), len(self.dep) - window)
+
+        for i in range(len(self.dep) - window):
+            dep = self.dep[i : i + window]
+            ind = self.ind[i : i + window]
+            res = sm.OLS(dep, sm.add_constant(ind)).fit()
+            self.assertTrue(np.allclose(rolling.params[i], res.params, rtol=1e-8))
+            self.assertTrue(np.allclose(rolling.bse[i], res.bse, rtol=1e-8))
+            self.assertTrue(
+                np.allclose(rolling.means[i], [*ind.mean(axis=0), dep.mean()])
+            )
+        return
+
+    def test_that_errors_are_nan_without_degrees_of_freedom(self):
+        rolling = RollingOLS(self.dep, self.ind, 3)
+        self.assertTrue(np.all(np.isnan(rolling.bse)))
+        self.assertTrue(np.all(np.isfinite(rolling.params)))
+        return
@@ -1,35 +1,123 @@
-from typing import Generator, Optional
+from typing import Any, Optional, Tuple
 import numpy as np
 import numpy.typing as npt
-import statsmodels.api as sm
 from scipy.stats import bootstrap
 
+from .executor import AnalysisExecutor
+
+OLSFit = Tuple[
+    npt.NDArray[np.float64], npt.NDArray[np.float64], npt.NDArray[np.float64]
+]
+
 
 class SemiParametricBootstrap:
+    """
+    Residual bootstrap of OLS coefficients. The design matrix is the same
+    for every resample so it is factorised once, each resample is then
+    the initial fit plus pinv(X) applied to a draw of the residuals. Draws
+    are solved in chunks so memory stays bounded as runs grows.
+    """
+
+    ##Upper bound on the number of residual draws held at once
+    chunk_elements: int = 2**22
+
+    @staticmethod
+    def fit(y: npt.NDArray[np.float64], x: npt.NDArray[np.float64]) -> OLSFit:
+        """Returns the coefficients, residuals and pinv of the design matrix
+        with a constant added.
+        """
+        rows: int = len(y)
+        x_with_constant: npt.NDArray[np.float64] = np.column_stack(
+            (np.ones(rows), x.reshape(rows, -1))
+        )
+        x_pinv: npt.NDArray[np.float64] = np.linalg.pinv(x_with_constant)
+        params: npt.NDArray[np.float64] = x_pinv @ y
+        resid: npt.NDArray[np.float64] = y - x_with_constant @ params
+        return params, resid, x_pinv
+
+    @staticmethod
+    def sample_chunk(
+        runs: int,
+        seed: np.random.SeedSequence,
+        params: npt.NDArray[np.float64],
+        resid: npt.NDArray[np.float64],
+        x_pinv: npt.NDArray[np.float64],
+    ) -> npt.NDArray[np.float64]:
+        """Kernel for AnalysisExecutor, returns the coefficients of each
+        resample with shape (runs, number of coefficients).
+        """
+        rng: np.random.Generator = np.random.default_rng(seed)
+        rows: int = len(resid)
+        res: npt.NDArray[np.float64] = np.empty(
+            shape=(runs, len(params)), dtype=np.float64
+        )
+        chunk: int = max(1, SemiParametricBootstrap.chunk_elements // max(rows, 1))
+        for start in range(0, runs, chunk):
+            size: int = min(chunk, runs - start)
+            draws: npt.NDArray[np.float64] = resid[
+                rng.integers(0, rows, size=(size, rows))
+            ]
+            res[start : start + size] = params + draws @ x_pinv.T
+        return res
+
+    @staticmethod
+    def sample_params(
+        y: npt.NDArray[np.float64],
+        x: npt.NDArray[np.float64],
+        runs: int = 100,
+        rng: Optional[np.random.Generator] = None,
+        executor: Optional[AnalysisExecutor] = None,
+    ) -> npt.NDArray[np.float64]:
+        """Returns the coefficients of each resample, shape (runs, number of
+        independent variables + 1) with the intercept in the first column.
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        if executor is None:
+            executor = AnalysisExecutor()
+
+        chunks = executor.replicate(
+            SemiParametricBootstrap.sample_chunk,
+            runs,
+            rng,
+            *SemiParametricBootstrap.fit(y, x),
+        )
+        return np.concatenate(chunks)
+
     @staticmethod
     def run(
         y: npt.NDArray[np.float64],
         x: npt.NDArray[np.float64],
-        runs: Optional[int] = 100,
-    ) -> None:
-        np.set_printoptions(precision=3)
-        x_with_constant: npt.NDArray[np.float64] = sm.add_constant(x)
-        init_reg: sm.OLS = sm.OLS(y, x_with_constant)
-        init_res: sm.regression.linear_model.RegressionResult = init_reg.fit()
-        resid: npt.NDArray[np.float64] = init_res.resid
-        temp_params: npt.NDArray[np.float64] = init_res.params
-        pred: npt.NDArray[np.float64] = init_reg.predict(temp_params)
-
-        rng: Generator = np.random.default_rng()
-        temp = np.array([])
-        for i in range(runs):
-            t: npt.NDArray[np.float64] = rng.choice(a=resid, size=len(y), replace=True)
-            # y_star = np.dot(x_with_constant, temp_params) + t
-            y_star = pred + t
-
-            reg = sm.OLS(y_star, x_with_constant)
-            res = reg.fit()
-            temp_params = res.params
-            temp = np.append(temp, temp_params)
-        res = temp.reshape(runs, len(x[0]) + 1)
-        return bootstrap((res,), np.mean, method="basic", axis=0, confidence_level=0.95)
+        runs: int = 100,
+        rng: Optional[np.random.Generator] = None,
+        executor: Optional[AnalysisExecutor] = None,
+    ) -> Any:
+        return SemiParametricBootstrap.run_from_fit(
+            SemiParametricBootstrap.fit(y, x), runs, rng, executor
+        )
+
+    @staticmethod
+    def run_from_fit(
+        fit: OLSFit,
+        runs: int = 100,
+        rng: Optional[np.random.Generator] = None,
+        executor: Optional[AnalysisExecutor] = None,
+    ) -> Any:
+        """As run, with the initial fit shared by the caller"""
+        if rng is None:
+            rng = np.random.default_rng()
+        if executor is None:
+            executor = AnalysisExecutor()
+
+        res: npt.NDArray[np.float64] = np.concatenate(
+            executor.replicate(SemiParametricBootstrap.sample_chunk, runs, rng, *fit)
+        )
+        return bootstrap(
+            (res,),
+            np.mean,
+            method="basic",
+            axis=0,
+            confidence_level=0.95,
+            batch=max(1, SemiParametricBootstrap.chunk_elements // res.size),
+            random_state=rng,
+        )
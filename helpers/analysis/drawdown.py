@@ -1,15 +1,17 @@
+import math
 import numpy as np
 import numpy.typing as npt
 import pandas as pd
 import statsmodels.api as sm
-from typing import Any, Callable, Dict, List, Tuple, TypedDict
+from typing import Any, Dict, List, Optional, Tuple, TypedDict, Union
 
 from panacea import (
-    max_dd_threshold_position,
+    max_dd_threshold_position_batch,
 )
 from helpers.prices import FactorSource
 from helpers.prices.data import DataSource
 
+from .executor import AnalysisExecutor
 from .riskattribution import (
     RegressionCoefficient,
     RegressionResult,
@@ -46,10 +48,15 @@ class DrawdownCalculator:
         return data
 
 
-class PrivateDrawdownPosition(TypedDict):
-    start_idx: int
-    end_idx: int
-    dd_size: float
+class PrivateDrawdownPositions(TypedDict):
+    """One element per drawdown, path is the row of the simulated returns
+    the drawdown was found in
+    """
+
+    path: npt.NDArray[np.int64]
+    start_idx: npt.NDArray[np.int64]
+    end_idx: npt.NDArray[np.int64]
+    dd_size: npt.NDArray[np.float64]
 
 
 class Drawdown(TypedDict):
@@ -60,9 +67,16 @@ class Drawdown(TypedDict):
     count: int
 
 
+class ThresholdDrawdowns(TypedDict):
+    threshold: float
+    drawdowns: List[Drawdown]
+
+
 class HistoricalDrawdownEstimatorResult(TypedDict):
     regressions: RegressionResult
     drawdowns: List[Drawdown]
+    thresholds: List[ThresholdDrawdowns]
+    sims: int
 
 
 class HistoricalDrawdownEstimator:
@@ -73,7 +87,18 @@ class HistoricalDrawdownEstimator:
     Attributes
     ----------
     n : int
-        The number of sims to run
+        The number of sims to run, or the size of each batch when tolerance
+        is set
+    tolerance : `Optional[float]`
+        When set, batches of sims are run until the mean and stdev of every
+        established drawdown move by less than this between batches
+    max_sims : `int`
+        Limit on the number of sims when tolerance is set
+    min_group_share : `float`
+        Share of sims a drawdown group is found in before it is established,
+        rarer groups keep appearing as sims are added so aren't compared
+    sims_used : `int`
+        The number of sims that were run
     target_data : `pd.DataFrame`
         The asset whose performance we are trying to simulate
     factor_data : `pd.DataFrame`
@@ -82,39 +107,66 @@ class HistoricalDrawdownEstimator:
         The formatted join of target_data and factor_data
     factors : `list[str]`
         List of factors in factor_data
+    thresholds : `List[float]`
+        Drawdowns that will trigger recording, results are grouped for each
     threshold : `float`
-        Drawdown that will trigger recording
+        Largest of thresholds, paths are searched for drawdowns once with
+        this and the result filtered for the others
     reg_mod : `sm.OLS`
         StatsModels OLS regression model
     reg_res : `sm.regression.linear_model.RegressionResultsWrapper`
         Results of fitting OLS models
-    sample_coefs : `ndarray`
-        Use the results of the regression to build an estimate of historical factor loadings
-    hypothetical_rets : `List[PrivateDrawdownPosition]`
-        List of drawdown positions, used internally, not shown to client
+    rng : `np.random.Generator`
+        Source of the seeds for each chunk of sims
+    executor : `AnalysisExecutor`
+        Runs chunks of sims, defaults to the executor in settings
+    hypothetical_dd : `PrivateDrawdownPositions`
+        Drawdown positions of every sim, used internally, not shown to client
     hypothetical_dd_dist : `Dict[Tuple[float], Tuple[float, float, int]]`
         Distribution of hypothetical drawdowns
     """
 
+    min_group_share: float = 0.05
+
     def __init__(
         self,
         definition: RiskAttributionDefinition,
-        threshold: float,
+        threshold: Union[float, List[float]],
+        seed: Optional[int] = None,
+        executor: Optional[AnalysisExecutor] = None,
+        sims: int = 500,
+        tolerance: Optional[float] = None,
+        max_sims: int = 10000,
     ):
-        self.n: int = 500
-        self.threshold: float = threshold
+        self.thresholds: List[float] = (
+            list(threshold) if isinstance(threshold, list) else [threshold]
+        )
+        if not self.thresholds:
+            raise ValueError("At least one threshold is required")
+        if sims < 1 or max_sims < 1:
+            raise ValueError("Number of sims must be positive")
+        if tolerance is not None and not (math.isfinite(tolerance) and tolerance > 0):
+            raise ValueError("Tolerance must be a positive number")
+        self.n: int = sims
+        self.tolerance: Optional[float] = tolerance
+        self.max_sims: int = max_sims
+        self.sims_used: int = 0
+        self.threshold: float = max(self.thresholds)
         self.definition: RiskAttributionDefinition = definition
+        self.rng: np.random.Generator = np.random.default_rng(seed)
+        self.executor: AnalysisExecutor = executor or AnalysisExecutor.default()
 
         self.build_regression()
-        self.build_sample_coefs()
-        self.estimator_algo()
         self.calc_drawdowns()
         self.group_drawdowns()
         return
 
     def get_results(self) -> HistoricalDrawdownEstimatorResult:
         return HistoricalDrawdownEstimatorResult(
-            regressions=self.reg_result, drawdowns=self.drawdowns
+            regressions=self.reg_result,
+            drawdowns=self.drawdowns,
+            thresholds=self.drawdowns_by_threshold,
+            sims=self.sims_used,
         )
 
     def build_regression(self) -> None:
@@ -144,77 +196,236 @@ class HistoricalDrawdownEstimator:
         )
         return
 
-    def build_sample_coefs(self) -> None:
-        self.sample_coefs: npt.NDArray[np.float64] = np.zeros(
-            shape=(self.param_count, self.n), dtype=np.float64
+    @staticmethod
+    def build_sample_coefs(
+        n: int,
+        rng: np.random.Generator,
+        params: npt.NDArray[np.float64],
+        bse: npt.NDArray[np.float64],
+    ) -> npt.NDArray[np.float64]:
+        """Returns shape (number of params, n), each row drawn from a normal
+        around the estimate with the standard error of that estimate
+        """
+        return rng.normal(
+            np.asarray(params)[:, None], np.asarray(bse)[:, None], (len(params), n)
         )
-        for i, j, k in zip(
-            self.reg_res.params, self.reg_res.bse, range(self.param_count)
-        ):
-            random_numbers: npt.NDArray[np.float64] = np.random.normal(i, j, self.n)
-            self.sample_coefs[k] = random_numbers
-        return
 
-    def estimator_algo(self) -> None:
-        stacked_coefs: npt.NDArray[np.float64] = self.sample_coefs.T
-        self.hypothetical_rets: npt.NDArray[np.float64] = np.zeros(
-            shape=(len(stacked_coefs), len(self.definition.get_ind_data())),
-            dtype=np.float64,
+    @staticmethod
+    def estimator_algo(
+        sample_coefs: npt.NDArray[np.float64], ind_data: npt.NDArray[np.float64]
+    ) -> npt.NDArray[np.float64]:
+        """Returns shape (n, number of dates), the factor returns weighted by
+        each sample of loadings. The intercept isn't used.
+        """
+        return sample_coefs[1:].T @ ind_data.T
+
+    @staticmethod
+    def simulate_chunk(
+        n: int,
+        seed: np.random.SeedSequence,
+        params: npt.NDArray[np.float64],
+        bse: npt.NDArray[np.float64],
+        ind_data: npt.NDArray[np.float64],
+        threshold: float,
+    ) -> PrivateDrawdownPositions:
+        """Kernel for AnalysisExecutor, samples n sets of factor loadings and
+        returns the drawdowns in the hypothetical returns of each one. Every
+        path is passed to panacea in one call.
+        """
+        rng: np.random.Generator = np.random.default_rng(seed)
+        sample_coefs = HistoricalDrawdownEstimator.build_sample_coefs(
+            n, rng, params, bse
+        )
+        hypothetical_rets = HistoricalDrawdownEstimator.estimator_algo(
+            sample_coefs, ind_data
+        )
+
+        ##panacea reads the returns in place, a copy is only made if the
+        ##product isn't already contiguous
+        path, start_idx, end_idx, dd_size = max_dd_threshold_position_batch(
+            np.ascontiguousarray(hypothetical_rets, dtype=np.float64), threshold
+        )
+        return PrivateDrawdownPositions(
+            path=np.asarray(path, dtype=np.int64),
+            start_idx=np.asarray(start_idx, dtype=np.int64),
+            end_idx=np.asarray(end_idx, dtype=np.int64),
+            dd_size=np.asarray(dd_size, dtype=np.float64),
+        )
+
+    def simulate(self, n: int) -> PrivateDrawdownPositions:
+        chunks: List[PrivateDrawdownPositions] = self.executor.replicate(
+            HistoricalDrawdownEstimator.simulate_chunk,
+            n,
+            self.rng,
+            self.reg_res.params,
+            self.reg_res.bse,
+            self.definition.get_ind_data(),
+            self.threshold,
+        )
+        ##Paths are numbered within each chunk, every chunk but the last is
+        ##full
+        chunk_size: int = self.executor.chunk_size(n)
+        return PrivateDrawdownPositions(
+            path=np.concatenate(
+                [
+                    chunk["path"] + self.sims_used + i * chunk_size
+                    for i, chunk in enumerate(chunks)
+                ]
+            ),
+            start_idx=np.concatenate([chunk["start_idx"] for chunk in chunks]),
+            end_idx=np.concatenate([chunk["end_idx"] for chunk in chunks]),
+            dd_size=np.concatenate([chunk["dd_size"] for chunk in chunks]),
         )
-        for i, j in zip(stacked_coefs, range(len(stacked_coefs))):
-            sample_factor_weights: npt.NDArray[np.float64] = i[1:]
-            sample_factor_rets: npt.NDArray[np.float64] = np.sum(
-                sample_factor_weights * self.definition.get_ind_data(), axis=1
+
+    def threshold_groups(
+        self,
+    ) -> List[Tuple[float, List[Tuple[int, int, npt.NDArray[np.float64]]]]]:
+        """Groups drawdowns for each threshold. Where a drawdown starts and
+        ends doesn't depend on the threshold so the drawdowns found with the
+        largest threshold are filtered for the others.
+        """
+        res: List[Tuple[float, List[Tuple[int, int, npt.NDArray[np.float64]]]]] = []
+        for threshold in self.thresholds:
+            below: npt.NDArray[np.bool_] = self.hypothetical_dd["dd_size"] < threshold
+            groups = HistoricalDrawdownEstimator.cluster_drawdowns(
+                self.hypothetical_dd["start_idx"][below],
+                self.hypothetical_dd["end_idx"][below],
+                self.hypothetical_dd["dd_size"][below],
             )
-            self.hypothetical_rets[j] = sample_factor_rets
-        return
+            res.append((threshold, groups))
+        return res
+
+    def group_statistics(
+        self,
+    ) -> Dict[Tuple[float, int, int], Tuple[float, float]]:
+        """Mean and stdev of each established group"""
+        min_count: float = HistoricalDrawdownEstimator.min_group_share * self.sims_used
+        return {
+            (threshold, start_idx, end_idx): (dd_data.mean(), dd_data.std())
+            for threshold, groups in self.threshold_groups()
+            for start_idx, end_idx, dd_data in groups
+            if len(dd_data) >= min_count
+        }
+
+    @staticmethod
+    def has_converged(
+        previous: Dict[Tuple[float, int, int], Tuple[float, float]],
+        current: Dict[Tuple[float, int, int], Tuple[float, float]],
+        tolerance: float,
+    ) -> bool:
+        """Every group established now was established in the previous
+        batch with a mean and stdev within tolerance
+        """
+        return all(
+            k in previous
+            and abs(current[k][0] - previous[k][0]) <= tolerance
+            and abs(current[k][1] - previous[k][1]) <= tolerance
+            for k in current
+        )
 
     def calc_drawdowns(self) -> None:
-        self.hypothetical_dd: List[PrivateDrawdownPosition] = []
-        for i in self.hypothetical_rets:
-            ##This is unesscessary, should really return a tuple
-            dd_group: npt.NDArray[np.float64] = max_dd_threshold_position(
-                list(i),
-                self.threshold,
+        """Runs n sims. When tolerance is set this repeats, adding n sims
+        each time, until the statistics of the established drawdown groups
+        move less than tolerance, or max_sims is reached.
+        """
+        batches: List[PrivateDrawdownPositions] = []
+        previous: Optional[Dict[Tuple[float, int, int], Tuple[float, float]]] = None
+        while True:
+            size: int = self.n
+            if self.tolerance is not None:
+                size = min(self.n, self.max_sims - self.sims_used)
+            batches.append(self.simulate(size))
+            self.sims_used += size
+            self.hypothetical_dd: PrivateDrawdownPositions = PrivateDrawdownPositions(
+                path=np.concatenate([batch["path"] for batch in batches]),
+                start_idx=np.concatenate([batch["start_idx"] for batch in batches]),
+                end_idx=np.concatenate([batch["end_idx"] for batch in batches]),
+                dd_size=np.concatenate([batch["dd_size"] for batch in batches]),
             )
-            if dd_group:
-                for dd in dd_group:
-                    dd_pos: PrivateDrawdownPosition = PrivateDrawdownPosition(
-                        start_idx=int(dd[0]), end_idx=int(dd[1]), dd_size=dd[2]
-                    )
-                    self.hypothetical_dd.append(dd_pos)
-        return
 
-    def group_drawdowns(self) -> None:
-        does_match: Callable[[Tuple[int, int], Tuple[int, int], int], bool] = (
-            lambda dd, match, pos: match[pos] > dd[pos] - 5 and match[pos] < dd[pos] + 5
+            if self.tolerance is None or self.sims_used >= self.max_sims:
+                return
+            current = self.group_statistics()
+            if previous is not None and HistoricalDrawdownEstimator.has_converged(
+                previous, current, self.tolerance
+            ):
+                return
+            previous = current
+
+    @staticmethod
+    def cluster_drawdowns(
+        start_idx: npt.NDArray[np.int64],
+        end_idx: npt.NDArray[np.int64],
+        dd_size: npt.NDArray[np.float64],
+        window: int = 5,
+    ) -> List[Tuple[int, int, npt.NDArray[np.float64]]]:
+        """Groups drawdowns that start within window periods of the first
+        drawdown seen with that start, returns the start and end of that
+        first drawdown and the size of every drawdown in the group. A
+        drawdown close to two groups is counted in both, if it comes after
+        the first drawdown of each.
+
+        Whether a drawdown starts a new group only depends on the first
+        drawdown with each start, so only distinct starts are looped over.
+        Groups are then read as slices of the drawdowns sorted by start.
+        """
+        if len(start_idx) == 0:
+            return []
+
+        distinct, first = np.unique(start_idx, return_index=True)
+        taken: npt.NDArray[np.bool_] = np.zeros(
+            int(distinct[-1]) + window, dtype=np.bool_
+        )
+        groups: List[int] = []
+        for pos in np.sort(first).tolist():
+            start: int = int(start_idx[pos])
+            if not taken[max(start - window + 1, 0) : start + window].any():
+                taken[start] = True
+                groups.append(pos)
+
+        order: npt.NDArray[np.intp] = np.argsort(start_idx, kind="stable")
+        sorted_starts: npt.NDArray[np.int64] = start_idx[order]
+        sorted_sizes: npt.NDArray[np.float64] = dd_size[order]
+        group_starts: npt.NDArray[np.int64] = start_idx[groups]
+        lower: npt.NDArray[np.intp] = np.searchsorted(
+            sorted_starts, group_starts - window, side="right"
+        )
+        upper: npt.NDArray[np.intp] = np.searchsorted(
+            sorted_starts, group_starts + window, side="left"
         )
-        res: Dict[Tuple[int, int], List[float]] = {}
-        for dd in self.hypothetical_dd:
-            has_match: bool = False
-            position: Tuple[int, int] = (dd["start_idx"], dd["end_idx"])
-            for k in res:
-                if does_match(k, position, 0):
-                    has_match = True
-                    res[k].append(dd["dd_size"])
-            if not has_match:
-                res[position] = [dd["dd_size"]]
-
-        self.drawdowns: List[Drawdown] = []
-        boundary: int = 0
-        for i in res:
-            if len(res[i]) > boundary:
-                start_date: int = self.definition.get_dates_union()[i[0]]
-                end_date: int = self.definition.get_dates_union()[i[1]]
-                dd_data: npt.NDArray[np.float64] = np.array(res[i])
+        ##Drawdowns seen before a group was started aren't part of it
+        return [
+            (
+                int(start_idx[pos]),
+                int(end_idx[pos]),
+                sorted_sizes[lo:hi][order[lo:hi] >= pos],
+            )
+            for pos, lo, hi in zip(groups, lower.tolist(), upper.tolist())
+        ]
+
+    def group_drawdowns(self) -> None:
+        dates: List[int] = self.definition.get_dates_union()
+        ##Drawdowns that end with the final return have an end one past the
+        ##last date
+        last: int = len(dates) - 1
+
+        self.drawdowns_by_threshold: List[ThresholdDrawdowns] = []
+        for threshold, groups in self.threshold_groups():
+            drawdowns: List[Drawdown] = []
+            for start_idx, end_idx, dd_data in groups:
                 drawdown = Drawdown(
-                    start=str(start_date),
-                    end=str(end_date),
+                    start=str(dates[min(start_idx, last)]),
+                    end=str(dates[min(end_idx, last)]),
                     mean=dd_data.mean(),
                     stdev=dd_data.std(),
                     count=len(dd_data),
                 )
-                self.drawdowns.append(drawdown)
+                drawdowns.append(drawdown)
+            self.drawdowns_by_threshold.append(
+                ThresholdDrawdowns(threshold=threshold, drawdowns=drawdowns)
+            )
+        ##Drawdowns for the first threshold given
+        self.drawdowns: List[Drawdown] = self.drawdowns_by_threshold[0]["drawdowns"]
         return
 
 
@@ -234,19 +445,40 @@ class HistoricalDrawdownEstimatorFromDataSources(HistoricalDrawdownEstimator):
         self,
         reg_input: RegressionInput,
         model_prices: Dict[int, DataSource],
-        threshold: float,
+        threshold: Union[float, List[float]],
+        seed: Optional[int] = None,
+        executor: Optional[AnalysisExecutor] = None,
+        sims: int = 500,
+        tolerance: Optional[float] = None,
+        max_sims: int = 10000,
     ):
         """
         Parameters
         ----------
         model_prices: `dict[int, DataSource]`
             The assets we are trying to estimate drawdown for.
-        threshold: `float`
-            Drawdown that will trigger recording
+        threshold: `Union[float, List[float]]`
+            Drawdown that will trigger recording, or a list of them to group
+            the same sims by each
+        seed: `Optional[int]`
+            Seed for the sims, results are repeatable when set
+        executor: `Optional[AnalysisExecutor]`
+            Runs chunks of sims, defaults to the executor in settings
+        sims: `int`
+            Number of sets of factor loadings to simulate, or the size of
+            each batch when tolerance is set
+        tolerance: `Optional[float]`
+            Run batches until established drawdown statistics move by less
+            than this
+        max_sims: `int`
+            Limit on the number of sims when tolerance is set
 
         Throws
         ---------
         ValueError: when called with no FactorSource objects
+        ValueError: when called with no thresholds
+        ValueError: when sims or max_sims isn't positive, or tolerance
+        isn't a positive number
         HistoricalDrawdownEstimatorNoFactorSourceException: when called
         without FactorSource independent variables
 
@@ -268,5 +500,7 @@ class HistoricalDrawdownEstimatorFromDataSources(HistoricalDrawdownEstimator):
             ##FactorSource has to be independent variable
             raise HistoricalDrawdownEstimatorNoFactorSourceException
 
-        super().__init__(definition, threshold)
+        super().__init__(
+            definition, threshold, seed, executor, sims, tolerance, max_sims
+        )
         return
@@ -0,0 +1,148 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import math
+import multiprocessing
+import os
+import sys
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+
+import django
+from django.conf import settings
+import numpy as np
+
+
+class AnalysisExecutor:
+    """
+    Runs independent chunks of replications for the bootstrap and Monte
+    Carlo models. This base class runs them in the calling thread.
+
+    Replications are split into up to max_chunks chunks of at least
+    min_chunk_runs and each chunk gets its own child of one SeedSequence.
+    Chunking doesn't depend on the number of workers, so a seeded model
+    returns the same result from every executor.
+
+    Kernels must be importable module-level functions or staticmethods,
+    called as kernel(runs, seed, *args) and returning one result per chunk.
+
+    Attributes
+    ---------
+    max_chunks: `int`
+        Chunks that runs are split into, more than a pool has workers so
+        that uneven chunks balance
+    min_chunk_runs: `int`
+        Replications below which a chunk isn't split further
+    """
+
+    max_chunks: int = 16
+    min_chunk_runs: int = 10
+
+    __defaults: Dict[int, "AnalysisExecutor"] = {}
+    __lock: threading.Lock = threading.Lock()
+
+    @staticmethod
+    def default() -> "AnalysisExecutor":
+        """Shared executor configured from settings, serial when
+        ANALYSIS_EXECUTOR_WORKERS is 0. Pools are created per process
+        because uwsgi forks workers after the app is loaded.
+        """
+        workers: int = settings.ANALYSIS_EXECUTOR_WORKERS
+        if workers < 1:
+            return AnalysisExecutor()
+
+        pid: int = os.getpid()
+        with AnalysisExecutor.__lock:
+            if pid not in AnalysisExecutor.__defaults:
+                pool = ProcessPoolAnalysisExecutor(workers)
+                AnalysisExecutor.__defaults[pid] = pool
+            return AnalysisExecutor.__defaults[pid]
+
+    @staticmethod
+    def _reset_default() -> None:
+        with AnalysisExecutor.__lock:
+            AnalysisExecutor.__defaults.pop(os.getpid(), None)
+        return
+
+    def chunk_size(self, runs: int) -> int:
+        """Replications in every chunk but the last"""
+        return max(self.min_chunk_runs, math.ceil(runs / self.max_chunks))
+
+    def split(
+        self, runs: int, rng: np.random.Generator
+    ) -> List[Tuple[int, np.random.SeedSequence]]:
+        chunk: int = self.chunk_size(runs)
+        sizes: List[int] = [min(chunk, runs - start) for start in range(0, runs, chunk)]
+        seed: np.random.SeedSequence = np.random.SeedSequence(
+            int(rng.integers(0, 2**63))
+        )
+        return list(zip(sizes, seed.spawn(len(sizes))))
+
+    def map(self, kernel: Callable[..., Any], tasks: List[Tuple]) -> List[Any]:
+        return [kernel(*task) for task in tasks]
+
+    def replicate(
+        self,
+        kernel: Callable[..., Any],
+        runs: int,
+        rng: np.random.Generator,
+        *args: Any,
+    ) -> List[Any]:
+        """Returns the result of each chunk, in chunk order"""
+        tasks: List[Tuple] = [
+            (size, seed, *args) for size, seed in self.split(runs, rng)
+        ]
+        return self.map(kernel, tasks)
+
+
+class ProcessPoolAnalysisExecutor(AnalysisExecutor):
+    """
+    Runs chunks on a pool of processes started from a forkserver that has
+    already imported numpy and statsmodels, so a request doesn't wait on
+    imports or process start up. Every worker is started when the pool is
+    created.
+
+    If a worker dies the pool is discarded, the chunks run in the calling
+    thread and the next request creates a new pool.
+
+    Attributes
+    ---------
+    workers: `int`
+        Number of processes in the pool
+    """
+
+    preload: List[str] = ["numpy", "scipy.stats", "statsmodels.api"]
+
+    @staticmethod
+    def _context() -> multiprocessing.context.BaseContext:
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload(ProcessPoolAnalysisExecutor.preload)
+        ##uwsgi sets sys.executable to its own binary
+        if not os.path.basename(sys.executable).startswith("python"):
+            ctx.set_executable(os.path.join(sys.exec_prefix, "bin", "python"))
+        return ctx
+
+    def map(self, kernel: Callable[..., Any], tasks: List[Tuple]) -> List[Any]:
+        if len(tasks) < 2:
+            return super().map(kernel, tasks)
+
+        try:
+            futures = [self.pool.submit(kernel, *task) for task in tasks]
+            return [future.result() for future in futures]
+        except BrokenProcessPool:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            AnalysisExecutor._reset_default()
+            return super().map(kernel, tasks)
+
+    def __init__(self, workers: int):
+        self.workers: int = workers
+        ##Kernels live in modules that import Django models, the initializer
+        ##can't be one of them
+        self.pool: ProcessPoolExecutor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=ProcessPoolAnalysisExecutor._context(),
+            initializer=django.setup,
+        )
+        ##Each submit starts a worker while none are idle
+        warm = [self.pool.submit(os.getpid) for _ in range(workers)]
+        for future in warm:
+            future.result()
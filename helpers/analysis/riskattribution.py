@@ -1,12 +1,12 @@
-from turtle import window_width
 import numpy as np
 import numpy.typing as npt
-import statsmodels.api as sm
-from typing import Callable, Iterator, List, Dict, Optional, Tuple, TypedDict, Union
+from typing import Iterator, List, Dict, Optional, Tuple, TypedDict, Union
 from arch.bootstrap import IIDBootstrap
-from helpers.analysis.bootstrap import SemiParametricBootstrap
+from helpers.analysis.bootstrap import OLSFit, SemiParametricBootstrap
+from helpers.analysis.executor import AnalysisExecutor
+from helpers.analysis.rolling import RollingOLS
 
-from helpers.prices.data import DataSource, FactorSource, InvestPySource, SourceFactory
+from helpers.prices.data import DataSource, SourceAligner
 
 DependentData = npt.NDArray[np.float64]
 IndependentData = npt.NDArray[np.float64]
@@ -63,19 +63,39 @@ class RiskAttributionDefinition:
     """
     Wraps around the data, controls how clients call for data from the
     DataSource, also used to error check both the inputs and the DataSources.
+
+    Returns are aligned once, on construction, into a single panel so that
+    models take views of one array rather than looking up dates in every
+    source on each call. Models built from the same input within a request
+    can share one definition, and with it the full sample fit.
+
+    Attributes
+    ---------
+    panel: `npt.NDArray[np.float64]`
+        Returns with shape (number of dates, 1 + number of independent
+        variables), dependent variable in the first column. Stored in column
+        order so each variable, and each window of it, is contiguous
+    positions: `Dict[int, npt.NDArray[np.intp]]`
+        Position of each date in dates_union within each source
     """
 
     @staticmethod
-    def _formatter() -> Callable[[List[IndependentData]], IndependentData]:
-        return lambda d: np.array(list(map(lambda x: list(x), zip(*d))))
+    def reuse(
+        reg_input: RegressionInput,
+        data: Dict[int, DataSource],
+        definition: Optional["RiskAttributionDefinition"],
+    ) -> "RiskAttributionDefinition":
+        """Returns the shared definition if there is one, a definition built
+        for a different input is an error on the caller's side.
+        """
+        if definition is None:
+            return RiskAttributionDefinition(reg_input, data)
 
-    @staticmethod
-    def _to_daily_rt(
-        dates: List[int],
-    ) -> Callable[[Union[FactorSource, InvestPySource]], npt.NDArray[np.float64]]:
-        return lambda x: SourceFactory.find_dates(
-            dates, x, x.__class__
-        ).get_returns_list()
+        if definition.dep != int(reg_input["dep"]) or definition.ind != [
+            int(i) for i in reg_input["ind"]
+        ]:
+            raise ValueError("Shared definition was built for a different input")
+        return definition
 
     def _get_dep_source(self) -> DataSource:
         dep: Union[DataSource, None] = self.data.get(self.dep)
@@ -101,46 +121,62 @@ class RiskAttributionDefinition:
     def get_all_sources(self) -> List[DataSource]:
         return [self._get_dep_source(), *self._get_ind_source()]
 
-    def _get_dates_union(self) -> List[int]:
-        date_lists = [set(i.get_dates()) for i in self.get_all_sources()]
-        union_of_dates = set.intersection(*date_lists)
-        return sorted([int(i) for i in union_of_dates])
+    def _align_dates(self) -> Tuple[List[int], Dict[int, npt.NDArray[np.intp]]]:
+        ##Called for the error checks, dependent source is also in data
+        self.get_all_sources()
+        assets: List[int] = list(self.data)
+        dates, positions = SourceAligner.align([self.data[i] for i in assets])
+        return dates.tolist(), dict(zip(assets, positions))
+
+    def _build_panel(self) -> npt.NDArray[np.float64]:
+        assets: List[int] = [self.dep, *self.ind]
+        panel: npt.NDArray[np.float64] = np.empty(
+            shape=(len(self.dates_union), len(assets)), dtype=np.float64, order="F"
+        )
+        for col, asset in enumerate(assets):
+            returns: npt.NDArray[np.float64] = self.data[asset].get_returns_list()
+            panel[:, col] = returns.take(self.positions[asset])
+        return panel
 
     def get_dates_union(self) -> List[int]:
         return self.dates_union
 
+    def _get_rows(
+        self, dates: Optional[List[int]]
+    ) -> Union[slice, npt.NDArray[np.intp]]:
+        if not dates:
+            return slice(None)
+        union: npt.NDArray[np.int64] = np.asarray(self.dates_union, dtype=np.int64)
+        rows: npt.NDArray[np.intp] = np.searchsorted(union, dates)
+        ##searchsorted gives an insertion point for dates that aren't aligned
+        found: npt.NDArray[np.bool_] = rows < len(union)
+        found[found] = union[rows[found]] == np.asarray(dates)[found]
+        if not found.all():
+            raise KeyError(np.asarray(dates)[~found].tolist())
+        return rows
+
     def get_ind_data(self, dates: Optional[List[int]] = None) -> IndependentData:
-        res: npt.NDArray[np.float64] = np.array([])
-        for i in self.ind:
-            ind_data: Union[DataSource, None] = self.data.get(i)
-            if ind_data:
-                if not dates:
-                    dates = self.dates_union
-                data: npt.NDArray[np.float64] = RiskAttributionDefinition._to_daily_rt(
-                    dates
-                )(ind_data)
-                res = np.append(res, data)
-        return res.reshape(len(dates), len(self.ind))
+        """View of the panel, copied only when called with a subset of
+        dates. Models should slice the view rather than pass dates.
+        """
+        return self.panel[self._get_rows(dates), 1:]
 
     def get_dep_data(self, dates: Optional[List[int]] = None) -> DependentData:
-        val: Union[DataSource, None] = self.data.get(self.dep)
-        if not val:
-            raise RiskAttributionUnusableInputException(
-                "Dependent variable data not found"
+        return self.panel[self._get_rows(dates), 0]
+
+    def get_fit(self) -> OLSFit:
+        """Full sample OLS, with a constant, computed on first call"""
+        if self.fit is None:
+            self.fit = SemiParametricBootstrap.fit(
+                self.get_dep_data(), self.get_ind_data()
             )
-        else:
-            if not dates:
-                dates = self.dates_union
-            data: npt.NDArray[np.float64] = RiskAttributionDefinition._to_daily_rt(
-                dates
-            )(val)
-            return data
+        return self.fit
 
     def __init__(self, reg_input: RegressionInput, data: Dict[int, DataSource]):
         self.ind: List[int] = [int(i) for i in reg_input["ind"]]
         self.dep: int = int(reg_input["dep"])
         self.data: Dict[int, DataSource] = data
-        self.dates_union: List[int] = self._get_dates_union()
+        self.dates_union, self.positions = self._align_dates()
 
         if not reg_input["dep"] in data:
             raise RiskAttributionUnusableInputException(
@@ -156,6 +192,9 @@ class RiskAttributionDefinition:
             raise RiskAttributionUnusableInputException(
                 "No overlapping dates in data, cannot run analysis with inputs"
             )
+
+        self.panel: npt.NDArray[np.float64] = self._build_panel()
+        self.fit: Optional[OLSFit] = None
         return
 
 
@@ -175,20 +214,17 @@ class RiskAttributionBase:
     """
 
     def get_windows(self, window_length: int) -> Iterator[RegressionData]:
-        dates: List[int] = self.definition.get_dates_union()
-        dep_data: DataSource = self.definition.get_dep_data()
+        dep_data: DependentData = self.definition.get_dep_data()
+        ind_data: IndependentData = self.definition.get_ind_data()
         dep_length: int = len(dep_data)
 
         if dep_length < window_length:
             raise WindowLengthError
 
-        windows: range = range(window_length, len(dates))
+        ##Windows are views into the panel, nothing is copied
+        windows: range = range(window_length, dep_length)
         for w in windows:
-            window_dates: List[int] = dates[w - window_length : w]
-
-            dep: DependentData = self.definition.get_dep_data(window_dates)
-            ind: IndependentData = self.definition.get_ind_data(window_dates)
-            yield dep, ind
+            yield dep_data[w - window_length : w], ind_data[w - window_length : w]
 
     def get_data(self) -> RegressionData:
         """
@@ -203,26 +239,27 @@ class RiskAttributionBase:
         ind_data: IndependentData = self.definition.get_ind_data()
         return dep_data, ind_data
 
-    def _run_regression(
-        self, ind: IndependentData, dep: DependentData
+    def _format_regression(
+        self, params: List[float], bse: List[float]
     ) -> RegressionResult:
-        reg_mod: sm.OLS = sm.OLS(dep, sm.add_constant(ind))
-        reg_res: sm.regression.linear_model.RegressionResultsWrapper = reg_mod.fit()
-
         coefs = []
-        for i, j, k in zip(
-            self.definition.ind,
-            reg_res.params.tolist()[1:],
-            reg_res.params.tolist()[1:],
-        ):
-            ##Error can be infinity which is non-JSON, casting output to string
+        for i, j, k in zip(self.definition.ind, params[1:], bse[1:]):
+            ##Error can be infinity or NaN which is non-JSON
             error = k
-            if k == np.inf:
+            if not np.isfinite(k):
                 error = -1
             coefs.append(RegressionCoefficient(asset=int(i), coef=j, error=error))
-        return RegressionResult(
-            intercept=reg_res.params.tolist()[0], coefficients=coefs
+        return RegressionResult(intercept=params[0], coefficients=coefs)
+
+    def _run_regression(self, fit: OLSFit) -> RegressionResult:
+        params, resid, x_pinv = fit
+        df_resid: int = len(resid) - len(params)
+        scale: float = float(resid @ resid) / df_resid if df_resid > 0 else np.nan
+        ##Diagonal of pinv(X)pinv(X)', as statsmodels normalized_cov_params
+        bse: npt.NDArray[np.float64] = np.sqrt(
+            scale * np.einsum("ij,ij->i", x_pinv, x_pinv)
         )
+        return self._format_regression(params.tolist(), bse.tolist())
 
     def _build_data(self) -> None:
         raise NotImplementedError()
@@ -251,27 +288,27 @@ class RiskAttribution(RiskAttributionBase):
 
     def run(self) -> RiskAttributionResult:
         avgs = [
-            Average(asset=int(i), avg=(sum(j) / len(j)))
-            for i, j in zip(self.definition.ind, np.array(self.ind_data).T)
+            Average(asset=int(i), avg=j)
+            for i, j in zip(self.definition.ind, self.ind_data.mean(axis=0).tolist())
         ]
         avgs.append(
-            Average(
-                asset=int(self.definition.dep),
-                avg=(sum(self.dep_data) / len(self.dep_data)),
-            )
+            Average(asset=int(self.definition.dep), avg=float(self.dep_data.mean()))
         )
         dates: List[int] = self.definition.get_dates_union()
         return RiskAttributionResult(
-            regression=self._run_regression(self.ind_data, self.dep_data),
+            regression=self._run_regression(self.definition.get_fit()),
             avgs=avgs,
             min_date=min(dates),
             max_date=max(dates),
         )
 
-    def __init__(self, reg_input: RegressionInput, data: Dict[int, DataSource]):
-        definition: RiskAttributionDefinition = RiskAttributionDefinition(
-            reg_input, data
-        )
+    def __init__(
+        self,
+        reg_input: RegressionInput,
+        data: Dict[int, DataSource],
+        definition: Optional[RiskAttributionDefinition] = None,
+    ):
+        definition = RiskAttributionDefinition.reuse(reg_input, data, definition)
         super().__init__(definition, data)
         self._build_data()
 
@@ -296,21 +333,22 @@ class RollingRiskAttribution(RiskAttributionBase):
     """
 
     def run(self) -> RollingRiskAttributionResult:
-        regressions: List[RegressionResult] = []
-        avgs: List[List[Average]] = []
-        for dep, ind in self.get_windows(self.window_length):
-            avg_group = [
-                Average(asset=int(i), avg=(sum(j) / len(j)))
-                for i, j in zip(self.definition.ind, np.array(ind).T)
-            ]
-            avg_group.append(
-                Average(
-                    asset=int(self.definition.dep),
-                    avg=(sum(dep) / len(dep)),
-                )
-            )
-            avgs.append(avg_group)
-            regressions.append(self._run_regression(ind, dep))
+        dep_data: DependentData = self.definition.get_dep_data()
+        if len(dep_data) < self.window_length:
+            raise WindowLengthError
+
+        rolling: RollingOLS = RollingOLS(
+            dep_data, self.definition.get_ind_data(), self.window_length
+        )
+        assets: List[int] = [*self.definition.ind, self.definition.dep]
+        regressions: List[RegressionResult] = [
+            self._format_regression(params, bse)
+            for params, bse in zip(rolling.params.tolist(), rolling.bse.tolist())
+        ]
+        avgs: List[List[Average]] = [
+            [Average(asset=int(i), avg=j) for i, j in zip(assets, means)]
+            for means in rolling.means.tolist()
+        ]
         # Rolling window won't have the first N dates
         dates: List[int] = self.definition.get_dates_union()
         clipped_dates: List[int] = dates[self.window_length :]
@@ -326,12 +364,11 @@ class RollingRiskAttribution(RiskAttributionBase):
         self,
         roll_input: RollingRegressionInput,
         data: Dict[int, DataSource],
+        definition: Optional[RiskAttributionDefinition] = None,
     ):
 
         reg_input = RegressionInput(ind=roll_input["ind"], dep=roll_input["dep"])
-        definition: RiskAttributionDefinition = RiskAttributionDefinition(
-            reg_input, data
-        )
+        definition = RiskAttributionDefinition.reuse(reg_input, data, definition)
         super().__init__(definition, data)
         self.window_length: int = roll_input["window"]
 
@@ -355,14 +392,19 @@ class BootstrapRiskAttributionAlt:
 
     Attributes
     --------
-    window_length : int
-        Length of the rolling windows over which the analysis will run
+    runs : int
+        Number of residual resamples
+    rng : `np.random.Generator`
+        Source of the resamples, seeded when the caller needs repeatable
+        results
+    executor : `AnalysisExecutor`
+        Runs chunks of resamples, defaults to the executor in settings
     """
 
     def run(self) -> BootstrapRiskAttributionResult:
-        dep_data: DependentData = self.definition.get_dep_data()
-        ind_data: IndependentData = self.definition.get_ind_data()
-        bs = SemiParametricBootstrap.run(dep_data, ind_data)
+        bs = SemiParametricBootstrap.run_from_fit(
+            self.definition.get_fit(), self.runs, self.rng, self.executor
+        )
 
         intercept_result = BootstrapResult(
             asset=int(self.definition.dep),
@@ -381,10 +423,21 @@ class BootstrapRiskAttributionAlt:
             intercept=intercept_result, coefficients=coefs_result
         )
 
-    def __init__(self, reg_input: RegressionInput, data: Dict[int, DataSource]):
-        self.definition: RiskAttributionDefinition = RiskAttributionDefinition(
-            reg_input, data
+    def __init__(
+        self,
+        reg_input: RegressionInput,
+        data: Dict[int, DataSource],
+        runs: int = 100,
+        seed: Optional[int] = None,
+        executor: Optional[AnalysisExecutor] = None,
+        definition: Optional[RiskAttributionDefinition] = None,
+    ):
+        self.definition: RiskAttributionDefinition = RiskAttributionDefinition.reuse(
+            reg_input, data, definition
         )
+        self.runs: int = runs
+        self.rng: np.random.Generator = np.random.default_rng(seed)
+        self.executor: AnalysisExecutor = executor or AnalysisExecutor.default()
 
 
 class BootstrapRiskAttribution(RiskAttributionBase):
@@ -396,8 +449,25 @@ class BootstrapRiskAttribution(RiskAttributionBase):
     --------
     window_length : int
         Length of the rolling windows over which the analysis will run
+    reps : int
+        Number of bootstrap replications
+    rng : `np.random.Generator`
+        Source of the replications
+    executor : `AnalysisExecutor`
+        Runs chunks of replications, defaults to the executor in settings
     """
 
+    @staticmethod
+    def bootstrap_chunk(
+        reps: int, seed: np.random.SeedSequence, merged: npt.NDArray[np.float64]
+    ) -> npt.NDArray[np.float64]:
+        """Kernel for AnalysisExecutor, returns the mean of each column for
+        each replication
+        """
+        rng: np.random.Generator = np.random.default_rng(seed)
+        bootstrap: IIDBootstrap = IIDBootstrap(merged, seed=rng)
+        return bootstrap.apply(lambda x: x.mean(axis=0), reps)
+
     def _get_coefs_from_rolling_results(
         self, rolling: RollingRiskAttributionResult
     ) -> npt.NDArray[np.float64]:
@@ -440,9 +510,16 @@ class BootstrapRiskAttribution(RiskAttributionBase):
         coefs: npt.NDArray[np.float64] = self._get_coefs_from_rolling_results(rolling)
         avgs: npt.NDArray[np.float64] = self._get_avgs_from_rolling_results(rolling)
         merged: npt.NDArray[np.float64] = np.concatenate((intercepts, coefs, avgs), axis=0).T  # type: ignore
-        bootstrap: IIDBootstrap = IIDBootstrap(merged)
-        bootstrap_results: npt.NDArray[np.float64] = bootstrap.conf_int(
-            lambda x: x.mean(axis=0), method="basic"
+        replications: npt.NDArray[np.float64] = np.concatenate(
+            self.executor.replicate(
+                BootstrapRiskAttribution.bootstrap_chunk, self.reps, self.rng, merged
+            )
+        )
+        ##Basic interval, as IIDBootstrap.conf_int(method="basic")
+        base: npt.NDArray[np.float64] = merged.mean(axis=0)
+        lower_q, upper_q = np.percentile(replications, [2.5, 97.5], axis=0)
+        bootstrap_results: npt.NDArray[np.float64] = np.vstack(
+            (2.0 * base - upper_q, 2.0 * base - lower_q)
         ).T
         ind_variable_cnt: int = len(self.definition.ind)
         ##This line removes the bootstrap estimates for the averages, calculated so we can potentially
@@ -472,14 +549,24 @@ class BootstrapRiskAttribution(RiskAttributionBase):
                 window=self.window_length,
             ),
             data=self.data,
+            definition=self.definition,
         )
         rolling_results: RollingRiskAttributionResult = rra.run()
         return self._build_bootstrap(rolling_results)
 
-    def __init__(self, roll_input: RollingRegressionInput, data: Dict[int, DataSource]):
+    def __init__(
+        self,
+        roll_input: RollingRegressionInput,
+        data: Dict[int, DataSource],
+        reps: int = 1000,
+        seed: Optional[int] = None,
+        executor: Optional[AnalysisExecutor] = None,
+        definition: Optional[RiskAttributionDefinition] = None,
+    ):
         reg_input = RegressionInput(ind=roll_input["ind"], dep=roll_input["dep"])
-        definition: RiskAttributionDefinition = RiskAttributionDefinition(
-            reg_input, data
-        )
+        definition = RiskAttributionDefinition.reuse(reg_input, data, definition)
         super().__init__(definition, data)
         self.window_length: int = roll_input["window"]
+        self.reps: int = reps
+        self.rng: np.random.Generator = np.random.default_rng(seed)
+        self.executor: AnalysisExecutor = executor or AnalysisExecutor.default()
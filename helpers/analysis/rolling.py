@@ -0,0 +1,90 @@
+import numpy as np
+import numpy.typing as npt
+
+
+class RollingOLS:
+    """
+    OLS with an intercept fitted over every rolling window of the data at
+    once. X'X, X'y and y'y for each window are differences of cumulative
+    sums so the cost of a window doesn't depend on its length, the
+    coefficients and standard errors for all windows are then solved as
+    one batch.
+
+    Windows match RiskAttributionBase.get_windows, window i covers rows
+    [i, i + window) and there are len(dep) - window windows.
+
+    Data is demeaned over the whole sample before the sums are taken, this
+    doesn't change the slopes or their errors but keeps the differences of
+    large cumulative sums accurate.
+
+    Attributes
+    ---------
+    params: `npt.NDArray[np.float64]`
+        Shape (windows, 1 + number of independent variables), intercept in
+        the first column
+    bse: `npt.NDArray[np.float64]`
+        Standard errors of params, NaN when a window has no degrees of
+        freedom
+    means: `npt.NDArray[np.float64]`
+        Shape (windows, number of independent variables + 1), mean of each
+        independent variable then the dependent variable
+    """
+
+    @staticmethod
+    def _window_sums(data: npt.NDArray[np.float64], window: int) -> npt.NDArray:
+        ##Leading zero so that window i is cumsum[i + window] - cumsum[i]
+        zero: npt.NDArray[np.float64] = np.zeros((1, *data.shape[1:]))
+        cumsum: npt.NDArray[np.float64] = np.concatenate(
+            (zero, np.cumsum(data, axis=0))
+        )
+        return cumsum[window:-1] - cumsum[: -window - 1]
+
+    def __init__(
+        self,
+        dep: npt.NDArray[np.float64],
+        ind: npt.NDArray[np.float64],
+        window: int,
+    ):
+        rows: int = len(dep)
+        ind = ind.reshape(rows, -1)
+        dep_mean: float = dep.mean() if rows else 0.0
+        ind_mean: npt.NDArray[np.float64] = (
+            ind.mean(axis=0) if rows else np.zeros(ind.shape[1])
+        )
+
+        x: npt.NDArray[np.float64] = np.column_stack((np.ones(rows), ind - ind_mean))
+        y: npt.NDArray[np.float64] = dep - dep_mean
+        param_count: int = x.shape[1]
+
+        xtx: npt.NDArray[np.float64] = RollingOLS._window_sums(
+            x[:, :, None] * x[:, None, :], window
+        )
+        xty: npt.NDArray[np.float64] = RollingOLS._window_sums(x * y[:, None], window)
+        yty: npt.NDArray[np.float64] = RollingOLS._window_sums(y * y, window)
+
+        xtx_inv: npt.NDArray[np.float64] = np.linalg.pinv(xtx, hermitian=True)
+        params: npt.NDArray[np.float64] = np.einsum("wij,wj->wi", xtx_inv, xty)
+        sse: npt.NDArray[np.float64] = np.maximum(
+            yty - np.einsum("wi,wi->w", params, xty), 0.0
+        )
+
+        ##Undo the demeaning, only the intercept and its variance move
+        params[:, 0] += dep_mean - params[:, 1:] @ ind_mean
+        self.params: npt.NDArray[np.float64] = params
+
+        to_intercept: npt.NDArray[np.float64] = np.append(1.0, -ind_mean)
+        cov_diag: npt.NDArray[np.float64] = np.diagonal(
+            xtx_inv, axis1=1, axis2=2
+        ).copy()
+        cov_diag[:, 0] = np.einsum("i,wij,j->w", to_intercept, xtx_inv, to_intercept)
+        df_resid: int = window - param_count
+        scale: npt.NDArray[np.float64] = np.full_like(sse, np.nan)
+        if df_resid > 0:
+            scale = sse / df_resid
+        self.bse: npt.NDArray[np.float64] = np.sqrt(scale[:, None] * cov_diag)
+
+        window_means: npt.NDArray[np.float64] = xtx[:, 0, 1:] / window + ind_mean
+        self.means: npt.NDArray[np.float64] = np.column_stack(
+            (window_means, xty[:, 0] / window + dep_mean)
+        )
+        return
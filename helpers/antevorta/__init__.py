@@ -1,6 +1,8 @@
 from .base import (
     AntevortaUnusableInputException,
     AntevortaClientInput,
+    AntevortaEnsembleClientInput,
+    AntevortaGridClientInput,
     AntevortaInsufficientDataException,
 )
 from .default import DefaultSimulationWithPriceAPI
@@ -9,6 +11,8 @@ from .default import DefaultSimulationWithPriceAPI
 __all__ = [
     "DefaultSimulationWithPriceAPI",
     "AntevortaClientInput",
+    "AntevortaEnsembleClientInput",
+    "AntevortaGridClientInput",
     "AntevortaUnusableInputException",
     "AntevortaInsufficientDataException",
 ]
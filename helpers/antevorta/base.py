@@ -1,4 +1,4 @@
-from typing import TypedDict, List
+from typing import Dict, TypedDict, List
 
 
 class AntevortaInsufficientDataException(Exception):
@@ -42,8 +42,47 @@ class AntevortaClientInput(TypedDict):
     sim_length: int
 
 
+class AntevortaEnsembleClientInput(AntevortaClientInput):
+    runs: int
+
+
+class AntevortaGridClientInput(AntevortaClientInput):
+    """grid has the values of each swept parameter, the single value of a
+    swept parameter is the first in grid
+    """
+
+    grid: Dict[str, List[float]]
+    runs: int
+
+
 class AntevortaResults(TypedDict):
     cash: float
     isa: float
     gia: float
     sipp: float
+
+
+class AntevortaPercentiles(TypedDict):
+    p5: float
+    p25: float
+    p50: float
+    p75: float
+    p95: float
+
+
+class AntevortaGridResults(TypedDict):
+    """One row for each combination of parameters, the parameters then the
+    median of each account across runs
+    """
+
+    runs: int
+    columns: List[str]
+    rows: List[List[float]]
+
+
+class AntevortaEnsembleResults(TypedDict):
+    runs: int
+    cash: AntevortaPercentiles
+    isa: AntevortaPercentiles
+    gia: AntevortaPercentiles
+    sipp: AntevortaPercentiles
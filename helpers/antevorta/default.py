@@ -1,10 +1,19 @@
+from itertools import product
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import numpy.typing as npt
 from panacea import AntevortaBasicInput, antevorta_basic, InsufficientDataError  # type: ignore
 
 from api.models import Coverage
 from helpers import prices
+from helpers.analysis.executor import AnalysisExecutor
 
 from .base import (
     AntevortaClientInput,
+    AntevortaEnsembleResults,
+    AntevortaGridResults,
+    AntevortaPercentiles,
     AntevortaResults,
     AntevortaUnusableInputException,
     AntevortaInsufficientDataException,
@@ -29,6 +38,12 @@ class DefaultSimulationWithPriceAPI:
     emergency_cash_min: float
     sim_length: int
     results: `AntevortaResults`
+    ensemble_results: `AntevortaEnsembleResults`
+        Set by run_ensemble
+    grid_results: `AntevortaGridResults`
+        Set by run_grid
+    ensemble_chunk_runs: `int`
+        Simulations run by each task of run_ensemble
 
     Raises
     ---------
@@ -40,10 +55,50 @@ class DefaultSimulationWithPriceAPI:
         Failed to connect to InvestPySource
     """
 
-    def run(self) -> None:
+    ensemble_chunk_runs: int = 10
+    accounts: List[str] = ["cash", "isa", "gia", "sipp"]
+
+    @staticmethod
+    def simulate_chunk(
+        runs: int,
+        assets: List[str],
+        dates: npt.NDArray[np.int64],
+        close: Dict[str, npt.NDArray[np.float64]],
+        signal: Dict[str, float],
+        params: Dict[str, float],
+    ) -> npt.NDArray[np.float64]:
+        """Runs the simulation runs times, can be run by an AnalysisExecutor.
+        Each run resamples prices in panacea with its own generator. Returns
+        shape (runs, 4) with cash, isa, gia and sipp in each row.
+        """
+        inc_in = AntevortaBasicInput(
+            assets=assets,
+            dates=dates,
+            weights=signal,
+            close=close,
+            **params,
+        )
+
+        res: npt.NDArray[np.float64] = np.empty((runs, 4), dtype=np.float64)
+        try:
+            for i in range(runs):
+                res[i] = antevorta_basic(inc_in)
+        except InsufficientDataError:
+            raise AntevortaInsufficientDataException
+        return res
+
+    def load(
+        self,
+    ) -> Tuple[npt.NDArray[np.int64], Dict[str, npt.NDArray[np.float64]]]:
+        """Dates shared by every asset and the close prices on those dates,
+        as arrays that panacea reads through the buffer protocol
+        """
         price_request = prices.PriceAPIRequests(self.coverage)
         try:
             inc_sources = price_request.get_overlapping()
+        except ConnectionError:
+            ##Timeouts are left to the views, which return a 503
+            raise
         except Exception:
             raise AntevortaUnusableInputException
 
@@ -51,37 +106,127 @@ class DefaultSimulationWithPriceAPI:
         close = {}
         for source in inc_sources:
             if dates is None:
-                dates = list(inc_sources[source].get_dates())
-            close[str(source)] = inc_sources[source].get_close()["Close"].to_list()
+                dates = np.asarray(inc_sources[source].get_dates(), dtype=np.int64)
+            close[str(source)] = (
+                inc_sources[source].get_close()["Close"].to_numpy(dtype=np.float64)
+            )
 
-        if not close or not dates:
+        if not close or dates is None or len(dates) == 0:
             raise AntevortaUnusableInputException
+        return dates, close
+
+    def get_params(self) -> Dict[str, float]:
+        return {
+            "initial_cash": self.initial_cash,
+            "wage": self.wage,
+            "wage_growth": self.wage_growth,
+            "contribution_pct": self.contribution_pct,
+            "emergency_cash_min": self.emergency_cash_min,
+            "sim_length": self.sim_length,
+        }
 
+    def run(self) -> None:
+        dates, close = self.load()
         coverage_ids = [str(c.id) for c in self.coverage]
-        inc_in = AntevortaBasicInput(
-            assets=coverage_ids,
-            dates=dates,
-            weights=self.signal,
-            close=close,
-            initial_cash=self.initial_cash,
-            wage=self.wage,
-            wage_growth=self.wage_growth,
-            contribution_pct=self.contribution_pct,
-            emergency_cash_min=self.emergency_cash_min,
-            sim_length=self.sim_length,
+        inc = DefaultSimulationWithPriceAPI.simulate_chunk(
+            1, coverage_ids, dates, close, self.signal, self.get_params()
+        )[0]
+
+        self.results = AntevortaResults(
+            cash=inc[0],
+            isa=inc[1],
+            gia=inc[2],
+            sipp=inc[3],
         )
+        return
 
-        try:
-            inc = antevorta_basic(inc_in)
+    def run_ensemble(
+        self, runs: int, executor: Optional[AnalysisExecutor] = None
+    ) -> None:
+        """Runs the simulation runs times on prices loaded once and returns
+        percentiles of each account across runs. Chunks of simulations are
+        run by the executor, which defaults to the executor in settings.
+        """
+        if executor is None:
+            executor = AnalysisExecutor.default()
+
+        dates, close = self.load()
+        coverage_ids = [str(c.id) for c in self.coverage]
+        chunk: int = DefaultSimulationWithPriceAPI.ensemble_chunk_runs
+        tasks: List[Tuple] = [
+            (
+                min(chunk, runs - start),
+                coverage_ids,
+                dates,
+                close,
+                self.signal,
+                self.get_params(),
+            )
+            for start in range(0, runs, chunk)
+        ]
+        sims: npt.NDArray[np.float64] = np.concatenate(
+            executor.map(DefaultSimulationWithPriceAPI.simulate_chunk, tasks)
+        )
 
-            self.results = AntevortaResults(
-                cash=inc[0],
-                isa=inc[1],
-                gia=inc[2],
-                sipp=inc[3],
+        bands: npt.NDArray[np.float64] = np.percentile(
+            sims, [5, 25, 50, 75, 95], axis=0
+        )
+        percentiles: List[AntevortaPercentiles] = [
+            AntevortaPercentiles(
+                p5=band[0], p25=band[1], p50=band[2], p75=band[3], p95=band[4]
             )
-        except InsufficientDataError:
-            raise AntevortaInsufficientDataException
+            for band in bands.T.tolist()
+        ]
+        self.ensemble_results = AntevortaEnsembleResults(
+            runs=runs,
+            cash=percentiles[0],
+            isa=percentiles[1],
+            gia=percentiles[2],
+            sipp=percentiles[3],
+        )
+        return
+
+    def run_grid(
+        self,
+        grid: Dict[str, List[float]],
+        runs: int = 1,
+        executor: Optional[AnalysisExecutor] = None,
+    ) -> None:
+        """Runs the simulation for every combination of the values in grid,
+        other parameters keep their single value. Prices are loaded once
+        and each combination is one task for the executor, which defaults
+        to the executor in settings.
+        """
+        if executor is None:
+            executor = AnalysisExecutor.default()
+
+        dates, close = self.load()
+        coverage_ids = [str(c.id) for c in self.coverage]
+        names: List[str] = list(grid)
+        points: List[Tuple[float, ...]] = list(product(*[grid[i] for i in names]))
+        tasks: List[Tuple] = [
+            (
+                runs,
+                coverage_ids,
+                dates,
+                close,
+                self.signal,
+                {**self.get_params(), **dict(zip(names, point))},
+            )
+            for point in points
+        ]
+        sims: List[npt.NDArray[np.float64]] = executor.map(
+            DefaultSimulationWithPriceAPI.simulate_chunk, tasks
+        )
+
+        self.grid_results = AntevortaGridResults(
+            runs=runs,
+            columns=names + DefaultSimulationWithPriceAPI.accounts,
+            rows=[
+                list(point) + np.median(res, axis=0).tolist()
+                for point, res in zip(points, sims)
+            ],
+        )
         return
 
     def __init__(self, antevorta: AntevortaClientInput):
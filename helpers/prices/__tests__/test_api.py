@@ -0,0 +1,159 @@
+from concurrent.futures import ThreadPoolExecutor
+import tempfile
+from threading import Barrier, Thread
+import time
+from django.test import SimpleTestCase
+from unittest.mock import Mock, patch
+
+from api.models import Coverage
+
+from ..api import (
+    PriceAPIConcurrentFetch,
+    PriceAPIRequest,
+    PriceAPIRequests,
+    PriceAPISingleFlight,
+)
+from ..cache import PriceCache
+from ..data import FakeData
+from .test_cache import get_raw
+
+
+def slow_request(delay: float, value):
+    request = Mock()
+
+    def get():
+        time.sleep(delay)
+        return value
+
+    request.get.side_effect = get
+    return request
+
+
+def barrier_request(barrier: Barrier, value):
+    request = Mock()
+
+    def get():
+        barrier.wait()
+        return value
+
+    request.get.side_effect = get
+    return request
+
+
+class TestPriceAPIConcurrentFetch(SimpleTestCase):
+    def test_that_results_keep_request_order(self):
+        requests = [slow_request(0.2 - (i * 0.05), i) for i in range(4)]
+        res = PriceAPIConcurrentFetch(max_workers=4, timeout=5).get(requests)
+        self.assertEqual(res, [0, 1, 2, 3])
+        return
+
+    def test_that_requests_run_concurrently(self):
+        ##Each request waits for the others, run serially the first would
+        ##break the barrier
+        barrier = Barrier(4, timeout=5)
+        requests = [barrier_request(barrier, i) for i in range(4)]
+        res = PriceAPIConcurrentFetch(max_workers=4, timeout=10).get(requests)
+        self.assertEqual(res, [0, 1, 2, 3])
+        self.assertFalse(barrier.broken)
+        return
+
+    def test_that_slow_asset_throws_connection_error(self):
+        requests = [slow_request(0, 0), slow_request(1, 1)]
+        fetch = PriceAPIConcurrentFetch(max_workers=2, timeout=0.1)
+        self.assertRaises(ConnectionError, fetch.get, requests)
+        return
+
+    def test_that_single_worker_runs_serially(self):
+        requests = [slow_request(0, i) for i in range(3)]
+        res = PriceAPIConcurrentFetch(max_workers=1, timeout=5).get(requests)
+        self.assertEqual(res, [0, 1, 2])
+        return
+
+
+class TestPriceAPIRequests(SimpleTestCase):
+    def test_that_overlapping_is_keyed_by_coverage_order(self):
+        coverage = [Mock(id=2), Mock(id=1)]
+        req = PriceAPIRequests(coverage, max_workers=2, timeout=5)  # type: ignore
+        req.requests = [
+            slow_request(0.1, FakeData.get_investpy(1, 0.1, 100)),
+            slow_request(0, FakeData.get_investpy(1, 0.1, 50)),
+        ]
+        res = req.get_overlapping()
+        self.assertEqual(list(res.keys()), [2, 1])
+        self.assertEqual(res[2].get_length(), res[1].get_length())
+        return
+
+
+class TestPriceAPISingleFlight(SimpleTestCase):
+    def test_that_concurrent_calls_share_one_call(self):
+        flight = PriceAPISingleFlight()
+        func = Mock(side_effect=lambda: time.sleep(0.2) or "res")
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(flight.run, 1, func) for _ in range(4)]
+            res = [f.result() for f in futures]
+        self.assertEqual(res, ["res"] * 4)
+        self.assertEqual(func.call_count, 1)
+        self.assertFalse(flight.calls)
+        return
+
+    def test_that_exceptions_are_shared_and_not_retained(self):
+        flight = PriceAPISingleFlight()
+        func = Mock(side_effect=ConnectionError("foo"))
+        self.assertRaises(ConnectionError, flight.run, 1, func)
+
+        func.side_effect = None
+        func.return_value = "res"
+        self.assertEqual(flight.run(1, func), "res")
+        return
+
+
+class TestPriceAPIRequestCoalescing(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.cache = PriceCache(
+            self.dir.name, max_age=60, max_bytes=1024**2, process_lock=True
+        )
+        self.coverage = Coverage(
+            id=666, name="S&P 500", country_name="united states", security_type="index"
+        )
+        return
+
+    def tearDown(self):
+        self.dir.cleanup()
+        return
+
+    @patch("helpers.prices.api.PriceAPI.get_index_price_history")
+    def test_that_concurrent_requests_fetch_once(self, mock_price):
+        raw = get_raw()
+        mock_price.side_effect = lambda *args: time.sleep(0.2) or raw.copy()
+
+        def get():
+            return PriceAPIRequest(self.coverage, cache=self.cache).get()
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(get) for _ in range(4)]
+            sources = [f.result() for f in futures]
+        self.assertEqual(mock_price.call_count, 1)
+
+        ##Sources can't leak changes to each other
+        sources[0].convert_to_monthly()
+        self.assertEqual(sources[1].get_length(), sources[2].get_length())
+        self.assertNotEqual(sources[0].get_length(), sources[1].get_length())
+        return
+
+    def test_that_lock_is_exclusive_across_open_files(self):
+        acquired = []
+
+        def acquire():
+            with self.cache.lock(666, "index"):
+                acquired.append(time.time())
+
+        with self.cache.lock(666, "index"):
+            thread = Thread(target=acquire)
+            thread.start()
+            time.sleep(0.2)
+            self.assertFalse(acquired)
+        thread.join(timeout=5)
+        self.assertEqual(len(acquired), 1)
+        return
@@ -0,0 +1,303 @@
+import fcntl
+import os
+import tempfile
+import time
+from django.test import SimpleTestCase, TestCase
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+
+from api.models import Coverage
+
+from ..api import PriceAPIRequest, PriceDataVersion
+from ..cache import PriceCache
+from ..data import InvestPySource
+
+
+def get_raw(length: int = 100) -> pd.DataFrame:
+    idx = pd.Index(
+        data=pd.date_range("2000-09-01", periods=length, freq="D"), name="Date"
+    )
+    return pd.DataFrame(
+        {
+            "Close": np.random.normal(100, 1, length),
+            "Open": np.random.normal(100, 1, length),
+        },
+        index=idx,
+    )
+
+
+class TestPriceCache(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.cache = PriceCache(self.dir.name, max_age=60, max_bytes=1024**2)
+        return
+
+    def tearDown(self):
+        self.dir.cleanup()
+        return
+
+    def test_that_cache_returns_stored_data(self):
+        df = InvestPySource(get_raw()).data
+        self.assertIsNone(self.cache.get(1, "etf"))
+        self.cache.set(1, "etf", df)
+        res = self.cache.get(1, "etf")
+        self.assertTrue(res.equals(df))
+        self.assertIsNone(self.cache.get(1, "index"))
+        return
+
+    def test_that_stale_entries_are_misses(self):
+        self.cache.set(1, "etf", InvestPySource(get_raw()).data)
+        path = self.cache._path(1, "etf")
+        old = time.time() - 120
+        os.utime(path, (old, old))
+        self.assertIsNone(self.cache.get(1, "etf"))
+        return
+
+    def test_that_unreadable_entries_are_removed_as_misses(self):
+        self.cache.set(1, "etf", InvestPySource(get_raw()).data)
+        path = self.cache._path(1, "etf")
+        size = os.path.getsize(path)
+        for length in [0, size // 2]:
+            self.cache.set(1, "etf", InvestPySource(get_raw()).data)
+            with open(path, "r+b") as f:
+                f.truncate(length)
+            self.assertIsNone(self.cache.get(1, "etf", allow_stale=True))
+            self.assertFalse(os.path.exists(path))
+        return
+
+    def test_that_least_recently_read_entries_are_evicted(self):
+        df = InvestPySource(get_raw(1000)).data
+        self.cache.set(1, "etf", df)
+        size = os.path.getsize(self.cache._path(1, "etf"))
+        self.cache.max_bytes = size * 2
+
+        self.cache.set(2, "etf", df)
+        old = time.time() - 30
+        os.utime(self.cache._path(2, "etf"), (old, time.time()))
+        self.cache.get(1, "etf")
+        self.cache.set(3, "etf", df)
+
+        self.assertIsNotNone(self.cache.get(1, "etf"))
+        self.assertIsNone(self.cache.get(2, "etf"))
+        self.assertIsNotNone(self.cache.get(3, "etf"))
+        return
+
+    def test_that_lock_files_are_removed_with_their_entry(self):
+        self.cache.process_lock = True
+        df = InvestPySource(get_raw(1000)).data
+        for coverage_id in [1, 2]:
+            with self.cache.lock(coverage_id, "etf"):
+                self.cache.set(coverage_id, "etf", df)
+        size = os.path.getsize(self.cache._path(1, "etf"))
+        self.cache.max_bytes = size * 2
+
+        lock_path = self.cache._path(1, "etf") + ".lock"
+        with open(lock_path, "r") as f:
+            ##Held by another process so it is kept
+            fcntl.flock(f, fcntl.LOCK_EX)
+            self.cache.set(3, "etf", df)
+            self.assertTrue(os.path.exists(lock_path))
+        self.assertIsNone(self.cache.get(1, "etf"))
+
+        self.cache.set(4, "etf", df)
+        self.assertFalse(os.path.exists(self.cache._path(2, "etf") + ".lock"))
+        with self.cache.lock(2, "etf"):
+            self.assertTrue(os.path.exists(self.cache._path(2, "etf") + ".lock"))
+        return
+
+    def test_that_stale_temporary_files_are_removed(self):
+        df = InvestPySource(get_raw(1000)).data
+        self.cache.set(1, "etf", df)
+        size = os.path.getsize(self.cache._path(1, "etf"))
+        self.cache.max_bytes = size * 2
+
+        crashed = self.cache._path(2, "etf") + ".1.1.tmp"
+        writing = self.cache._path(3, "etf") + ".1.1.tmp"
+        for path in [crashed, writing]:
+            with open(path, "wb") as f:
+                f.write(b"0" * size)
+        old = time.time() - 120
+        os.utime(crashed, (old, old))
+
+        ##Write in progress counts towards the size of the store
+        self.cache.set(4, "etf", df)
+        self.assertFalse(os.path.exists(crashed))
+        self.assertTrue(os.path.exists(writing))
+        self.assertIsNone(self.cache.get(1, "etf"))
+        self.assertIsNotNone(self.cache.get(4, "etf"))
+        return
+
+
+class TestPriceAPIRequestWithCache(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.cache = PriceCache(self.dir.name, max_age=60, max_bytes=1024**2)
+        self.coverage = Coverage(
+            id=666, name="S&P 500", country_name="united states", security_type="index"
+        )
+        return
+
+    def tearDown(self):
+        self.dir.cleanup()
+        return
+
+    @patch("helpers.prices.api.PriceAPI.get_index_price_history")
+    def test_that_repeat_requests_use_cache(self, mock_price):
+        mock_price.side_effect = lambda *args: get_raw()
+
+        first = PriceAPIRequest(self.coverage, cache=self.cache).get()
+        second = PriceAPIRequest(self.coverage, cache=self.cache).get()
+        self.assertEqual(mock_price.call_count, 1)
+        self.assertTrue(first.get_returns().equals(second.get_returns()))
+        return
+
+    @patch("helpers.prices.api.PriceAPI.get_index_price_history")
+    def test_that_unreadable_entries_are_fetched_again(self, mock_price):
+        raw = get_raw()
+        mock_price.side_effect = lambda *args: raw.copy()
+        first = PriceAPIRequest(self.coverage, cache=self.cache).get()
+        with open(self.cache._path(666, "index"), "r+b") as f:
+            f.truncate(0)
+
+        second = PriceAPIRequest(self.coverage, cache=self.cache).get()
+        self.assertEqual(mock_price.call_count, 2)
+        self.assertTrue(first.get_returns().equals(second.get_returns()))
+        self.assertIsNotNone(self.cache.get(666, "index"))
+        return
+
+    def test_that_unknown_security_type_throws(self):
+        self.coverage.security_type = "bond"
+        request = PriceAPIRequest(self.coverage, cache=self.cache)
+        self.assertRaises(ValueError, request.get)
+        return
+
+
+class TestPriceAPIRequestDeltaRefresh(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.cache = PriceCache(self.dir.name, max_age=60, max_bytes=1024**2)
+        self.coverage = Coverage(
+            id=666, name="S&P 500", country_name="united states", security_type="index"
+        )
+        self.raw = get_raw(200)
+        return
+
+    def tearDown(self):
+        self.dir.cleanup()
+        return
+
+    def _age_entry(self):
+        path = self.cache._path(666, "index")
+        old = time.time() - 120
+        os.utime(path, (old, old))
+        return
+
+    @patch("helpers.prices.api.PriceAPI.get_index_price_history")
+    def test_that_stale_entries_only_fetch_new_rows(self, mock_price):
+        ##Last row was stored before that day's close
+        partial = self.raw.iloc[:150].copy()
+        partial.iloc[-1, 0] = 1.0
+        mock_price.return_value = partial
+        PriceAPIRequest(self.coverage, cache=self.cache).get()
+        self._age_entry()
+
+        mock_price.return_value = self.raw.iloc[149:].copy()
+        refreshed = PriceAPIRequest(self.coverage, cache=self.cache).get()
+        from_date = mock_price.call_args.args[2]
+        self.assertEqual(from_date, "28/01/2001")
+
+        full = InvestPySource(self.raw.copy())
+        self.assertTrue(refreshed.get_returns().equals(full.get_returns()))
+        self.assertFalse(self.cache.is_stale(666, "index"))
+        return
+
+    @patch("helpers.prices.api.PriceAPI.get_index_price_history")
+    def test_that_failed_refresh_returns_stored_data(self, mock_price):
+        mock_price.return_value = self.raw.copy()
+        first = PriceAPIRequest(self.coverage, cache=self.cache).get()
+        self._age_entry()
+
+        mock_price.side_effect = ConnectionError("foo")
+        second = PriceAPIRequest(self.coverage, cache=self.cache).get()
+        self.assertTrue(first.get_returns().equals(second.get_returns()))
+        return
+
+
+class TestPriceAPIRequestMonthlyCache(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.cache = PriceCache(self.dir.name, max_age=60, max_bytes=1024**2)
+        self.coverage = Coverage(
+            id=666, name="S&P 500", country_name="united states", security_type="index"
+        )
+        return
+
+    def tearDown(self):
+        self.dir.cleanup()
+        return
+
+    @patch.object(InvestPySource, "to_monthly", wraps=InvestPySource.to_monthly)
+    @patch("helpers.prices.api.PriceAPI.get_index_price_history")
+    def test_that_monthly_series_is_computed_once(self, mock_price, mock_monthly):
+        mock_price.side_effect = lambda *args: get_raw(400)
+
+        first = PriceAPIRequest(self.coverage, cache=self.cache).get_monthly()
+        second = PriceAPIRequest(self.coverage, cache=self.cache).get_monthly()
+        self.assertEqual(mock_monthly.call_count, 1)
+        self.assertTrue(first.get_returns().equals(second.get_returns()))
+
+        ##Rewriting the daily entry invalidates the monthly one
+        daily = self.cache.get(666, "index")
+        time.sleep(0.01)
+        self.cache.set(666, "index", daily)
+        PriceAPIRequest(self.coverage, cache=self.cache).get_monthly()
+        self.assertEqual(mock_monthly.call_count, 2)
+        return
+
+
+class TestPriceDataVersion(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.cache = PriceCache(self.dir.name, max_age=60, max_bytes=1024**2)
+        self.coverage = [
+            Coverage(id=2, name="FTSE 100", security_type="index"),
+            Coverage(id=1, name="S&P 500", security_type="index"),
+        ]
+        return
+
+    def tearDown(self):
+        self.dir.cleanup()
+        return
+
+    def test_that_there_is_no_token_until_every_price_is_cached(self):
+        df = InvestPySource(get_raw()).data
+        self.cache.set(1, "index", df)
+        self.assertIsNone(PriceDataVersion.token(self.coverage, self.cache))
+
+        self.cache.set(2, "index", df)
+        token = PriceDataVersion.token(self.coverage, self.cache)
+        self.assertIsNotNone(token)
+        reordered = PriceDataVersion.token(self.coverage[::-1], self.cache)
+        self.assertEqual(token, reordered)
+        return
+
+    def test_that_token_changes_when_prices_are_written(self):
+        df = InvestPySource(get_raw()).data
+        self.cache.set(1, "index", df)
+        self.cache.set(2, "index", df)
+        token = PriceDataVersion.token(self.coverage, self.cache)
+
+        modified = self.cache.modified(1, "index")
+        path = self.cache._path(1, "index")
+        os.utime(path, (modified + 1, modified + 1))
+        self.assertNotEqual(token, PriceDataVersion.token(self.coverage, self.cache))
+
+        os.utime(path, (modified - 120, modified - 120))
+        self.assertIsNone(PriceDataVersion.token(self.coverage, self.cache))
+        return
+
+    def test_that_factor_token_counts_factor_rows(self):
+        factor = [Coverage(id=3, name="ff3factordaily-MKT-RF", security_type="factor")]
+        self.assertEqual(PriceDataVersion.token(factor, self.cache), "factors:0")
+        return
@@ -0,0 +1,161 @@
+import time
+from django.test import SimpleTestCase
+import numpy as np
+import pandas as pd
+
+from ..data import FakeData, InvestPySource, SourceAligner
+from .test_cache import get_raw
+
+
+class TestInvestPySource(SimpleTestCase):
+    def test_that_raw_input_is_not_modified(self):
+        raw = get_raw(100)
+        raw["High"] = raw["Close"]
+        raw.iloc[10, 2] = np.nan
+        before = raw.copy()
+
+        source = InvestPySource(raw)
+        self.assertTrue(raw.equals(before))
+        self.assertEqual(source.get_length(), 98)
+        self.assertFalse(int(raw.index[10].timestamp()) in source.get_dates())
+        return
+
+    def test_that_dates_are_epoch_seconds(self):
+        raw = get_raw(10)
+        source = InvestPySource(raw.reset_index())
+        expected = [int(i.timestamp()) for i in raw.index[1:]]
+        self.assertEqual(source.get_dates().to_list(), expected)
+        self.assertEqual(source.get_dates().dtype, np.int64)
+        return
+
+    def test_that_append_matches_the_constructor(self):
+        raw = get_raw(100)
+        raw["High"] = raw["Close"]
+        raw.iloc[60, 2] = np.nan
+        raw.iloc[80, 0] = np.nan
+
+        stored = InvestPySource(raw.iloc[:50])
+        ##Fetches overlap the last stored row, which is replaced
+        partial = stored.data.copy()
+        partial.iloc[-1, partial.columns.get_loc("Close")] = 1.0
+        appended = InvestPySource(partial).append(raw.iloc[49:])
+        self.assertTrue(appended.data.equals(InvestPySource(raw).data))
+        self.assertTrue(stored.append(raw.iloc[:0]).data.equals(stored.data))
+        return
+
+
+class TestInvestPySourceLongHistory(SimpleTestCase):
+    """Absolute timings are in the bench_investpysource command"""
+
+    @staticmethod
+    def best_time(length: int, repeat: int = 5) -> float:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            FakeData.get_investpy(100, 1, length, 1)
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def test_that_construction_scales_with_vectorised_cost(self):
+        ##100x the rows takes ~5x as long when conversion is vectorised and
+        ##~40x with a Python call per row, relative timings don't depend on
+        ##the speed of the machine
+        self.best_time(500)
+        ratio = self.best_time(50_000) / self.best_time(500)
+        self.assertLess(ratio, 20)
+        return
+
+    def test_that_long_histories_are_converted(self):
+        source = FakeData.get_investpy(100, 1, 50_000, 1)
+        self.assertEqual(source.get_length(), 49_999)
+        self.assertEqual(source.get_dates().dtype, np.int64)
+        self.assertTrue((np.diff(source.get_dates()) > 0).all())
+        return
+
+
+class TestInvestPySourceMonthly(SimpleTestCase):
+    def setUp(self):
+        self.source = FakeData.get_investpy(100, 1, 400, 1)
+        return
+
+    def test_that_monthly_uses_last_close_of_each_month(self):
+        daily = self.source.data.copy()
+        self.source.convert_to_monthly()
+        monthly = self.source.data
+
+        dates = pd.to_datetime(daily.index, unit="s")
+        last_close = daily["Close"].groupby([dates.year, dates.month]).last()
+        self.assertTrue(np.array_equal(monthly["Close"], last_close.to_numpy()[1:]))
+
+        starts = pd.to_datetime(monthly.index, unit="s")
+        self.assertTrue((starts.day == 1).all())
+        expected_ret = np.round(last_close.pct_change().to_numpy()[1:] * 100, 3)
+        self.assertTrue(np.array_equal(monthly["ret"], expected_ret))
+        return
+
+    def test_that_convert_to_monthly_is_idempotent(self):
+        self.source.convert_to_monthly()
+        once = self.source.data.copy()
+        self.source.convert_to_monthly()
+        self.assertTrue(once.equals(self.source.data))
+        return
+
+    def test_that_one_row_per_month_is_still_resampled(self):
+        dates = pd.to_datetime(["2001-01-15", "2001-02-10", "2001-03-20"])
+        sparse = pd.DataFrame(
+            {"ret": [0.0, 5.0, -10.0], "Open": 100.0, "Close": [100.0, 105.0, 94.5]},
+            index=pd.Index(dates.astype("int64") // 10**9, name="time"),
+        )
+        source = InvestPySource(sparse)
+        source.convert_to_monthly()
+
+        starts = pd.to_datetime(source.get_dates(), unit="s")
+        self.assertEqual(
+            starts.strftime("%Y-%m-%d").tolist(), ["2001-02-01", "2001-03-01"]
+        )
+        self.assertEqual(source.data["ret"].tolist(), [5.0, -10.0])
+        self.assertTrue(source.monthly)
+        self.assertTrue(source.take(np.array([0])).monthly)
+        return
+
+    def test_that_unsorted_input_is_resampled_in_date_order(self):
+        expected = InvestPySource.to_monthly(self.source.data)
+        shuffled = self.source.data.sample(frac=1, random_state=1)
+        self.assertTrue(InvestPySource.to_monthly(shuffled).equals(expected))
+        return
+
+
+class TestSourceAligner(SimpleTestCase):
+    def test_that_align_matches_set_intersection(self):
+        sources = [
+            FakeData.get_investpy(1, 0.1, 100),
+            FakeData.get_investpy(1, 0.1, 60).take(np.arange(0, 59, 2)),
+            FakeData.get_factor(1, 0.1, 10),
+        ]
+        sources[2].data.index = sources[1].get_dates()[::3]
+
+        dates, positions = SourceAligner.align(sources)
+        expected = sorted(set.intersection(*[set(i.get_dates()) for i in sources]))
+        self.assertEqual(dates.tolist(), expected)
+        for source, pos in zip(sources, positions):
+            self.assertEqual(source.get_dates()[pos].tolist(), expected)
+        return
+
+    def test_that_align_handles_unsorted_and_disjoint_dates(self):
+        source = FakeData.get_investpy(1, 0.1, 20)
+        reversed_source = source.take(np.arange(18, -1, -1))
+        dates, positions = SourceAligner.align([reversed_source, source])
+        self.assertEqual(dates.tolist(), source.get_dates().tolist())
+        self.assertTrue(
+            np.array_equal(
+                reversed_source.take(positions[0]).get_returns_list(),
+                source.get_returns_list(),
+            )
+        )
+
+        later = FakeData.get_investpy(1, 0.1, 20)
+        later.data.index = later.data.index + 10**8
+        dates, positions = SourceAligner.align([source, later])
+        self.assertEqual(len(dates), 0)
+        self.assertEqual([len(i) for i in positions], [0, 0])
+        return
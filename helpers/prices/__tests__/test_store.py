@@ -0,0 +1,77 @@
+import mmap
+import os
+import tempfile
+from django.test import SimpleTestCase
+import numpy as np
+import pandas as pd
+
+from ..data import FakeData, FactorSource, InvestPySource
+from ..store import ColumnarPriceStore
+
+
+def is_mapped(arr) -> bool:
+    while arr is not None:
+        if isinstance(arr, (np.memmap, mmap.mmap)):
+            return True
+        arr = getattr(arr, "base", None)
+    return False
+
+
+class TestColumnarPriceStore(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "prices")
+        return
+
+    def tearDown(self):
+        self.dir.cleanup()
+        return
+
+    def test_that_store_round_trips_investpy_data(self):
+        source = FakeData.get_investpy(1, 0.1, 1000)
+        ColumnarPriceStore.write(self.path, source.data)
+        res = ColumnarPriceStore.read(self.path)
+        self.assertTrue(res.equals(source.data))
+        self.assertEqual(res.index.dtype, np.int64)
+        return
+
+    def test_that_sources_are_views_over_the_file(self):
+        source = FakeData.get_investpy(1, 0.1, 1000)
+        ColumnarPriceStore.write(self.path, source.data)
+        res = InvestPySource(ColumnarPriceStore.read(self.path))
+
+        self.assertTrue(is_mapped(res.data["Close"].to_numpy()))
+        self.assertTrue(is_mapped(res.get_dates().to_numpy()))
+        self.assertFalse(res.data["Close"].to_numpy().flags.writeable)
+        return
+
+    def test_that_factor_source_can_be_built_from_store(self):
+        factor = FakeData.get_factor(0, 0.1, 100)
+        factor.data.index = factor.data.index.astype(np.int64)
+        ColumnarPriceStore.write(self.path, factor.data)
+        res = FactorSource(ColumnarPriceStore.read(self.path))
+        self.assertTrue(
+            np.array_equal(res.get_returns_list(), factor.get_returns_list())
+        )
+        self.assertTrue(res.get_prices()["Close"].isna().all())
+        return
+
+    def test_that_empty_frames_round_trip(self):
+        df = pd.DataFrame(
+            {"ret": [], "Open": [], "Close": []},
+            index=pd.Index([], dtype=np.int64, name="time"),
+        )
+        ColumnarPriceStore.write(self.path, df)
+        self.assertEqual(len(ColumnarPriceStore.read(self.path)), 0)
+        return
+
+    def test_that_truncated_files_throw_value_error(self):
+        source = FakeData.get_investpy(1, 0.1, 100)
+        ColumnarPriceStore.write(self.path, source.data)
+        size = os.path.getsize(self.path)
+        for length in [0, 4, 8, size - 8, size - 3]:
+            ColumnarPriceStore.write(self.path, source.data)
+            with open(self.path, "r+b") as f:
+                f.truncate(length)
+            self.assertRaises(ValueError, ColumnarPriceStore.read, self.path)
+        return
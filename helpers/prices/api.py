@@ -1,25 +1,28 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from datetime import date
-from typing import Dict, List
+import threading
+from typing import Callable, Dict, Hashable, List, Optional, Tuple, TypeVar, Union
 
+from django.conf import settings
+from django.db import connection
 from django.db.models.query import QuerySet
 import investpy
 import pandas as pd
 
 from api.models import Coverage, FactorReturns
 
-from .data import DataSource, FactorSource, InvestPySource
+from .cache import PriceCache
+from .data import DataSource, FactorSource, InvestPySource, SourceAligner
+
+EARLIEST_DATE: str = "01/01/1970"
+
+T = TypeVar("T")
 
 
 class PriceAPIRequestMonthly:
     def get(self) -> DataSource:
-        ##Don't require transform for factor because they are
-        ##already monthly
-        res: DataSource = self.price_api.get()
-        if self.coverage.security_type == "factor":
-            return res
-        else:
-            res.convert_to_monthly()
-            return res
+        return self.price_api.get_monthly()
 
     def __init__(self, coverage_obj: Coverage) -> None:
         self.coverage = coverage_obj
@@ -27,72 +30,276 @@ class PriceAPIRequestMonthly:
         pass
 
 
+class PriceAPISingleFlight:
+    """
+    Coalesces concurrent calls for the same key within a process. The
+    first caller runs the function, callers arriving while it is in flight
+    wait for and share its result, or its exception. Nothing is retained
+    once the call completes.
+    """
+
+    def run(self, key: Hashable, func: Callable[[], T]) -> T:
+        with self.lock:
+            call: Optional[Future[T]] = self.calls.get(key)
+            is_leader: bool = call is None
+            if call is None:
+                call = Future()
+                self.calls[key] = call
+
+        if not is_leader:
+            return call.result()
+
+        try:
+            res: T = func()
+            call.set_result(res)
+            return res
+        except BaseException as exc:
+            call.set_exception(exc)
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+    def __init__(self) -> None:
+        self.lock: threading.Lock = threading.Lock()
+        self.calls: Dict[Hashable, Future] = {}
+
+
 class PriceAPIRequest:
-    def get(self) -> DataSource:
+    ##Shared by every request in the process
+    in_flight: PriceAPISingleFlight = PriceAPISingleFlight()
+
+    def _fetch(self, from_date: str = EARLIEST_DATE) -> pd.DataFrame:
         if self.coverage.security_type == "etf":
-            return InvestPySource(
-                PriceAPI.get_etf_price_history(
-                    self.coverage.name, self.coverage.country_name
-                )
+            return PriceAPI.get_etf_price_history(
+                self.coverage.name, self.coverage.country_name, from_date
             )
 
         elif self.coverage.security_type == "index":
-            return InvestPySource(
-                PriceAPI.get_index_price_history(
-                    self.coverage.name, self.coverage.country_name
-                )
+            return PriceAPI.get_index_price_history(
+                self.coverage.name, self.coverage.country_name, from_date
             )
 
         elif self.coverage.security_type == "fund":
-            return InvestPySource(
-                PriceAPI.get_fund_price_history(
-                    self.coverage.name, self.coverage.country_name
-                )
+            return PriceAPI.get_fund_price_history(
+                self.coverage.name, self.coverage.country_name, from_date
             )
 
         elif self.coverage.security_type == "stock":
-            return InvestPySource(
-                PriceAPI.get_stock_price_history(
-                    self.coverage.ticker, self.coverage.country_name
-                )
+            return PriceAPI.get_stock_price_history(
+                self.coverage.ticker, self.coverage.country_name, from_date
             )
-
-        elif self.coverage.security_type == "factor":
-            return FactorSource(FactorAPI.get_factor_price_history(self.coverage.name))
         else:
             raise ValueError("Unknown security type")
 
-    def __init__(self, coverage_obj: Coverage):
+    def _refresh(self, source: InvestPySource) -> InvestPySource:
+        """Fetches the rows from the last stored date on. The last row is
+        fetched again as it may have been stored before that day's close.
+        If the fetch fails the stored data is used until the entry next goes
+        stale.
+        """
+        last: date = pd.to_datetime(source.get_dates()[-1], unit="s").date()
+        if last > date.today():
+            return source
+
+        try:
+            delta: pd.DataFrame = self._fetch(last.strftime("%d/%m/%Y"))
+        except Exception:
+            return source
+        return source.append(delta)
+
+    def _load(self) -> pd.DataFrame:
+        if not self.cache:
+            return InvestPySource(self._fetch()).data
+
+        coverage_id: int = int(self.coverage.id)  # type: ignore
+        security_type: str = self.coverage.security_type
+        if not self.cache.is_stale(coverage_id, security_type):
+            fresh: Optional[pd.DataFrame] = self.cache.get(coverage_id, security_type)
+            if fresh is not None:
+                return fresh
+
+        with self.cache.lock(coverage_id, security_type):
+            ##Another worker may have refreshed the entry while we waited
+            cached: Optional[pd.DataFrame] = self.cache.get(
+                coverage_id, security_type, allow_stale=True
+            )
+            if cached is None:
+                source: InvestPySource = InvestPySource(self._fetch())
+            elif self.cache.is_stale(coverage_id, security_type):
+                source = self._refresh(InvestPySource(cached))
+            else:
+                return cached
+
+            self.cache.set(coverage_id, security_type, source.data)
+            return source.data
+
+    def _load_daily(self) -> pd.DataFrame:
+        key: Tuple[int, date, str] = (int(self.coverage.id), date.today(), "daily")  # type: ignore
+        return PriceAPIRequest.in_flight.run(key, self._load)
+
+    def _load_monthly(self) -> pd.DataFrame:
+        """Monthly series is stored beside the daily one and is only
+        recomputed when the daily entry has been written since.
+        """
+        daily: pd.DataFrame = self._load_daily()
+        if not self.cache:
+            return InvestPySource.to_monthly(daily)
+
+        coverage_id: int = int(self.coverage.id)  # type: ignore
+        monthly_type: str = self.coverage.security_type + "_monthly"
+        daily_modified: Optional[float] = self.cache.modified(
+            coverage_id, self.coverage.security_type
+        )
+        monthly_modified: Optional[float] = self.cache.modified(
+            coverage_id, monthly_type
+        )
+        if (
+            daily_modified is not None
+            and monthly_modified is not None
+            and monthly_modified >= daily_modified
+        ):
+            cached: Optional[pd.DataFrame] = self.cache.get(
+                coverage_id, monthly_type, allow_stale=True
+            )
+            if cached is not None:
+                return cached
+
+        monthly: pd.DataFrame = InvestPySource.to_monthly(daily)
+        self.cache.set(coverage_id, monthly_type, monthly)
+        return monthly
+
+    def get(self) -> DataSource:
+        if self.coverage.security_type == "factor":
+            return FactorSource(FactorAPI.get_factor_price_history(self.coverage.name))
+
+        ##Data is shared between every caller of the flight, the shallow copy
+        ##stops DataSource methods that replace the index leaking across
+        return InvestPySource(self._load_daily().copy(deep=False))
+
+    def get_monthly(self) -> DataSource:
+        ##Don't require transform for factor because they are
+        ##already monthly
+        if self.coverage.security_type == "factor":
+            return self.get()
+
+        key: Tuple[int, date, str] = (int(self.coverage.id), date.today(), "monthly")  # type: ignore
+        data: pd.DataFrame = PriceAPIRequest.in_flight.run(key, self._load_monthly)
+        return InvestPySource(data.copy(deep=False), monthly=True)
+
+    def __init__(self, coverage_obj: Coverage, cache: Optional[PriceCache] = None):
         self.coverage: Coverage = coverage_obj
+        self.cache: Optional[PriceCache] = (
+            cache if cache is not None else PriceCache.default()
+        )
+
+
+PriceRequest = Union[PriceAPIRequest, PriceAPIRequestMonthly]
+
+
+class PriceAPIConcurrentFetch:
+    """
+    Runs the get of several price requests on a bounded thread pool so
+    that latency scales with the slowest asset rather than the sum of all
+    of them. Results are returned in the order of the requests, not the
+    order in which they complete.
+
+    Attributes
+    ---------
+    max_workers: `int`
+        Upper bound on threads, one or less runs the requests serially
+    timeout: `Optional[float]`
+        Seconds to wait for each asset, None waits indefinitely
+
+    Raises
+    ---------
+    ConnectionError
+        An asset did not return within the timeout
+    """
+
+    @staticmethod
+    def _get_in_thread(request: PriceRequest) -> DataSource:
+        try:
+            return request.get()
+        finally:
+            ##Factor requests open a database connection per thread,
+            ##these aren't cleaned up by the request cycle
+            connection.close()
+
+    def get(self, requests: List[PriceRequest]) -> List[DataSource]:
+        if self.max_workers <= 1 or len(requests) <= 1:
+            return [request.get() for request in requests]
+
+        executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=min(self.max_workers, len(requests))
+        )
+        try:
+            futures: List[Future[DataSource]] = [
+                executor.submit(PriceAPIConcurrentFetch._get_in_thread, request)
+                for request in requests
+            ]
+            return [future.result(timeout=self.timeout) for future in futures]
+        except FuturesTimeoutError as exc:
+            raise ConnectionError("Timed out waiting for price data") from exc
+        finally:
+            ##Don't block the request on a hung upstream call
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def __init__(
+        self, max_workers: Optional[int] = None, timeout: Optional[float] = None
+    ):
+        self.max_workers: int = (
+            max_workers if max_workers is not None else settings.PRICE_API_MAX_WORKERS
+        )
+        self.timeout: Optional[float] = (
+            timeout if timeout is not None else settings.PRICE_API_TIMEOUT
+        )
+        if not self.timeout:
+            self.timeout = None
 
 
 class PriceAPIRequestsMonthly:
     def get(self) -> Dict[int, DataSource]:
-        return {int(i.id): j.get() for i, j in zip(self.coverage, self.requests)}  # type: ignore
+        sources: List[DataSource] = self.fetch.get(self.requests)  # type: ignore
+        return {int(i.id): j for i, j in zip(self.coverage, sources)}  # type: ignore
 
-    def __init__(self, coverage_objs: List[Coverage]):
+    def __init__(
+        self,
+        coverage_objs: List[Coverage],
+        max_workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ):
         self.coverage: List[Coverage] = coverage_objs
         self.requests: List[PriceAPIRequestMonthly] = [
             PriceAPIRequestMonthly(i) for i in coverage_objs
         ]
+        self.fetch: PriceAPIConcurrentFetch = PriceAPIConcurrentFetch(
+            max_workers, timeout
+        )
 
 
 class PriceAPIRequests:
     def get(self) -> Dict[int, DataSource]:
-        return {int(i.id): j.get() for i, j in zip(self.coverage, self.requests)}  # type: ignore
+        sources: List[DataSource] = self.fetch.get(self.requests)  # type: ignore
+        return {int(i.id): j for i, j in zip(self.coverage, sources)}  # type: ignore
 
     def get_overlapping(self) -> Dict[int, DataSource]:
-        sources = [request.get() for request in self.requests]
-        dates = [set(source.get_dates()) for source in sources]
-        date_intersection = sorted(set.intersection(*dates))
-        filtered_sources = [
-            source.filter_dates(date_intersection) for source in sources
-        ]
+        sources = self.fetch.get(self.requests)  # type: ignore
+        _, positions = SourceAligner.align(sources)
+        filtered_sources = [source.take(pos) for source, pos in zip(sources, positions)]
         return {int(i.id): source for i, source in zip(self.coverage, filtered_sources)}  # type: ignore
 
-    def __init__(self, coverage_objs: QuerySet[Coverage]):
+    def __init__(
+        self,
+        coverage_objs: QuerySet[Coverage],
+        max_workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ):
         self.coverage = coverage_objs
         self.requests = [PriceAPIRequest(i) for i in coverage_objs]
+        self.fetch: PriceAPIConcurrentFetch = PriceAPIConcurrentFetch(
+            max_workers, timeout
+        )
 
 
 class FactorAPI:
@@ -106,42 +313,88 @@ class FactorAPI:
         return pd.DataFrame(temp)
 
 
-class PriceAPI:
+class PriceDataVersion:
+    """
+    Token that changes whenever the price data for a set of assets can
+    change. Prices are versioned by the time their cache entry was written
+    and factors by the number of rows in FactorReturns, rows are only ever
+    added by update_ff.
+
+    There is no token, None, when the cache is disabled or when any price
+    isn't cached or is stale, the next fetch would write new data.
+    """
 
-    current_date: str = date.today().strftime("%d/%m/%Y")
+    @staticmethod
+    def token(
+        coverage: List[Coverage], cache: Optional[PriceCache] = None
+    ) -> Optional[str]:
+        if cache is None:
+            cache = PriceCache.default()
+        if cache is None:
+            return None
+
+        parts: List[str] = []
+        for asset in sorted(coverage, key=lambda x: int(x.id)):  # type: ignore
+            if asset.security_type == "factor":
+                continue
+            if cache.is_stale(int(asset.id), asset.security_type):  # type: ignore
+                return None
+            modified: Optional[float] = cache.modified(
+                int(asset.id), asset.security_type  # type: ignore
+            )
+            parts.append(f"{asset.id}:{modified!r}")
+
+        if any([asset.security_type == "factor" for asset in coverage]):
+            parts.append(f"factors:{FactorReturns.objects.count()}")
+        return ",".join(parts)
+
+
+class PriceAPI:
+    @staticmethod
+    def current_date() -> str:
+        ##Evaluated per call, workers live for longer than a day
+        return date.today().strftime("%d/%m/%Y")
 
     @staticmethod
-    def get_etf_price_history(etf: str, country: str) -> pd.DataFrame:
+    def get_etf_price_history(
+        etf: str, country: str, from_date: str = EARLIEST_DATE
+    ) -> pd.DataFrame:
         return investpy.get_etf_historical_data(
             etf=etf,
             country=country,
-            from_date="01/01/1970",
-            to_date=PriceAPI.current_date,
+            from_date=from_date,
+            to_date=PriceAPI.current_date(),
         )
 
     @staticmethod
-    def get_index_price_history(index: str, country: str) -> pd.DataFrame:
+    def get_index_price_history(
+        index: str, country: str, from_date: str = EARLIEST_DATE
+    ) -> pd.DataFrame:
         return investpy.get_index_historical_data(
             index=index,
             country=country,
-            from_date="01/01/1970",
-            to_date=PriceAPI.current_date,
+            from_date=from_date,
+            to_date=PriceAPI.current_date(),
         )
 
     @staticmethod
-    def get_fund_price_history(fund: str, country: str) -> pd.DataFrame:
+    def get_fund_price_history(
+        fund: str, country: str, from_date: str = EARLIEST_DATE
+    ) -> pd.DataFrame:
         return investpy.get_fund_historical_data(
             fund=fund,
             country=country,
-            from_date="01/01/1970",
-            to_date=PriceAPI.current_date,
+            from_date=from_date,
+            to_date=PriceAPI.current_date(),
         )
 
     @staticmethod
-    def get_stock_price_history(security: str, country: str) -> pd.DataFrame:
+    def get_stock_price_history(
+        security: str, country: str, from_date: str = EARLIEST_DATE
+    ) -> pd.DataFrame:
         return investpy.get_stock_historical_data(
             stock=security,
             country=country,
-            from_date="01/01/1970",
-            to_date=PriceAPI.current_date,
+            from_date=from_date,
+            to_date=PriceAPI.current_date(),
         )
@@ -0,0 +1,200 @@
+from contextlib import contextmanager
+import fcntl
+import os
+import threading
+import time
+from typing import Iterator, List, Optional, Tuple
+
+from django.conf import settings
+import pandas as pd
+
+from .store import ColumnarPriceStore
+
+
+class PriceCache:
+    """
+    Persistent on-disk store of price histories keyed by coverage id and
+    security type. Entries are written once per fetch and memory-mapped on
+    every request that hits the same asset, see ColumnarPriceStore.
+
+    Entries older than max_age are stale, stale entries are refreshed by
+    fetching only the rows after the last stored date. When the total size
+    of the store goes over max_bytes, the least recently read entries are
+    evicted first.
+
+    Attributes
+    ---------
+    directory: `str`
+        Location of the store on disk, created on first write
+    max_age: `int`
+        Seconds after which an entry is stale
+    max_bytes: `int`
+        Upper bound on the total size of the store
+    process_lock: `bool`
+        Serialise refreshes of an entry across processes with a lock file
+    """
+
+    __default: Optional["PriceCache"] = None
+
+    @staticmethod
+    def default() -> Optional["PriceCache"]:
+        """Shared store configured from settings, None when the cache is
+        disabled by setting PRICE_CACHE_DIR to an empty string.
+        """
+        if not settings.PRICE_CACHE_DIR:
+            return None
+
+        if PriceCache.__default is None:
+            PriceCache.__default = PriceCache(
+                directory=settings.PRICE_CACHE_DIR,
+                max_age=settings.PRICE_CACHE_MAX_AGE,
+                max_bytes=settings.PRICE_CACHE_MAX_BYTES,
+                process_lock=settings.PRICE_CACHE_PROCESS_LOCK,
+            )
+        return PriceCache.__default
+
+    def _path(self, coverage_id: int, security_type: str) -> str:
+        return os.path.join(self.directory, f"{security_type}_{coverage_id}.prices")
+
+    def _entries(self) -> Tuple[List[Tuple[float, int, str]], int]:
+        """Returns the entries and the size of writes in progress. Temporary
+        files older than max_age were left by a writer that crashed before
+        the rename and are removed.
+        """
+        res: List[Tuple[float, int, str]] = []
+        pending: int = 0
+        now: float = time.time()
+        for name in os.listdir(self.directory):
+            if not name.endswith(".prices") and not name.endswith(".tmp"):
+                continue
+            path: str = os.path.join(self.directory, name)
+            try:
+                stat: os.stat_result = os.stat(path)
+                if name.endswith(".tmp"):
+                    if now - stat.st_mtime > self.max_age:
+                        os.remove(path)
+                    else:
+                        pending += stat.st_size
+                    continue
+            except FileNotFoundError:
+                ##Evicted or renamed by another process
+                continue
+            res.append((stat.st_atime, stat.st_size, path))
+        return res, pending
+
+    def _evict(self) -> None:
+        entries, pending = self._entries()
+        total: int = pending + sum([size for _, size, _ in entries])
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._remove_lock(path + ".lock")
+            total -= size
+        return
+
+    @staticmethod
+    def _remove_lock(path: str) -> None:
+        """Removes the lock file of an evicted entry unless another process
+        holds it, lock retries when the file it locked has been removed.
+        """
+        try:
+            with open(path, "r") as f:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                os.remove(path)
+        except (FileNotFoundError, BlockingIOError):
+            pass
+        return
+
+    def modified(self, coverage_id: int, security_type: str) -> Optional[float]:
+        try:
+            return os.stat(self._path(coverage_id, security_type)).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def is_stale(self, coverage_id: int, security_type: str) -> bool:
+        try:
+            stat: os.stat_result = os.stat(self._path(coverage_id, security_type))
+        except FileNotFoundError:
+            return True
+        return time.time() - stat.st_mtime > self.max_age
+
+    def get(
+        self, coverage_id: int, security_type: str, allow_stale: bool = False
+    ) -> Optional[pd.DataFrame]:
+        """Returns None on a miss. Stale entries are only returned with
+        allow_stale, so that callers can refresh them incrementally. An
+        entry that can't be read is removed and treated as a miss.
+        """
+        path: str = self._path(coverage_id, security_type)
+        try:
+            stat: os.stat_result = os.stat(path)
+            if not allow_stale and time.time() - stat.st_mtime > self.max_age:
+                return None
+            df: pd.DataFrame = ColumnarPriceStore.read(path)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return None
+
+        ##Access time is set explicitly as filesystems are often mounted
+        ##with relatime/noatime, mtime is left alone so staleness holds
+        os.utime(path, (time.time(), stat.st_mtime))
+        return df
+
+    @contextmanager
+    def lock(self, coverage_id: int, security_type: str) -> Iterator[None]:
+        """Exclusive lock on an entry shared by every process using the
+        store, so that only one of them fetches while the others wait and
+        then read the result. Does nothing without process_lock.
+        """
+        if not self.process_lock:
+            yield
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        path: str = self._path(coverage_id, security_type) + ".lock"
+        while True:
+            with open(path, "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    ##Eviction may have removed the file while this waited
+                    if os.fstat(f.fileno()).st_ino != os.stat(path).st_ino:
+                        continue
+                except FileNotFoundError:
+                    continue
+                try:
+                    yield
+                    return
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def set(self, coverage_id: int, security_type: str, df: pd.DataFrame) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path: str = self._path(coverage_id, security_type)
+        ##Write then rename so readers in other workers never see a
+        ##partially written file
+        tmp: str = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        ColumnarPriceStore.write(tmp, df)
+        os.replace(tmp, path)
+        self._evict()
+        return
+
+    def __init__(
+        self,
+        directory: str,
+        max_age: int,
+        max_bytes: int,
+        process_lock: bool = False,
+    ):
+        self.directory: str = directory
+        self.max_age: int = max_age
+        self.max_bytes: int = max_bytes
+        self.process_lock: bool = process_lock
@@ -1,5 +1,5 @@
 import datetime
-from typing import List, Optional, Type, TypeVar, Union
+from typing import List, Optional, Sequence, Tuple, Type, TypeVar, Union
 
 import numpy as np
 import numpy.typing as npt
@@ -18,6 +18,9 @@ class FactorSource:
     def filter_dates(self, dates: List[pd.Timestamp]):
         return FactorSource(self.data.loc[dates])
 
+    def take(self, positions: npt.NDArray[np.intp]) -> "FactorSource":
+        return FactorSource(self.data.take(positions))
+
     def get_dates(self) -> pd.Index:
         return self.data.index
 
@@ -48,30 +51,48 @@ class FactorSource:
 
 
 class InvestPySource:
-    def convert_to_monthly(self) -> None:
-        ##Non-idempotent
-        self.data.index = pd.to_datetime(self.data.index.to_list(), unit="s")
-        df = self.data.groupby(
-            by=[self.data.index.year, self.data.index.month]  # type: ignore
-        ).last()
-        df.index.set_names(["year", "month"], inplace=True)
-        df.reset_index(inplace=True)
-        df["ret"] = round(df["Close"].pct_change(1) * 100, 3)
-        df["time"] = pd.to_datetime(
-            df["year"].astype(str) + "-" + df["month"].astype(str), format="%Y-%m"
+    @staticmethod
+    def to_monthly(df: pd.DataFrame) -> pd.DataFrame:
+        """Resamples daily data to the last row of each month, indexed by
+        the epoch of the start of that month. Returns are recalculated from
+        the monthly close so the first month is dropped.
+        """
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index()
+
+        time: npt.NDArray[np.int64] = df.index.to_numpy(dtype=np.int64)
+        months: npt.NDArray[np.datetime64] = time.astype("datetime64[s]").astype(
+            "datetime64[M]"
+        )
+        month_start: npt.NDArray[np.int64] = months.astype("datetime64[s]").astype(
+            np.int64
         )
-        df["time"] = df["time"].apply(lambda x: int(x.timestamp() * 1))
-        filtered = df[["time", "ret", "Open", "Close"]].copy()
-        filtered.set_index("time", inplace=True)
-        filtered.dropna(inplace=True)
-        self.data = filtered
+        last: npt.NDArray[np.intp] = np.flatnonzero(
+            np.append(months[1:] != months[:-1], True)
+        )
+        closes: npt.NDArray[np.float64] = df["Close"].to_numpy(dtype=np.float64)[last]
+        opens: npt.NDArray[np.float64] = df["Open"].to_numpy(dtype=np.float64)[last]
+        ret: npt.NDArray[np.float64] = np.round((closes[1:] / closes[:-1] - 1) * 100, 3)
+        return pd.DataFrame(
+            {"ret": ret, "Open": opens[1:], "Close": closes[1:]},
+            index=pd.Index(month_start[last][1:], name="time"),
+        )
+
+    def convert_to_monthly(self) -> None:
+        if self.monthly:
+            return
+        self.data = InvestPySource.to_monthly(self.data)
+        self.monthly = True
         return
 
     def get_length(self) -> int:
         return len(self.data)
 
     def filter_dates(self, dates: List[pd.Timestamp]):
-        return InvestPySource(self.data.loc[dates])
+        return InvestPySource(self.data.loc[dates], monthly=self.monthly)
+
+    def take(self, positions: npt.NDArray[np.intp]) -> "InvestPySource":
+        return InvestPySource(self.data.take(positions), monthly=self.monthly)
 
     def get_dates(self) -> pd.Index:
         return self.data.index
@@ -88,19 +109,80 @@ class InvestPySource:
     def get_returns_list(self) -> npt.NDArray[np.float64]:
         return self.get_returns()["ret"].to_numpy(dtype=np.float64)  # type: ignore
 
-    def __init__(self, df: pd.DataFrame):
+    @staticmethod
+    def _format(
+        df: pd.DataFrame, previous_close: Optional[float] = None
+    ) -> pd.DataFrame:
+        """Formats a raw investpy frame. Rows with a NaN in any column of the
+        raw frame, or without a return, are dropped. previous_close is the
+        close before the first row, without it the first row has no return.
+        """
+        dates: pd.DatetimeIndex = pd.DatetimeIndex(
+            df["Date"] if "Date" in df.columns else df.index
+        )
+        close: pd.Series = df["Close"]
+        if previous_close is not None:
+            close = pd.concat(
+                [pd.Series([previous_close]), close.reset_index(drop=True)],
+                ignore_index=True,
+            )
+        ret: npt.NDArray[np.float64] = (
+            (close.pct_change(1) * 100).round(3).to_numpy()[len(close) - len(df) :]
+        )
+        ##Matches dropna over the whole raw frame, including columns we drop
+        valid: npt.NDArray[np.bool_] = ~(
+            df.isna().any(axis=1).to_numpy() | np.isnan(ret)
+        )
+        time: npt.NDArray[np.int64] = dates.values.astype("datetime64[s]").astype(
+            np.int64
+        )
+        return pd.DataFrame(
+            {
+                "ret": ret[valid],
+                "Open": df["Open"].to_numpy()[valid],
+                "Close": df["Close"].to_numpy()[valid],
+            },
+            index=pd.Index(time[valid], name="time"),
+        )
+
+    def append(self, df: pd.DataFrame) -> "InvestPySource":
+        """Merges raw investpy rows fetched from a date on. They replace the
+        stored rows from the first fetched date, so a row stored before that
+        day's close is corrected, and the stored close before that date is
+        used for the first return. Rows are dropped as in the constructor.
+        """
+        if df.empty:
+            return self
+        first: pd.Timestamp = pd.DatetimeIndex(
+            df["Date"] if "Date" in df.columns else df.index
+        )[0]
+        kept: int = int(
+            np.searchsorted(
+                self.data.index.to_numpy(dtype=np.int64), int(first.timestamp())
+            )
+        )
+        previous_close: Optional[float] = None
+        if kept > 0:
+            previous_close = float(self.data["Close"].iloc[kept - 1])
+
+        fetched: pd.DataFrame = InvestPySource._format(df, previous_close)
+        if fetched.empty:
+            return self
+        return InvestPySource(pd.concat([self.data.iloc[:kept], fetched]))
+
+    def __init__(self, df: pd.DataFrame, monthly: bool = False):
+        """Takes either a formatted frame, which is used as is, or a raw
+        investpy frame with dates in a Date index or column. The raw frame
+        isn't modified. monthly marks a formatted frame that has already
+        been resampled by to_monthly, only daily data is resampled.
+        """
+        self.monthly: bool = monthly
         if "ret" in df.columns:
             self.data = df
             return
-        else:
-            df.reset_index(inplace=True)
-            df["ret"] = round(df["Close"].pct_change(1) * 100, 3)
-            df.dropna(inplace=True)
-            df["time"] = df["Date"].apply(lambda x: int(x.timestamp() * 1))
-            filtered = df[["time", "ret", "Open", "Close"]]
-            filtered.set_index("time", inplace=True)
-            self.data = filtered  # type: ignore
-            self.length = len(filtered)
+
+        self.data = InvestPySource._format(df)
+        self.length = len(self.data)
 
 
 DataSource = Union[FactorSource, InvestPySource]
@@ -120,6 +202,36 @@ class SourceFactory:
         return cls(data.data.iloc[start:end])
 
 
+class SourceAligner:
+    @staticmethod
+    def align(
+        sources: Sequence[DataSource],
+    ) -> Tuple[npt.NDArray[np.int64], List[npt.NDArray[np.intp]]]:
+        """Intersects the dates of every source. Returns the sorted common
+        dates and, for each source, the positions of those dates in that
+        source so rows can be gathered with take rather than by label.
+        Dates within a source are assumed to be unique.
+        """
+        if not sources:
+            return np.array([], dtype=np.int64), []
+
+        common: npt.NDArray[np.int64] = np.asarray(
+            sources[0].get_dates(), dtype=np.int64
+        )
+        positions: List[npt.NDArray[np.intp]] = [np.argsort(common, kind="stable")]
+        common = common[positions[0]]
+        for source in sources[1:]:
+            dates: npt.NDArray[np.int64] = np.asarray(
+                source.get_dates(), dtype=np.int64
+            )
+            common, in_common, in_source = np.intersect1d(
+                common, dates, assume_unique=True, return_indices=True
+            )
+            positions = [pos[in_common] for pos in positions]
+            positions.append(in_source)
+        return common, positions
+
+
 class FakeData:
     @staticmethod
     def get_investpy(
@@ -128,10 +240,7 @@ class FakeData:
         if seed:
             np.random.seed(seed)
 
-        dates = [
-            pd.Timestamp(datetime.date(2000, 9, 1)) + pd.DateOffset(days=i)
-            for i in range(length)
-        ]
+        dates = pd.date_range(datetime.date(2000, 9, 1), periods=length, freq="D")
 
         idx = pd.Index(data=dates, name="Date")
         df = pd.DataFrame(
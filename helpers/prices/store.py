@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+
+class ColumnarPriceStore:
+    """
+    File layout for one price history. Dates and each price column are
+    stored contiguously so a read memory-maps the file and wraps the
+    columns in a DataFrame without copying or parsing. Every worker that
+    maps the same file shares the same pages.
+
+        int64 rows | int64 time[rows] | float64 ret[rows] | Open | Close
+
+    The frame returned by read is read-only and can be passed straight to
+    InvestPySource or FactorSource. Columns missing on write, Open and Close
+    for factors, are stored as NaN. read throws ValueError if the file size
+    doesn't match the number of rows in its header.
+    """
+
+    columns = ["ret", "Open", "Close"]
+
+    @staticmethod
+    def write(path: str, df: pd.DataFrame) -> None:
+        rows: int = len(df)
+        time: npt.NDArray[np.int64] = np.ascontiguousarray(
+            df.index.to_numpy(), dtype="<i8"
+        )
+        with open(path, "wb") as f:
+            np.array([rows], dtype="<i8").tofile(f)
+            time.tofile(f)
+            for col in ColumnarPriceStore.columns:
+                if col in df.columns:
+                    values = np.ascontiguousarray(df[col].to_numpy(), dtype="<f8")
+                else:
+                    values = np.full(rows, np.nan, dtype="<f8")
+                values.tofile(f)
+        return
+
+    @staticmethod
+    def read(path: str) -> pd.DataFrame:
+        size: int = os.path.getsize(path)
+        if size < 8:
+            raise ValueError("Price store file has no header")
+        ints: np.memmap = np.memmap(path, dtype="<i8", mode="r", shape=(size // 8,))
+        rows: int = int(ints[0])
+        if rows < 0 or size != 8 * (1 + rows * (1 + len(ColumnarPriceStore.columns))):
+            raise ValueError("Price store file doesn't match its header")
+        if rows == 0:
+            return pd.DataFrame(
+                {col: [] for col in ColumnarPriceStore.columns},
+                index=pd.Index([], dtype=np.int64, name="time"),
+            )
+
+        time: np.memmap = ints[1 : 1 + rows]
+        values: np.memmap = np.memmap(
+            path,
+            dtype="<f8",
+            mode="r",
+            offset=8 * (1 + rows),
+            shape=(len(ColumnarPriceStore.columns), rows),
+        )
+        ##Transposed values are a single block in pandas so nothing is copied
+        return pd.DataFrame(
+            values.T,
+            columns=ColumnarPriceStore.columns,
+            index=pd.Index(time, name="time"),
+            copy=False,
+        )
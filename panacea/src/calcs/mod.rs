@@ -1,81 +1,66 @@
+use pyo3::buffer::{Element, PyBuffer};
+use pyo3::exceptions::PyValueError;
 use pyo3::prelude::*;
 use pyo3::types::{PyFloat, PyList};
 
-fn cum_returns(returns: Vec<f64>) -> Vec<f64> {
-    let mut res: Vec<f64> = Vec::new();
-    let mut tmp = 1.0;
-    res.push(tmp);
-    for i in returns {
-        tmp = tmp * (1.0 + (i / 100.0));
-        res.push(tmp);
-    }
-    res
-}
+mod threshold;
+
+use self::threshold::{threshold_positions, threshold_positions_batch, BatchPositions};
 
 #[pyfunction]
 pub fn max_dd_threshold_position(
     returns: &PyList,
     threshold: &PyFloat,
 ) -> Result<Vec<(f64, f64, f64)>, PyErr> {
-    /*Finds every drawdown greater than the threshold.
-    Drawdown is any period in which the asset drops
-    by more than the threshold, until it surpasses the
-    peak during that same period.
+    /*Drawdowns of a single path, see threshold_positions.
 
     If the asset is in a drawdown at the end of the period
     then we should return the last date.
-
-    Returns the scale of the drawdown, and the start
-    and end period of the drawdown.
     */
 
     let returns_r: Vec<f64> = returns.extract()?;
     let threshold_r: f64 = threshold.extract()?;
-    let total_returns: Vec<f64> = cum_returns(returns_r);
-
-    let mut peak: f64 = 1.0;
-    let mut trough: f64 = 1.0;
-    let mut t1: f64 = 0.0;
-    let mut t2: f64 = 0.0;
-    let mut result_buffer = (0.0, 0.0, 0.0);
-    let mut res: Vec<(f64, f64, f64)> = Vec::new();
+    Ok(threshold_positions(returns_r.into_iter(), threshold_r))
+}
 
-    for i in 0..total_returns.len() {
-        /*Four conditions:
-        * We are at a new high coming out of a drawdown,
-        therefore the drawdown has ended. We set the drawdown
-        end position, and reset the buffer.
-        * We are at a new high without a drawdown, we
-        reset the start position of drawdown.
-        * We are below the peak, but not below the threshold.
-        * We are below the peak, and exceed the threshold.
-        We record the size of the dd.
-        */
+#[pyfunction]
+pub fn max_dd_threshold_position_batch(
+    py: Python,
+    returns: &PyAny,
+    threshold: f64,
+) -> PyResult<BatchPositions> {
+    /*Drawdowns of every row of a C-contiguous float64
+    (paths x periods) array, read in place through the
+    buffer protocol. See threshold_positions_batch.
+    */
 
-        t1 = total_returns[i];
-        if t1 > peak {
-            if !(result_buffer.2 == 0.0) {
-                result_buffer.1 = i as f64;
-                if result_buffer.2 < threshold_r {
-                    res.push(result_buffer);
-                }
-                result_buffer = (0.0, 0.0, 0.0);
-                result_buffer.0 = i as f64 + 1.0;
-                result_buffer.1 = i as f64 + 1.0;
-                peak = t1;
-                trough = peak;
-            } else {
-                result_buffer.0 = i as f64 + 1.0;
-            }
-        } else if t1 < trough {
-            trough = t1;
-            t2 = (trough / peak) - 1.0;
-            if t2 < result_buffer.2 {
-                result_buffer.2 = t2;
-            }
-        }
+    let buffer: PyBuffer<f64> = PyBuffer::get(returns)?;
+    /*The slice below assumes aligned native f64 in row-major
+    order, so the layout is checked rather than relying on
+    the caller.
+    */
+    if !f64::is_compatible_format(buffer.format())
+        || buffer.item_size() != std::mem::size_of::<f64>()
+        || buffer.buf_ptr() as usize % std::mem::align_of::<f64>() != 0
+    {
+        return Err(PyValueError::new_err("returns must be a float64 array"));
+    }
+    if buffer.dimensions() != 2 || !buffer.is_c_contiguous() {
+        return Err(PyValueError::new_err(
+            "returns must be a C-contiguous 2d array",
+        ));
     }
-    Ok(res)
+    let periods: usize = buffer.shape()[1];
+    if buffer.item_count() != buffer.shape()[0] * periods {
+        return Err(PyValueError::new_err("returns has an inconsistent shape"));
+    }
+    /*The buffer holds a reference to the array so the data
+    stays valid while it is read without the GIL.
+    */
+    let data: &[f64] =
+        unsafe { std::slice::from_raw_parts(buffer.buf_ptr() as *const f64, buffer.item_count()) };
+
+    Ok(py.allow_threads(|| threshold_positions_batch(data, periods, threshold)))
 }
 
 #[cfg(test)]
@@ -0,0 +1,140 @@
+pub fn threshold_positions<I>(returns: I, threshold: f64) -> Vec<(f64, f64, f64)>
+where
+    I: Iterator<Item = f64>,
+{
+    /*Finds every drawdown greater than the threshold.
+    Drawdown is any period in which the asset drops
+    by more than the threshold, until it surpasses the
+    peak during that same period.
+
+    Returns the scale of the drawdown, and the start
+    and end period of the drawdown.
+
+    Cumulative returns start at 1.0 before the first
+    return so position i is after the return at i - 1.
+    */
+
+    let mut peak: f64 = 1.0;
+    let mut trough: f64 = 1.0;
+    let mut t1: f64 = 1.0;
+    let mut t2: f64 = 0.0;
+    let mut result_buffer = (0.0, 0.0, 0.0);
+    let mut res: Vec<(f64, f64, f64)> = Vec::new();
+
+    for (i, ret) in std::iter::once(0.0).chain(returns).enumerate() {
+        /*Four conditions:
+        * We are at a new high coming out of a drawdown,
+        therefore the drawdown has ended. We set the drawdown
+        end position, and reset the buffer.
+        * We are at a new high without a drawdown, we
+        reset the start position of drawdown.
+        * We are below the peak, but not below the threshold.
+        * We are below the peak, and exceed the threshold.
+        We record the size of the dd.
+        */
+
+        t1 = t1 * (1.0 + (ret / 100.0));
+        if t1 > peak {
+            if !(result_buffer.2 == 0.0) {
+                result_buffer.1 = i as f64;
+                if result_buffer.2 < threshold {
+                    res.push(result_buffer);
+                }
+                result_buffer = (0.0, 0.0, 0.0);
+                result_buffer.0 = i as f64 + 1.0;
+                result_buffer.1 = i as f64 + 1.0;
+                peak = t1;
+                trough = peak;
+            } else {
+                result_buffer.0 = i as f64 + 1.0;
+            }
+        } else if t1 < trough {
+            trough = t1;
+            t2 = (trough / peak) - 1.0;
+            if t2 < result_buffer.2 {
+                result_buffer.2 = t2;
+            }
+        }
+    }
+    res
+}
+
+pub type BatchPositions = (Vec<i64>, Vec<i64>, Vec<i64>, Vec<f64>);
+
+pub fn threshold_positions_batch(data: &[f64], periods: usize, threshold: f64) -> BatchPositions {
+    /*Drawdowns of every row of a row-major (paths x periods)
+    array.
+
+    Returns flat vectors with one element per drawdown: the
+    row, start, end and size. Rows are in order and the
+    drawdowns of each row are in the order returned by
+    threshold_positions.
+    */
+
+    let mut paths: Vec<i64> = Vec::new();
+    let mut starts: Vec<i64> = Vec::new();
+    let mut ends: Vec<i64> = Vec::new();
+    let mut sizes: Vec<f64> = Vec::new();
+    if periods == 0 {
+        return (paths, starts, ends, sizes);
+    }
+    for (path, row) in data.chunks(periods).enumerate() {
+        for dd in threshold_positions(row.iter().copied(), threshold) {
+            paths.push(path as i64);
+            starts.push(dd.0 as i64);
+            ends.push(dd.1 as i64);
+            sizes.push(dd.2);
+        }
+    }
+    (paths, starts, ends, sizes)
+}
+
+#[cfg(test)]
+mod tests {
+
+    use super::{threshold_positions, threshold_positions_batch};
+
+    #[test]
+    fn finds_each_drawdown_over_threshold() {
+        let rets = vec![1.0, -8.0, 2.0, 9.0, -12.0, 3.0, 20.0, -1.0];
+        let res = threshold_positions(rets.iter().copied(), -0.05);
+        assert_eq!(res.len(), 2);
+        assert_eq!(res[0].1, 4.0);
+        assert_eq!(res[1].1, 7.0);
+    }
+
+    #[test]
+    fn batch_matches_each_path() {
+        let periods: usize = 40;
+        /*Deterministic returns between -10 and 10 with
+        drawdowns in many rows
+        */
+        let data: Vec<f64> = (0..periods * 25)
+            .map(|i| ((i * 7919 % 211) as f64 / 10.5) - 10.0)
+            .collect();
+
+        let mut expected: Vec<(i64, i64, i64, f64)> = Vec::new();
+        for (path, row) in data.chunks(periods).enumerate() {
+            for dd in threshold_positions(row.iter().copied(), -0.05) {
+                expected.push((path as i64, dd.0 as i64, dd.1 as i64, dd.2));
+            }
+        }
+        assert!(expected.len() > 10);
+
+        let (paths, starts, ends, sizes) = threshold_positions_batch(&data, periods, -0.05);
+        let res: Vec<(i64, i64, i64, f64)> = paths
+            .into_iter()
+            .zip(starts)
+            .zip(ends)
+            .zip(sizes)
+            .map(|(((path, start), end), size)| (path, start, end, size))
+            .collect();
+        assert_eq!(res, expected);
+    }
+
+    #[test]
+    fn batch_without_periods_is_empty() {
+        let res = threshold_positions_batch(&[], 0, -0.05);
+        assert!(res.0.is_empty() && res.3.is_empty());
+    }
+}
@@ -19,5 +19,7 @@ fn panacea(py: Python, m: &PyModule) -> PyResult<()> {
         .unwrap();
     m.add_function(wrap_pyfunction!(calcs::max_dd_threshold_position, m)?)
         .unwrap();
+    m.add_function(wrap_pyfunction!(calcs::max_dd_threshold_position_batch, m)?)
+        .unwrap();
     Ok(())
 }
@@ -8,6 +8,8 @@ use alator::strategy::fixedweight::FixedWeightStrategy;
 use pyo3::prelude::*;
 use std::collections::HashMap;
 
+use super::{extract_close, extract_vec};
+
 #[pyclass]
 #[derive(Clone)]
 pub struct AlatorInput {
@@ -23,15 +25,15 @@ impl AlatorInput {
     fn new(
         assets: Vec<String>,
         weights: HashMap<String, f64>,
-        dates: Vec<i64>,
-        close: HashMap<String, Vec<f64>>,
-    ) -> Self {
-        AlatorInput {
+        dates: &PyAny,
+        close: HashMap<String, &PyAny>,
+    ) -> PyResult<Self> {
+        Ok(AlatorInput {
             assets,
             weights,
-            dates,
-            close,
-        }
+            dates: extract_vec(dates)?,
+            close: extract_close(close)?,
+        })
     }
 }
 
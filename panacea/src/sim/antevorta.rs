@@ -14,6 +14,8 @@ use pyo3::exceptions::PyException;
 use pyo3::prelude::*;
 use std::collections::HashMap;
 
+use super::{extract_close, extract_vec};
+
 create_exception!(
     panacea,
     InsufficientDataError,
@@ -42,27 +44,27 @@ impl AntevortaBasicInput {
     fn new(
         assets: Vec<String>,
         weights: HashMap<String, f64>,
-        dates: Vec<i64>,
-        close: HashMap<String, Vec<f64>>,
+        dates: &PyAny,
+        close: HashMap<String, &PyAny>,
         initial_cash: f64,
         wage: f64,
         wage_growth: f64,
         contribution_pct: f64,
         emergency_cash_min: f64,
         sim_length: i64,
-    ) -> Self {
-        AntevortaBasicInput {
+    ) -> PyResult<Self> {
+        Ok(AntevortaBasicInput {
             assets,
             weights,
-            dates,
-            close,
+            dates: extract_vec(dates)?,
+            close: extract_close(close)?,
             initial_cash,
             wage,
             wage_growth,
             contribution_pct,
             emergency_cash_min,
             sim_length,
-        }
+        })
     }
 }
 
@@ -1,5 +1,37 @@
 mod alator;
 mod antevorta;
 
+use pyo3::buffer::{Element, PyBuffer};
+use pyo3::prelude::*;
+use std::collections::HashMap;
+
 pub use self::alator::{alator_backtest, AlatorInput};
 pub use self::antevorta::{antevorta_basic, AntevortaBasicInput, InsufficientDataError};
+
+fn extract_vec<T>(obj: &PyAny) -> PyResult<Vec<T>>
+where
+    T: Element + for<'a> FromPyObject<'a>,
+{
+    /*1d C-contiguous NumPy arrays of T are read through the
+    buffer protocol with one copy of the whole array, other
+    arrays and sequences are extracted element by element.
+    */
+    match PyBuffer::<T>::get(obj) {
+        Ok(buffer)
+            if buffer.dimensions() == 1
+                && buffer.is_c_contiguous()
+                && buffer.item_size() == std::mem::size_of::<T>()
+                && T::is_compatible_format(buffer.format()) =>
+        {
+            buffer.to_vec(obj.py())
+        }
+        _ => obj.extract(),
+    }
+}
+
+fn extract_close(close: HashMap<String, &PyAny>) -> PyResult<HashMap<String, Vec<f64>>> {
+    close
+        .into_iter()
+        .map(|(asset, prices)| Ok((asset, extract_vec::<f64>(prices)?)))
+        .collect()
+}
@@ -120,3 +120,64 @@ USE_TZ = True
 STATIC_ROOT = os.path.join(BASE_DIR, "static/")
 STATIC_URL = "/static/"
 STATICFILES_DIRS = ["js/dist/"]
+
+# Price history cache
+# PRICE_CACHE_DIR set to an empty string disables the cache
+
+PRICE_CACHE_DIR = os.environ.get(
+    "PRICE_CACHE_DIR", os.path.join(BASE_DIR, "cache/prices/")
+)
+PRICE_CACHE_MAX_AGE = int(os.environ.get("PRICE_CACHE_MAX_AGE", 60 * 60 * 12))
+PRICE_CACHE_MAX_BYTES = int(os.environ.get("PRICE_CACHE_MAX_BYTES", 256 * 1024**2))
+PRICE_CACHE_PROCESS_LOCK = os.environ.get("PRICE_CACHE_PROCESS_LOCK") != "false"
+
+# Price requests for multiple assets are fetched concurrently, timeout is
+# seconds per asset and zero waits indefinitely
+
+PRICE_API_MAX_WORKERS = int(os.environ.get("PRICE_API_MAX_WORKERS", 4))
+PRICE_API_TIMEOUT = float(os.environ.get("PRICE_API_TIMEOUT", 30))
+
+# Bootstrap and Monte Carlo analytics run on a pool of this many processes,
+# per uwsgi worker, 0 runs them on the request thread
+ANALYSIS_EXECUTOR_WORKERS = int(os.environ.get("ANALYSIS_EXECUTOR_WORKERS", 0))
+
+# Upper limit on the simulations in one income simulation ensemble or grid request
+ANTEVORTA_MAX_RUNS = int(os.environ.get("ANTEVORTA_MAX_RUNS", 1000))
+
+# Upper limit on the portfolios in one batch backtest request
+ALATOR_MAX_PORTFOLIOS = int(os.environ.get("ALATOR_MAX_PORTFOLIOS", 100))
+
+# Analysis requests submitted to /api/jobs are run by the run_jobs command,
+# which uwsgi starts alongside the web workers. Finished jobs are kept for
+# JOB_RESULT_TTL seconds, a poll waits at most JOB_MAX_WAIT seconds and a job
+# that takes down its worker JOB_MAX_ATTEMPTS times is failed. Waiting polls
+# hold a request thread so only JOB_MAX_WAITERS per process wait, the rest
+# are answered at once. New jobs are refused once JOB_MAX_QUEUED are queued
+# or a client has JOB_MAX_CLIENT_JOBS queued or running
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", 0.5))
+JOB_MAX_WAIT = float(os.environ.get("JOB_MAX_WAIT", 5))
+JOB_MAX_WAITERS = int(os.environ.get("JOB_MAX_WAITERS", 1))
+JOB_MAX_QUEUED = int(os.environ.get("JOB_MAX_QUEUED", 500))
+JOB_MAX_CLIENT_JOBS = int(os.environ.get("JOB_MAX_CLIENT_JOBS", 20))
+JOB_RESULT_TTL = int(os.environ.get("JOB_RESULT_TTL", 60 * 60 * 6))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+
+# Responses of the analysis endpoints are cached by input and data version,
+# see api.decorators.result_cache. A file backend shares entries between
+# uwsgi workers, a timeout of 0 disables the cache
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "results": {
+        "BACKEND": os.environ.get(
+            "RESULT_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("RESULT_CACHE_LOCATION", "results"),
+        "TIMEOUT": int(os.environ.get("RESULT_CACHE_TIMEOUT", 60 * 60 * 6)),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", 1000)),
+        },
+    },
+}